@@ -0,0 +1,61 @@
+"""
+Sharded simulation benchmark: tick throughput of ShardedSimulator vs the single-process engine
+
+Both run the same scenario and fleet on the same grid network; the sharded
+run includes the border handovers and the lock-step barrier of every tick.
+Run from the backend directory:
+
+    python benchmarks/bench_sharded.py --vehicles 100000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from simulation.mock_simulator import MockSimulator
+from simulation.road_network import RoadNetwork
+from simulation.sharded import ShardedSimulator
+
+
+def ticks_per_second(simulator, ticks, dt):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        simulator.update_simulation(dt)
+    return ticks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--vehicles', type=int, default=100000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--grid', type=int, default=40, help='intersections per side')
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--dt', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    network = RoadNetwork.grid(rows=args.grid, cols=args.grid)
+    config = {'verbose': False, 'seed': args.seed, 'vehicle_capacity': args.vehicles}
+    print(f'{network}, {args.vehicles} vehicles, {args.ticks} ticks, {os.cpu_count()} CPUs')
+
+    single = MockSimulator(config, network)
+    single.start_simulation(seed=args.seed, vehicle_count=args.vehicles)
+    baseline = ticks_per_second(single, args.ticks, args.dt)
+    print(f"{'engine':>12} {'ticks/s':>10} {'speedup':>9} {'handovers/tick':>15}")
+    print(f"{'single':>12} {baseline:>10.1f} {1.0:>8.2f}x {'-':>15}")
+
+    for workers in args.workers:
+        with ShardedSimulator(workers, config, network,
+                              handover_capacity=max(65536, args.vehicles)) as sharded:
+            sharded.start_simulation(seed=args.seed, vehicle_count=args.vehicles)
+            sharded.update_simulation(args.dt)  # warm-up: workers import and allocate
+            sharded.handovers = 0
+            rate = ticks_per_second(sharded, args.ticks, args.dt)
+            print(f"{f'{workers} regions':>12} {rate:>10.1f} {rate / baseline:>8.2f}x "
+                  f'{sharded.handovers / args.ticks:>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Simulator scaling benchmark: per-phase tick latency and peak memory of MockSimulator
+
+Runs the simulator at several fleet sizes and reports latency percentiles of
+every phase of a tick (lights, vehicles, population, metrics, publish) plus the
+snapshot build (get_simulation_data). Peak memory is measured in a separate
+pass under tracemalloc so it does not distort the timings, together with the
+bytes per vehicle of each representation: engine columns, published
+snapshot, VehicleView objects and the JSON-ready dicts.
+Run from the backend directory:
+
+    python benchmarks/bench_simulator.py --output baseline.json
+    python benchmarks/bench_simulator.py --compare baseline.json --threshold 0.2
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from simulation.mock_simulator import MockSimulator
+from simulation.profiling import PhaseTimer
+from simulation.road_network import RoadNetwork
+
+PHASES = ('lights', 'vehicles', 'population', 'metrics', 'publish', 'tick', 'snapshot')
+
+
+def make_simulator(network, vehicles, seed):
+    simulator = MockSimulator({'verbose': False, 'seed': seed, 'vehicle_capacity': vehicles}, network)
+    simulator.start_simulation(seed=seed, vehicle_count=vehicles)
+    return simulator
+
+
+def time_ticks(network, vehicles, ticks, dt, snapshot_every, seed):
+    """Latency percentiles (ms) per phase"""
+    simulator = make_simulator(network, vehicles, seed)
+    for _ in range(5):  # warm-up
+        simulator.update_simulation(dt)
+
+    timer = PhaseTimer()
+    simulator.timer = timer
+    for tick in range(ticks):
+        start = time.perf_counter()
+        simulator.update_simulation(dt)
+        timer.samples['tick'].append(time.perf_counter() - start)
+        if tick % snapshot_every == 0:
+            timer.start()
+            simulator.get_simulation_data()
+            timer.mark('snapshot')
+    return timer.summary()
+
+
+def peak_memory(network, vehicles, dt, seed):
+    """Peak traced allocation (MB) while building, ticking and serializing the fleet"""
+    tracemalloc.start()
+    simulator = make_simulator(network, vehicles, seed)
+    for _ in range(10):
+        simulator.update_simulation(dt)
+    simulator.get_simulation_data()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1e6, 2)
+
+
+def memory_per_vehicle(network, vehicles, seed):
+    """Bytes per vehicle of every representation, plus dict build time and GC passes"""
+    simulator = make_simulator(network, vehicles, seed)
+    engine = simulator.engine
+    snapshot = simulator.snapshot
+    n = max(snapshot.vehicle_count, 1)
+    sizes = {
+        'columns': round(sum(getattr(engine, name).itemsize for name, _, _ in engine.COLUMNS), 1),
+        'snapshot': round(sum(column.nbytes for column in snapshot.columns.values()) / n, 1)
+    }
+
+    tracemalloc.start()
+    views = list(snapshot.views())
+    sizes['views'] = round(tracemalloc.get_traced_memory()[0] / n, 1)
+    del views
+
+    engine.columns_to_dicts(snapshot.columns)  # warm the shared string caches (lane ids, route tuples)
+    base = tracemalloc.get_traced_memory()[0]
+    dicts = engine.columns_to_dicts(snapshot.columns)
+    sizes['dicts'] = round((tracemalloc.get_traced_memory()[0] - base) / n, 1)
+    tracemalloc.stop()
+    del dicts
+
+    collections = sum(stats['collections'] for stats in gc.get_stats())
+    start = time.perf_counter()
+    engine.columns_to_dicts(snapshot.columns)
+    sizes['dict_build_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    sizes['gc_passes'] = sum(stats['collections'] for stats in gc.get_stats()) - collections
+    return sizes
+
+
+def compare(results, baseline, threshold):
+    """Phases whose p50 got slower than the baseline by more than ``threshold``"""
+    regressions = []
+    for size, current in results['sizes'].items():
+        reference = baseline['sizes'].get(size)
+        if reference is None:
+            continue
+        for phase, stats in current['phases'].items():
+            before = reference['phases'].get(phase, {}).get('p50')
+            if before and stats['p50'] > before * (1 + threshold):
+                regressions.append((size, phase, before, stats['p50']))
+        before = reference.get('peak_memory_mb')
+        if before and current['peak_memory_mb'] > before * (1 + threshold):
+            regressions.append((size, 'peak_memory_mb', before, current['peak_memory_mb']))
+        for name, after in current.get('bytes_per_vehicle', {}).items():
+            before = reference.get('bytes_per_vehicle', {}).get(name)
+            if name in ('views', 'dicts') and before and after > before * (1 + threshold):
+                regressions.append((size, f'{name} bytes/vehicle', before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--dt', type=float, default=0.1)
+    parser.add_argument('--grid', type=int, default=40, help='intersections per side')
+    parser.add_argument('--snapshot-every', type=int, default=10, help='build a snapshot every N ticks')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown (0.2 = +20%%)')
+    args = parser.parse_args()
+
+    network = RoadNetwork.grid(rows=args.grid, cols=args.grid)
+    results = {
+        'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                    'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'network': repr(network),
+        'ticks': args.ticks,
+        'dt': args.dt,
+        'sizes': {}
+    }
+
+    header = f"{'vehicles':>9} {'phase':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    for size in args.sizes:
+        phases = time_ticks(network, size, args.ticks, args.dt, args.snapshot_every, args.seed)
+        memory = peak_memory(network, size, args.dt, args.seed)
+        per_vehicle = memory_per_vehicle(network, size, args.seed)
+        results['sizes'][str(size)] = {'phases': phases, 'peak_memory_mb': memory,
+                                       'bytes_per_vehicle': per_vehicle}
+
+        for phase in PHASES:
+            stats = phases[phase]
+            print(f"{size:>9} {phase:>11} {stats['p50']:>9.3f} {stats['p95']:>9.3f} "
+                  f"{stats['p99']:>9.3f} {stats['max']:>9.3f}")
+        print(f"{size:>9} {'peak mem':>11} {memory:>8.1f}MB")
+        print(f"{size:>9} {'B/vehicle':>11} columns {per_vehicle['columns']}, snapshot {per_vehicle['snapshot']}, "
+              f"views {per_vehicle['views']}, dicts {per_vehicle['dicts']} "
+              f"(built in {per_vehicle['dict_build_ms']} ms, {per_vehicle['gc_passes']} GC passes)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'💾 Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'❌ {len(regressions)} regression(s) over {args.threshold:.0%}:')
+            for size, phase, before, after in regressions:
+                print(f'   {size} vehicles / {phase}: {before} -> {after}')
+            sys.exit(1)
+        print(f'✅ No regression over {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Spatial index benchmark: grid index vs brute-force proximity scan
+
+Intersections are laid out at constant density (the city grows with the
+number of intersections), queries are vehicle positions spread over the
+same area. Run from the backend directory:
+
+    python benchmarks/bench_spatial_index.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from simulation.spatial_index import SpatialIndex
+
+SPACING = 0.0025  # degrees between intersections (~250m)
+RADIUS = 0.001    # traffic-light reaction radius used by the simulator
+
+
+def brute_force(lights_lat, lights_lng, lat, lng, radius, chunk=2048):
+    """Reference O(vehicles x lights) scan, chunked to bound memory"""
+    result = np.full(len(lat), -1, dtype=np.int64)
+    for start in range(0, len(lat), chunk):
+        stop = start + chunk
+        dist = (np.abs(lat[start:stop, None] - lights_lat[None, :]) +
+                np.abs(lng[start:stop, None] - lights_lng[None, :]))
+        nearest = dist.argmin(axis=1)
+        within = dist[np.arange(len(nearest)), nearest] <= radius
+        result[start:stop] = np.where(within, nearest, -1)
+    return result
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'intersections':>14} {'brute (ms)':>12} {'grid (ms)':>12} {'speedup':>9}")
+
+    for size in args.sizes:
+        side = int(np.ceil(np.sqrt(size)))
+        lat = (np.arange(size) // side) * SPACING + rng.normal(0, SPACING / 10, size)
+        lng = (np.arange(size) % side) * SPACING + rng.normal(0, SPACING / 10, size)
+        q_lat = rng.uniform(0, side * SPACING, args.queries)
+        q_lng = rng.uniform(0, side * SPACING, args.queries)
+
+        index = SpatialIndex(RADIUS, lat, lng)
+        brute_time, expected = timed(lambda: brute_force(lat, lng, q_lat, q_lng, RADIUS), args.repeat)
+        grid_time, got = timed(lambda: index.query_radius(q_lat, q_lng, RADIUS), args.repeat)
+        assert np.array_equal(expected, got), 'grid index disagrees with brute force'
+
+        print(f'{size:>14} {brute_time * 1000:>12.2f} {grid_time * 1000:>12.2f} '
+              f'{brute_time / grid_time:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Stream benchmark: bandwidth of full lists vs delta frames, JSON vs packed binary frames, emit CPU
+
+Replays what SimulationStream sends during ``--seconds`` of wall time at 10
+frames/s (warp 1): the legacy clients get simulation_update at 5 Hz and
+vehicle_update at 2 Hz with every vehicle, the delta clients get
+simulation_update without vehicles at 5 Hz and one vehicle_delta frame per
+frame. Payloads are measured as the JSON the socket sends. The delta frames
+are also applied to a client-side copy, checked against the last snapshot.
+
+The wire-format table compares one frame of every vehicle and light as
+JSON (dicts built from the snapshot, then dumped) with the packed binary
+vehicle_frame: encode time and size, both scaled to 10k vehicles.
+
+The emit table times the serialization work of the stream's JSON events
+per frame (what Socket.IO does once per emit: build the payload, encode
+the packet), before and after the per-frame FrameBuilder: separate dicts
+dumped per event and per client kind, vs components dumped once and
+spliced into every payload and envelope.
+Run from the backend directory:
+
+    python benchmarks/bench_stream.py --sizes 1000 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from socketio import packet
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from simulation.mock_simulator import MockSimulator
+from simulation.road_network import RoadNetwork
+from simulation.snapshot import light_dicts
+from websocket.binary import pack_frame, unpack_frame
+from websocket.delta import DeltaEncoder
+from websocket.frames import FrameBuilder, FrameJSON
+
+FRAME_INTERVAL = 0.1  # SimulationStream.update_interval
+
+
+class FramePacket(packet.Packet):
+    json = FrameJSON
+
+
+def payload_bytes(data) -> int:
+    return len(json.dumps(data, separators=(',', ':')).encode())
+
+
+def apply_frame(vehicles, frame):
+    """Client side: bring ``vehicles`` (id -> dict) up to ``frame``"""
+    if frame['keyframe']:
+        vehicles.clear()
+        vehicles.update((v['id'], dict(v, position=dict(v['position']))) for v in frame['vehicles'])
+        return
+    for vehicle_id in frame['removed']:
+        del vehicles[vehicle_id]
+    for vehicle in frame['added']:
+        vehicles[vehicle['id']] = dict(vehicle, position=dict(vehicle['position']))
+    for group, values in frame['changed'].items():
+        fields = [name for name in values if name != 'ids']
+        for i, vehicle_id in enumerate(values['ids']):
+            vehicle = vehicles[vehicle_id]
+            for name in fields:
+                if group == 'position':
+                    vehicle['position'][name] = values[name][i]
+                else:
+                    vehicle[name] = values[name][i]
+
+
+def check(vehicles, snapshot) -> float:
+    """Largest position error (degrees) of the client copy against the snapshot"""
+    expected = {v['id']: v for v in snapshot.vehicles}
+    assert vehicles.keys() == expected.keys(), 'client copy lost or kept vehicles'
+    worst = 0.0
+    for vehicle_id, vehicle in vehicles.items():
+        truth = expected[vehicle_id]
+        assert vehicle['edge'] == truth['edge'] and vehicle['lane'] == truth['lane'], vehicle_id
+        assert tuple(vehicle['route']) == tuple(truth['route']), vehicle_id
+        worst = max(worst, abs(vehicle['position']['lat'] - truth['position']['lat']),
+                    abs(vehicle['position']['lng'] - truth['position']['lng']))
+    return worst
+
+
+def run(network, vehicles, seconds, keyframe_interval, seed):
+    simulator = MockSimulator({'verbose': False, 'seed': seed, 'vehicle_capacity': vehicles}, network)
+    simulator.start_simulation(seed=seed, vehicle_count=vehicles)
+    encoder = DeltaEncoder(keyframe_interval)
+    client = {}
+    legacy = delta = 0
+    encode_s = 0.0
+    frames = int(seconds / FRAME_INTERVAL)
+
+    for frame in range(frames):
+        simulator.update_simulation(FRAME_INTERVAL)
+        snapshot = simulator.snapshot
+        data = snapshot.to_dict()
+        if frame % 2 == 0:  # simulation_update, 5 Hz
+            legacy += payload_bytes(data)
+            delta += payload_bytes({key: value for key, value in data.items() if key != 'vehicles'})
+        if frame % 5 == 0:  # vehicle_update, 2 Hz
+            legacy += payload_bytes({'vehicles': data['vehicles'], 'count': len(data['vehicles'])})
+
+        start = time.perf_counter()
+        message = encoder.encode(snapshot)
+        encode_s += time.perf_counter() - start
+        delta += payload_bytes(message)
+        apply_frame(client, message)
+
+    error = check(client, simulator.snapshot)
+    return {
+        'legacy_bytes_s': round(legacy / seconds),
+        'delta_bytes_s': round(delta / seconds),
+        'reduction': round(legacy / max(delta, 1), 1),
+        'encode_ms': round(encode_s / frames * 1000, 2),
+        'max_position_error': error
+    }
+
+
+def wire_formats(network, vehicles, repeats, seed):
+    """Encode time (ms) and size (bytes) of one JSON and one binary frame, per 10k vehicles"""
+    simulator = MockSimulator({'verbose': False, 'seed': seed, 'vehicle_capacity': vehicles}, network)
+    simulator.start_simulation(seed=seed, vehicle_count=vehicles)
+    for _ in range(5):
+        simulator.update_simulation(FRAME_INTERVAL)
+    snapshot = simulator.snapshot
+    engine = snapshot.engine
+    per_10k = 10000 / max(snapshot.vehicle_count, 1)
+
+    json_s = binary_s = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        lights = light_dicts(snapshot.traffic_lights, snapshot.plan, snapshot.light_phase,
+                             snapshot.light_elapsed, snapshot.simulation_time)
+        text = json.dumps({'vehicles': engine.columns_to_dicts(snapshot.columns), 'traffic_lights': lights},
+                          separators=(',', ':')).encode()
+        json_s += time.perf_counter() - start
+
+        start = time.perf_counter()
+        packed = pack_frame(snapshot, snapshot.tick)
+        binary_s += time.perf_counter() - start
+
+    decoded = unpack_frame(packed)
+    error = max(float(abs(decoded['lat'] - snapshot.columns['lat']).max(initial=0)),
+                float(abs(decoded['lng'] - snapshot.columns['lng']).max(initial=0)))
+    return {
+        'json_encode_ms': round(json_s / repeats * 1000 * per_10k, 2),
+        'binary_encode_ms': round(binary_s / repeats * 1000 * per_10k, 3),
+        'json_bytes': round(len(text) * per_10k),
+        'binary_bytes': round(len(packed) * per_10k),
+        'max_position_error': error
+    }
+
+
+def due_events(frame):
+    """Events of one stream frame, on the stream's schedule"""
+    due = []
+    if frame % 2 == 0:
+        due.append('simulation_update')
+    if frame % 5 == 0:
+        due.append('vehicle_update')
+    due.append('traffic_light_update')
+    if frame % 20 == 0:
+        due.append('metrics_update')
+    if frame % 50 == 0:
+        due.append('simulation_status')
+    return due
+
+
+def legacy_emit(snapshot, due, status):
+    """Payload dicts built per event, one more simulation_update for lean clients; returns bytes"""
+    sent = 0
+    simulation_data = snapshot.to_dict()
+    for event in due:
+        if event == 'simulation_update':
+            payloads = [simulation_data, {k: v for k, v in simulation_data.items() if k != 'vehicles'}]
+        elif event == 'vehicle_update':
+            payloads = [{'vehicles': simulation_data['vehicles'], 'count': len(simulation_data['vehicles']),
+                         'timestamp': datetime.utcnow().isoformat()}]
+        elif event == 'traffic_light_update':
+            payloads = [{'traffic_lights': simulation_data['traffic_lights'],
+                         'timestamp': datetime.utcnow().isoformat()}]
+        elif event == 'metrics_update':
+            payloads = [{'metrics': simulation_data['metrics'], 'timestamp': datetime.utcnow().isoformat()}]
+        else:
+            payloads = [dict(status, timestamp=datetime.utcnow().isoformat())]
+        for payload in payloads:
+            sent += len(packet.Packet(packet.EVENT, data=[event, payload]).encode())
+    return sent
+
+
+def builder_emit(snapshot, due, status, seq):
+    """One FrameBuilder: the same events plus a coalesced envelope; returns bytes"""
+    sent = 0
+    frame = FrameBuilder(snapshot, seq, status)
+    for event in due:
+        payloads = [frame.payload(event)]
+        if event == 'simulation_update':
+            payloads.append(frame.payload(event, lean=True))
+        for payload in payloads:
+            sent += len(FramePacket(packet.EVENT, data=[event, payload]).encode())
+    sent += len(FramePacket(packet.EVENT, data=['frame', frame.envelope(due)]).encode())
+    return sent
+
+
+def emit_cpu(network, vehicles, frames, seed):
+    """Serialization ms per frame of the JSON events, legacy vs FrameBuilder"""
+    simulator = MockSimulator({'verbose': False, 'seed': seed, 'vehicle_capacity': vehicles}, network)
+    simulator.start_simulation(seed=seed, vehicle_count=vehicles)
+    status = {'status': 'running', 'is_paused': False, 'current_scenario': 'default'}
+    timings = {'legacy': 0.0, 'builder': 0.0}
+    for frame in range(frames):
+        simulator.update_simulation(FRAME_INTERVAL)
+        snapshot = simulator.snapshot
+        snapshot.vehicles  # dicts are built once per snapshot on both paths; time the emit work only
+        snapshot.lights
+        due = due_events(frame)
+        start = time.perf_counter()
+        legacy_emit(snapshot, due, status)
+        timings['legacy'] += time.perf_counter() - start
+        start = time.perf_counter()
+        builder_emit(snapshot, due, status, frame)
+        timings['builder'] += time.perf_counter() - start
+    return {name: round(seconds / frames * 1000, 2) for name, seconds in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--seconds', type=float, default=10.0, help='wall seconds of stream to replay')
+    parser.add_argument('--keyframe-interval', type=int, default=50, help='frames between keyframes')
+    parser.add_argument('--grid', type=int, default=40, help='intersections per side')
+    parser.add_argument('--repeats', type=int, default=20, help='frames encoded per wire format')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    network = RoadNetwork.grid(rows=args.grid, cols=args.grid)
+    results = {'network': repr(network), 'seconds': args.seconds,
+               'keyframe_interval': args.keyframe_interval, 'sizes': {}}
+
+    print(f"{'vehicles':>9} {'full kB/s':>10} {'delta kB/s':>11} {'ratio':>6} {'encode ms':>10}")
+    for size in args.sizes:
+        result = run(network, size, args.seconds, args.keyframe_interval, args.seed)
+        results['sizes'][str(size)] = result
+        print(f"{size:>9} {result['legacy_bytes_s'] / 1e3:>10.1f} {result['delta_bytes_s'] / 1e3:>11.1f} "
+              f"{result['reduction']:>5.1f}x {result['encode_ms']:>10.2f}")
+
+    print()
+    print(f"{'vehicles':>9} {'JSON ms/10k':>12} {'binary ms/10k':>14} {'JSON kB/10k':>12} {'binary kB/10k':>14}")
+    for size in args.sizes:
+        result = wire_formats(network, size, args.repeats, args.seed)
+        results['sizes'][str(size)]['wire'] = result
+        print(f"{size:>9} {result['json_encode_ms']:>12.2f} {result['binary_encode_ms']:>14.3f} "
+              f"{result['json_bytes'] / 1e3:>12.1f} {result['binary_bytes'] / 1e3:>14.1f}")
+
+    print()
+    print(f"{'vehicles':>9} {'legacy emit ms':>15} {'builder emit ms':>16}")
+    for size in args.sizes:
+        result = emit_cpu(network, size, int(args.seconds / FRAME_INTERVAL), args.seed)
+        results['sizes'][str(size)]['emit_ms'] = result
+        print(f"{size:>9} {result['legacy']:>15.2f} {result['builder']:>16.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'💾 Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,8 @@ Maximum Pressure algorithm for traffic signal control
 import time
 from typing import Dict, List, Any
 
+from simulation.signal_plan import encode_state
+
 class MaxPressureAlgorithm:
     """
     Implements Maximum Pressure algorithm for adaptive traffic signal control
@@ -47,6 +49,7 @@ class MaxPressureAlgorithm:
         """
         intersection_id = intersection_data['id']
         approaches = intersection_data.get('approaches', [])
+        lanes = {lane['id']: lane for lane in approaches}
         
         # Calculate pressures
         pressures = self.calculate_pressure(approaches)
@@ -71,7 +74,7 @@ class MaxPressureAlgorithm:
         phases.append({
             'id': 'phase_max_pressure',
             'duration': duration,
-            'state': self._get_phase_state(max_pressure_lane),
+            'state': self._get_phase_state(max_pressure_lane, lanes.get(max_pressure_lane)),
             'served_lanes': [max_pressure_lane],
             'pressure': max_pressure
         })
@@ -83,7 +86,7 @@ class MaxPressureAlgorithm:
                 phases.append({
                     'id': f'phase_{lane_id}',
                     'duration': phase_duration,
-                    'state': self._get_phase_state(lane_id),
+                    'state': self._get_phase_state(lane_id, lanes.get(lane_id)),
                     'served_lanes': [lane_id],
                     'pressure': pressure
                 })
@@ -98,10 +101,15 @@ class MaxPressureAlgorithm:
             'timestamp': time.time()
         }
     
-    def _get_phase_state(self, lane_id: str) -> str:
+    def _get_phase_state(self, lane_id: str, lane: Dict = None) -> str:
         """
         Get traffic light state for a lane
         """
+        # Lanes from the simulator carry their signal links as a bitmask:
+        # green for every movement compatible with this lane, red elsewhere
+        if lane and 'green_mask' in lane:
+            return encode_state(lane['green_mask'], 0, lane['link_count'])
+        
         # Simplified mapping
         if 'north' in lane_id or 'south' in lane_id:
             return 'GGGrrr'
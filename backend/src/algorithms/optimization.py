@@ -5,13 +5,16 @@ import time
 import random
 from typing import Dict, List, Any
 
+from simulation.road_network import RoadNetwork, default_network
+
 class TrafficOptimizer:
     """
     Various traffic optimization techniques
     """
     
-    def __init__(self):
+    def __init__(self, network: RoadNetwork = None):
         self.optimization_history = []
+        self.network = network or default_network()
     
     def optimize_route(self, vehicle_data: Dict, network_data: Dict) -> Dict:
         """
@@ -90,38 +93,56 @@ class TrafficOptimizer:
         
         return optimized
     
-    def _find_routes(self, start: str, end: str, network: Dict) -> List[Dict]:
+    def _resolve_node(self, point) -> int:
+        """Map a node id or a {'lat', 'lng'} position to a network node index"""
+        if isinstance(point, str):
+            return self.network.node_index.get(point, -1)
+        if isinstance(point, dict) and 'lat' in point and 'lng' in point:
+            return self.network.nearest_node(point['lat'], point['lng'])
+        return -1
+    
+    def _find_routes(self, start, end, network: Dict) -> List[Dict]:
         """
-        Find possible routes between two points (mock implementation)
+        Find candidate routes between two points on the road network
+        (shortest, fastest and an alternative avoiding the shortest one)
         """
-        # Mock route finding
-        routes = []
+        graph = self.network
+        source, target = self._resolve_node(start), self._resolve_node(end)
+        if source < 0 or target < 0 or source == target:
+            return []
+        
+        travel_time = graph.edge_length / graph.edge_speed_limit  # hours
+        shortest = graph.shortest_path(source, target)
+        if not shortest:
+            return []
+        
+        # Penalize the shortest path so the alternative takes other streets
+        detour_cost = graph.edge_length.copy()
+        detour_cost[shortest] *= 3
+        
+        candidates = [
+            shortest,
+            graph.shortest_path(source, target, travel_time),
+            graph.shortest_path(source, target, detour_cost),
+        ]
         
-        # Route 1: Direct route
-        routes.append({
-            'path': ['edge_1', 'edge_2', 'edge_3'],
-            'distance': 2.5,
-            'estimated_time': 5,
-            'traffic_level': 'medium'
-        })
-        
-        # Route 2: Alternative route
-        routes.append({
-            'path': ['edge_1', 'edge_5', 'edge_4'],
-            'distance': 3.0,
-            'estimated_time': 4,
-            'traffic_level': 'low',
-            'has_small_streets': False
-        })
-        
-        # Route 3: Scenic route
-        routes.append({
-            'path': ['edge_1', 'edge_2', 'edge_5', 'edge_4'],
-            'distance': 4.0,
-            'estimated_time': 7,
-            'traffic_level': 'low',
-            'has_small_streets': True
-        })
+        routes = []
+        seen = set()
+        for path in candidates:
+            if not path or tuple(path) in seen:
+                continue
+            seen.add(tuple(path))
+            
+            distance = float(graph.edge_length[path].sum())
+            minutes = float(travel_time[path].sum() * 60)
+            roads = graph.edge_road[path]
+            routes.append({
+                'path': [graph.edge_ids[e] for e in path],
+                'distance': round(distance, 3),
+                'estimated_time': round(minutes, 2),
+                'traffic_level': 'low' if len(path) <= 4 else 'medium',
+                'has_small_streets': any(graph.road_types[r] == 'street' for r in roads if r >= 0)
+            })
         
         return routes
     
@@ -1,12 +1,21 @@
 """
 Scenarios API routes
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from models.scenario import Scenario, db
 from models.simulation import db as simulation_db
+from simulation.commands import CommandQueueFull, UnsupportedCommand
 
 scenarios_bp = Blueprint('scenarios', __name__)
 
+@scenarios_bp.errorhandler(CommandQueueFull)
+def handle_queue_full(error):
+    return jsonify({'error': str(error)}), 503
+
+@scenarios_bp.errorhandler(UnsupportedCommand)
+def handle_unsupported(error):
+    return jsonify({'error': str(error)}), 409
+
 @scenarios_bp.route('/scenarios', methods=['GET'])
 def get_scenarios():
     """Get all scenarios"""
@@ -125,6 +134,12 @@ def activate_scenario(scenario_id):
     if not scenario:
         return jsonify({'error': 'Scenario not found'}), 404
     
+    # A running simulation switches over at its next tick boundary (first,
+    # so a source that cannot switch leaves the active scenario unchanged)
+    simulator = current_app.extensions.get('simulator')
+    if simulator is not None and simulator.is_running:
+        current_app.extensions['commands'].call('change_scenario', scenario_id)
+    
     # Deactivate all other scenarios
     Scenario.query.update({'is_active': False})
     
@@ -1,12 +1,19 @@
 """
 Simulation API routes
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from datetime import datetime
 import time
 
+from algorithms import MaxPressureAlgorithm
+from simulation.clock import SimulationClock
+from simulation.commands import CommandQueueFull, UnsupportedCommand
+
 simulation_bp = Blueprint('simulation', __name__)
 
+# Keeps the pressure history across requests
+max_pressure = MaxPressureAlgorithm()
+
 # Simulation state
 simulation_state = {
     'status': 'stopped',  # stopped, running, paused
@@ -17,6 +24,21 @@ simulation_state = {
     'simulation_speed': 1.0
 }
 
+def _set_speed(speed):
+    """Apply a time-warp factor to the running stream (clamped to the clock limits)"""
+    stream = current_app.extensions.get('simulation_stream')
+    speed = stream.set_speed(speed) if stream else SimulationClock.clamp(speed)
+    simulation_state['simulation_speed'] = speed
+    return speed
+
+@simulation_bp.errorhandler(CommandQueueFull)
+def handle_queue_full(error):
+    return jsonify({'error': str(error)}), 503
+
+@simulation_bp.errorhandler(UnsupportedCommand)
+def handle_unsupported(error):
+    return jsonify({'error': str(error)}), 409
+
 @simulation_bp.route('/simulation/status', methods=['GET'])
 def get_simulation_status():
     """Get current simulation status"""
@@ -45,9 +67,9 @@ def start_simulation():
         'status': 'running',
         'current_scenario': scenario_id,
         'start_time': datetime.utcnow().isoformat(),
-        'elapsed_time': 0,
-        'simulation_speed': max(0.1, min(10.0, simulation_speed))  # Clamp between 0.1 and 10
+        'elapsed_time': 0
     })
+    _set_speed(simulation_speed)
     
     return jsonify({
         'message': f'Simulation started with scenario: {scenario_id}',
@@ -99,9 +121,9 @@ def reset_simulation():
         'current_scenario': None,
         'start_time': None,
         'elapsed_time': 0,
-        'total_vehicles': 0,
-        'simulation_speed': 1.0
+        'total_vehicles': 0
     })
+    _set_speed(1.0)
     
     return jsonify({
         'message': 'Simulation reset',
@@ -114,10 +136,29 @@ def set_simulation_speed():
     data = request.get_json()
     speed = data.get('speed', 1.0)
     
-    # Clamp between 0.1 and 10
-    simulation_state['simulation_speed'] = max(0.1, min(10.0, speed))
+    # Clamp between 0.1 and 100
+    _set_speed(float(speed))
     
     return jsonify({
         'message': f'Simulation speed set to {simulation_state["simulation_speed"]}x',
         'simulationSpeed': simulation_state['simulation_speed']
+    })
+
+@simulation_bp.route('/simulation/traffic-lights/<tl_id>/optimize', methods=['POST'])
+def optimize_traffic_light(tl_id):
+    """Re-time a traffic light with Max Pressure from the live queues of its approaches"""
+    commands = current_app.extensions.get('commands')
+    if commands is None:
+        return jsonify({'error': 'No simulation running'}), 503
+    
+    try:
+        result = commands.call('optimize_traffic_light', tl_id, max_pressure)
+    except KeyError:
+        return jsonify({'error': 'Traffic light not found'}), 404
+    
+    return jsonify({
+        'message': f'Traffic light {tl_id} re-timed',
+        'trafficLight': result['traffic_light'],
+        'optimization': result['optimization'],
+        'timestamp': datetime.utcnow().isoformat()
     })
\ No newline at end of file
@@ -1,11 +1,13 @@
 """
 Vehicles API routes
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from datetime import datetime
 import random
 import uuid
 
+from simulation.commands import CommandQueueFull, UnsupportedCommand
+
 vehicles_bp = Blueprint('vehicles', __name__)
 
 # In-memory storage for active vehicles
@@ -20,6 +22,22 @@ vehicle_colors = {
     'bicycle': '#06b6d4'     # cyan
 }
 
+def _get_simulator():
+    """Running simulator attached to the app (None outside the app factory)"""
+    return current_app.extensions.get('simulator')
+
+def _get_commands():
+    """Queue applying simulator mutations between ticks (None outside the app factory)"""
+    return current_app.extensions.get('commands')
+
+@vehicles_bp.errorhandler(CommandQueueFull)
+def handle_queue_full(error):
+    return jsonify({'error': str(error)}), 503
+
+@vehicles_bp.errorhandler(UnsupportedCommand)
+def handle_unsupported(error):
+    return jsonify({'error': str(error)}), 409
+
 @vehicles_bp.route('/vehicles', methods=['GET'])
 def get_vehicles():
     """Get all active vehicles"""
@@ -91,6 +109,16 @@ def add_emergency_vehicle():
     """Add an emergency vehicle to simulation"""
     data = request.get_json()
     
+    # Simulated vehicle, inserted at the next tick boundary
+    commands = _get_commands()
+    if commands is not None:
+        vehicle = commands.call('add_emergency_vehicle')
+        return jsonify({
+            'message': 'Emergency vehicle added',
+            'vehicle': vehicle,
+            'vehicleId': vehicle['id']
+        }), 201
+    
     # Generate vehicle ID
     vehicle_id = f"emergency_{uuid.uuid4().hex[:8]}"
     
@@ -138,6 +166,16 @@ def add_vehicle():
     if vehicle_type not in vehicle_types:
         return jsonify({'error': f'Invalid vehicle type. Must be one of: {", ".join(vehicle_types)}'}), 400
     
+    # Simulated vehicle on a random route, inserted at the next tick boundary
+    commands = _get_commands()
+    if commands is not None:
+        vehicle = commands.call('add_vehicles', [vehicle_type])[0]
+        return jsonify({
+            'message': f'{vehicle_type} vehicle added',
+            'vehicle': vehicle,
+            'vehicleId': vehicle['id']
+        }), 201
+    
     # Generate vehicle ID
     vehicle_id = f"{vehicle_type}_{uuid.uuid4().hex[:8]}"
     
@@ -170,18 +208,27 @@ def add_vehicle():
 @vehicles_bp.route('/vehicles/<vehicle_id>', methods=['GET'])
 def get_vehicle(vehicle_id):
     """Get specific vehicle"""
-    if vehicle_id not in active_vehicles:
+    if vehicle_id in active_vehicles:
+        return jsonify(active_vehicles[vehicle_id])
+    
+    # Simulated vehicles are looked up in the latest published snapshot
+    simulator = _get_simulator()
+    vehicle = simulator.get_vehicle_by_id(vehicle_id) if simulator else None
+    if vehicle is None:
         return jsonify({'error': 'Vehicle not found'}), 404
     
-    return jsonify(active_vehicles[vehicle_id])
+    return jsonify(vehicle)
 
 @vehicles_bp.route('/vehicles/<vehicle_id>', methods=['DELETE'])
 def remove_vehicle(vehicle_id):
     """Remove a vehicle from simulation"""
-    if vehicle_id not in active_vehicles:
-        return jsonify({'error': 'Vehicle not found'}), 404
-    
-    removed_vehicle = active_vehicles.pop(vehicle_id)
+    if vehicle_id in active_vehicles:
+        removed_vehicle = active_vehicles.pop(vehicle_id)
+    else:
+        simulator = _get_simulator()
+        removed_vehicle = simulator.get_vehicle_by_id(vehicle_id) if simulator else None
+        if removed_vehicle is None or not _get_commands().call('remove_vehicle', vehicle_id):
+            return jsonify({'error': 'Vehicle not found'}), 404
     
     return jsonify({
         'message': 'Vehicle removed',
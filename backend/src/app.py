@@ -13,8 +13,10 @@ from flask_sqlalchemy import SQLAlchemy
 from config import Config
 from models.simulation import db
 from websocket.handlers import register_socketio_handlers
+from websocket.frames import FrameJSON
 from websocket.simulation_stream import SimulationStream
 from simulation.mock_simulator import MockSimulator
+from simulation.recorder import ReplaySource
 
 # Extensions
 socketio = SocketIO()
@@ -41,12 +43,20 @@ def create_app(config_class=Config):
     
     socketio.init_app(app, 
                      cors_allowed_origins=app.config['CORS_ORIGINS'],
-                     async_mode='eventlet')
+                     async_mode='eventlet',
+                     json=FrameJSON)  # splices the stream's pre-encoded payloads
     
     # Initialize simulator
     global simulator, simulation_stream
-    simulator = MockSimulator()
+    if app.config.get('REPLAY_FILE'):
+        simulator = ReplaySource(app.config['REPLAY_FILE'])
+        print(f"⏯️ Replay mode: {app.config['REPLAY_FILE']}")
+    else:
+        simulator = MockSimulator()
     simulation_stream = SimulationStream(socketio, simulator)
+    app.extensions['simulator'] = simulator
+    app.extensions['simulation_stream'] = simulation_stream
+    app.extensions['commands'] = simulation_stream.commands
     
     # Register WebSocket handlers
     register_socketio_handlers(socketio, simulator, simulation_stream)
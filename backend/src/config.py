@@ -40,6 +40,7 @@ class Config:
     # Simulation
     SIMULATION_UPDATE_INTERVAL = 0.1  # seconds (100ms)
     MOCK_MODE = os.getenv('MOCK_MODE', 'true').lower() == 'true'
+    REPLAY_FILE = os.getenv('REPLAY_FILE')  # serve a recorded trajectory log instead of simulating
     
     # Mock Simulation Settings
     MOCK_VEHICLE_COUNT = int(os.getenv('MOCK_VEHICLE_COUNT', '50'))
@@ -0,0 +1,165 @@
+"""
+Parallel multi-scenario / multi-seed batch runner
+
+Usage (from backend/src):
+    python -m simulation.batch_runner --seeds 24 --duration 3600 --output results.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Sequence
+
+from .mock_simulator import MockSimulator
+
+DEFAULT_SCENARIOS = ['default', 'rush_hour', 'emergency_test', 'weekend']
+
+# KPI columns of the merged results table (in order)
+RESULT_COLUMNS = [
+    'scenario', 'seed', 'simulation_time', 'steps', 'wall_time_s', 'realtime_factor',
+    'vehicle_count', 'avgSpeed', 'avgTravelTime', 'co2Emissions', 'throughput',
+    'congestionLevel', 'totalDistanceTraveled', 'emergencyVehiclesActive',
+    'total_vehicles_created'
+]
+
+
+def run_job(job: Dict) -> Dict:
+    """Run one scenario/seed headless and return its flattened KPI row (runs in a worker)"""
+    simulator = MockSimulator({'seed': job['seed'], 'verbose': False})
+    summary = simulator.run(job['duration'], dt=job['dt'], scenario_id=job['scenario'],
+                            seed=job['seed'], vehicle_count=job.get('vehicle_count'))
+    
+    row = {key: summary.get(key) for key in RESULT_COLUMNS if key in summary}
+    row.update({key: summary['metrics'].get(key) for key in RESULT_COLUMNS if key in summary['metrics']})
+    row['total_vehicles_created'] = summary['stats']['total_vehicles_created']
+    return row
+
+
+class BatchRunner:
+    """
+    Fans headless MockSimulator runs out over a process pool,
+    one process per (scenario, seed) job.
+    """
+    
+    def __init__(self, scenarios: Sequence[str] = None, seeds: Sequence[int] = range(10),
+                 duration: float = 3600.0, dt: float = 0.1, max_workers: int = None,
+                 vehicle_count: int = None):
+        self.scenarios = list(scenarios or DEFAULT_SCENARIOS)
+        self.seeds = list(seeds)
+        self.duration = duration
+        self.dt = dt
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.vehicle_count = vehicle_count
+    
+    def jobs(self) -> List[Dict]:
+        """One job per (scenario, seed) pair"""
+        return [
+            {
+                'scenario': scenario,
+                'seed': seed,
+                'duration': self.duration,
+                'dt': self.dt,
+                'vehicle_count': self.vehicle_count
+            }
+            for scenario in self.scenarios
+            for seed in self.seeds
+        ]
+    
+    def iter_results(self) -> Iterator[Dict]:
+        """Yield each run's KPI row as soon as it finishes"""
+        jobs = self.jobs()
+        
+        if self.max_workers == 1:
+            for job in jobs:
+                yield run_job(job)
+            return
+        
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(run_job, job) for job in jobs]
+            for future in as_completed(futures):
+                yield future.result()
+    
+    def run(self, on_result=None) -> List[Dict]:
+        """Run every job and return the merged table sorted by scenario and seed"""
+        rows = []
+        for row in self.iter_results():
+            rows.append(row)
+            if on_result:
+                on_result(row)
+        
+        order = {scenario: i for i, scenario in enumerate(self.scenarios)}
+        rows.sort(key=lambda r: (order.get(r['scenario'], len(order)), r['seed']))
+        return rows
+    
+    @staticmethod
+    def summarize(rows: List[Dict]) -> Dict[str, Dict]:
+        """Mean KPIs per scenario"""
+        numeric = ['avgSpeed', 'co2Emissions', 'throughput', 'totalDistanceTraveled', 'vehicle_count']
+        summary = {}
+        for row in rows:
+            entry = summary.setdefault(row['scenario'], {'runs': 0, **{key: 0.0 for key in numeric}})
+            entry['runs'] += 1
+            for key in numeric:
+                entry[key] += row.get(key) or 0
+        for entry in summary.values():
+            for key in numeric:
+                entry[key] = round(entry[key] / entry['runs'], 2)
+        return summary
+    
+    @staticmethod
+    def write_csv(rows: List[Dict], path: str):
+        """Write the merged results table"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run scenarios over many seeds in parallel')
+    parser.add_argument('--scenarios', nargs='+', default=DEFAULT_SCENARIOS)
+    parser.add_argument('--seeds', type=int, default=10, help='Number of seeds per scenario (0..N-1)')
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=3600.0, help='Simulated seconds per run')
+    parser.add_argument('--dt', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--vehicles', type=int, default=None, help='Override the scenario vehicle count')
+    parser.add_argument('--output', default=None, help='CSV file for the merged results')
+    args = parser.parse_args(argv)
+    
+    runner = BatchRunner(
+        scenarios=args.scenarios,
+        seeds=range(args.first_seed, args.first_seed + args.seeds),
+        duration=args.duration,
+        dt=args.dt,
+        max_workers=args.workers,
+        vehicle_count=args.vehicles
+    )
+    
+    total = len(runner.jobs())
+    done = [0]
+    
+    def report(row):
+        done[0] += 1
+        print(f"[{done[0]}/{total}] {row['scenario']} seed={row['seed']} "
+              f"avgSpeed={row['avgSpeed']} co2={row['co2Emissions']} ({row['wall_time_s']}s)", flush=True)
+    
+    print(f"🚀 {total} runs on {runner.max_workers} workers")
+    start = time.perf_counter()
+    rows = runner.run(on_result=report)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Done in {elapsed:.1f}s")
+    
+    for scenario, kpis in runner.summarize(rows).items():
+        print(f"   {scenario}: {kpis}")
+    
+    if args.output:
+        runner.write_csv(rows, args.output)
+        print(f"💾 Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
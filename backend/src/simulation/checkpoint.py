@@ -0,0 +1,94 @@
+"""
+Binary checkpoint / restore of the full simulator state
+
+File layout (little-endian):
+    8 bytes   magic  b'UFCKPT01'
+    4 bytes   uint32 header length
+    N bytes   JSON header (array table + scalar state)
+    ...       raw arrays, each aligned on 64 bytes
+
+Arrays are stored uncompressed at known offsets so a checkpoint can be
+memory-mapped and viewed without parsing or copying.
+"""
+import json
+import os
+import struct
+from typing import Dict, Tuple
+
+import numpy as np
+
+MAGIC = b'UFCKPT01'
+ALIGNMENT = 64
+VERSION = 1
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_checkpoint(path: str, arrays: Dict[str, np.ndarray], meta: Dict):
+    """Write arrays + JSON metadata atomically"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    
+    # Offsets are relative to the start of the data section, which itself
+    # starts on an aligned boundary right after the header
+    table = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        table[name] = {
+            'dtype': array.dtype.newbyteorder('<').str,
+            'shape': list(array.shape),
+            'offset': offset
+        }
+        offset += array.nbytes
+    
+    header = json.dumps({'version': VERSION, 'arrays': table, 'meta': meta}).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header))
+    
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + table[name]['offset'])
+            f.write(array.astype(table[name]['dtype'], copy=False).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Memory-map a checkpoint. Returns read-only array views backed by the
+    file and the metadata dict.
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f'Not a simulator checkpoint: {path}')
+        (header_length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    
+    if header.get('version') != VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {header.get('version')}")
+    
+    data_start = _align(len(MAGIC) + 4 + header_length)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        start = data_start + spec['offset']
+        arrays[name] = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return arrays, header['meta']
+
+
+def network_fingerprint(network) -> Dict:
+    """Cheap identity check so a checkpoint is not restored onto another network"""
+    return {
+        'nodes': network.node_count,
+        'edges': network.edge_count,
+        'first_edge': network.edge_ids[0] if network.edge_count else None,
+        'last_edge': network.edge_ids[-1] if network.edge_count else None
+    }
@@ -0,0 +1,90 @@
+"""
+Simulated clock decoupled from wall time (time warp with fixed physics steps)
+"""
+from typing import Dict
+
+
+class SimulationClock:
+    """
+    Converts elapsed wall time into a number of fixed simulation steps.
+
+    Simulated time runs at ``warp`` x wall time, but the physics always
+    advances by ``step`` simulated seconds: a frame of wall time is turned
+    into however many sub-steps it covers and the remainder is carried over
+    to the next frame. The caller keeps emitting at its own wall rate, so the
+    warp factor changes how much simulation happens between two frames, not
+    how many frames are sent.
+
+    When the simulator cannot keep up, at most ``max_steps`` sub-steps run
+    per frame and the rest of the backlog is dropped (the simulation slows
+    down instead of spiralling); ``effective_warp`` reports what was reached.
+    """
+
+    MIN_WARP = 0.1
+    MAX_WARP = 100.0
+
+    def __init__(self, step: float = 0.1, warp: float = 1.0, max_steps: int = 200):
+        if step <= 0:
+            raise ValueError('The simulation step must be positive')
+        self.step = float(step)
+        self.max_steps = int(max_steps)
+        self.warp = self.clamp(warp)
+        self.reset()
+
+    @classmethod
+    def clamp(cls, warp: float) -> float:
+        return max(cls.MIN_WARP, min(cls.MAX_WARP, float(warp)))
+
+    def reset(self):
+        """Forget the carried-over time (after a pause, stop or warp change)"""
+        self.accumulator = 0.0
+        self.dropped = 0.0
+        self._wall_window = 0.0
+        self._sim_window = 0.0
+        self.effective_warp = self.warp
+
+    def set_warp(self, warp: float) -> float:
+        """Change the time-warp factor, clamped to [MIN_WARP, MAX_WARP]"""
+        self.warp = self.clamp(warp)
+        self.reset()
+        return self.warp
+
+    def advance(self, wall_dt: float) -> int:
+        """Number of fixed steps to run for ``wall_dt`` seconds of wall time"""
+        self.accumulator += max(wall_dt, 0.0) * self.warp
+        steps = int(self.accumulator / self.step + 1e-9)
+        if steps > self.max_steps:
+            self.dropped += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator = max(self.accumulator - steps * self.step, 0.0)
+
+        # Effective warp over a sliding window of about one wall second
+        self._wall_window += wall_dt
+        self._sim_window += steps * self.step
+        if self._wall_window >= 1.0:
+            self.effective_warp = self._sim_window / self._wall_window
+            self._wall_window = self._sim_window = 0.0
+        return steps
+
+    def tick(self, simulator, wall_dt: float) -> int:
+        """
+        Advance ``simulator`` by the sub-steps covering ``wall_dt`` and
+        publish one snapshot after the last of them; returns the step count
+        """
+        steps = self.advance(wall_dt)
+        for _ in range(steps):
+            simulator.update_simulation(self.step, publish=False)
+        if steps:
+            simulator.publish()
+        return steps
+
+    def get_status(self) -> Dict:
+        return {
+            'warp': self.warp,
+            'effective_warp': round(self.effective_warp, 2),
+            'step': self.step,
+            'max_steps': self.max_steps,
+            'dropped_time': round(self.dropped, 3)
+        }
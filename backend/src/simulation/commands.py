@@ -0,0 +1,146 @@
+"""
+Simulator mutations queued from request threads and applied between ticks
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, List, NamedTuple, Tuple
+
+# Commands that add vehicles: consecutive ones are merged into one vectorized insert
+SPAWN_COMMANDS = ('add_emergency_vehicle', 'add_vehicles')
+
+
+class CommandQueueFull(RuntimeError):
+    """The simulation is not draining commands as fast as they arrive"""
+
+
+class UnsupportedCommand(RuntimeError):
+    """The simulator source cannot apply this mutation (replays, sharded runs)"""
+
+
+class Command(NamedTuple):
+    name: str
+    args: Tuple
+    kwargs: dict
+    future: Future
+
+
+class CommandQueue:
+    """
+    Bounded FIFO of calls to mutating simulator methods (start, stop,
+    add/remove vehicles, scenario change...).
+
+    Socket and HTTP handlers ``submit`` a command and wait on the returned
+    Future; the thread that ticks the simulation calls ``drain`` between two
+    ticks, so mutations never interleave with a tick and apply in arrival
+    order. Queued spawns that follow each other are inserted as one batch.
+
+    Without a tick loop attached (``attach``), commands run at once on the
+    calling thread, serialized by a lock.
+    """
+
+    def __init__(self, simulator, maxsize: int = 1024):
+        self.simulator = simulator
+        self._queue: 'queue.Queue[Command]' = queue.Queue(maxsize)
+        self._inline_lock = threading.Lock()
+        self.attached = False
+        self.executed = 0
+        self.batches = 0
+
+    def attach(self):
+        """A tick loop now drains the queue"""
+        self.attached = True
+
+    def detach(self):
+        """The tick loop stopped: apply what is left and run later commands inline"""
+        self.attached = False
+        with self._inline_lock:
+            self.drain()
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, name: str, *args, **kwargs) -> Future:
+        """Queue ``simulator.<name>(*args, **kwargs)``; the Future gets its return value"""
+        command = Command(name, args, kwargs, Future())
+        if not self.attached:
+            with self._inline_lock:
+                self._run([command])
+            return command.future
+        try:
+            self._queue.put_nowait(command)
+        except queue.Full:
+            raise CommandQueueFull(f'Command queue full ({self._queue.maxsize} pending)') from None
+        if not self.attached:  # the loop detached meanwhile: nobody else will drain
+            with self._inline_lock:
+                self.drain()
+        return command.future
+
+    def call(self, name: str, *args, timeout: float = 5.0, **kwargs) -> Any:
+        """Submit and wait for the result (re-raises the command's exception)"""
+        return self.submit(name, *args, **kwargs).result(timeout=timeout)
+
+    def drain(self) -> int:
+        """Apply every pending command (tick thread, between ticks); returns how many ran"""
+        commands: List[Command] = []
+        while True:
+            try:
+                commands.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if commands:
+            self._run(commands)
+        return len(commands)
+
+    def _run(self, commands: List[Command]):
+        commands = [c for c in commands if c.future.set_running_or_notify_cancel()]
+        i = 0
+        while i < len(commands):
+            if commands[i].name in SPAWN_COMMANDS:
+                end = i
+                while end < len(commands) and commands[end].name in SPAWN_COMMANDS:
+                    end += 1
+                self._spawn(commands[i:end])
+                i = end
+            else:
+                self._execute(commands[i])
+                i += 1
+        self.executed += len(commands)
+
+    def _execute(self, command: Command):
+        try:
+            result = getattr(self.simulator, command.name)(*command.args, **command.kwargs)
+        except Exception as e:
+            command.future.set_exception(e)
+        else:
+            command.future.set_result(result)
+
+    def _spawn(self, commands: List[Command]):
+        """One ``add_vehicles`` call for a run of spawn commands, results split back"""
+        if len(commands) == 1 and commands[0].name == 'add_emergency_vehicle':
+            self._execute(commands[0])
+            return
+
+        vehicle_types = []
+        for command in commands:
+            if command.name == 'add_emergency_vehicle':
+                vehicle_types.append('emergency')
+            else:
+                vehicle_types.extend(command.args[0] if command.args else command.kwargs['vehicle_types'])
+        try:
+            vehicles = self.simulator.add_vehicles(vehicle_types)
+        except Exception as e:
+            for command in commands:
+                command.future.set_exception(e)
+            return
+
+        self.batches += 1
+        start = 0
+        for command in commands:
+            if command.name == 'add_emergency_vehicle':
+                command.future.set_result(vehicles[start])
+                start += 1
+            else:
+                count = len(command.args[0] if command.args else command.kwargs['vehicle_types'])
+                command.future.set_result(vehicles[start:start + count])
+                start += count
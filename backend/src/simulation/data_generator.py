@@ -6,83 +6,66 @@ import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
 
+import numpy as np
+
+from .road_network import RoadNetwork, default_network
+
 class DataGenerator:
     """
     Generates realistic traffic data for mock simulation
     """
     
-    def __init__(self, bounds=None):
+    def __init__(self, bounds=None, network: RoadNetwork = None):
         self.bounds = bounds or {
             'min_lat': 48.85,
             'max_lat': 48.86,
             'min_lng': 2.35,
             'max_lng': 2.36
         }
+        self.network = network or default_network(self.bounds)
         self.road_network = self._generate_road_network()
         self.intersections = self._generate_intersections()
     
     def _generate_road_network(self) -> List[Dict]:
-        """Generate a mock road network"""
-        network = []
-        
-        # Create a grid of roads
-        lat_step = (self.bounds['max_lat'] - self.bounds['min_lat']) / 4
-        lng_step = (self.bounds['max_lng'] - self.bounds['min_lng']) / 4
-        
-        # Horizontal roads
-        for i in range(5):
-            lat = self.bounds['min_lat'] + i * lat_step
-            network.append({
-                'id': f'road_h_{i}',
-                'type': 'highway' if i == 2 else 'street',
-                'from': {'lat': lat, 'lng': self.bounds['min_lng']},
-                'to': {'lat': lat, 'lng': self.bounds['max_lng']},
-                'lanes': 2 if i == 2 else 1,
-                'speed_limit': 70 if i == 2 else 50,
-                'direction': 'bidirectional'
-            })
-        
-        # Vertical roads
-        for i in range(5):
-            lng = self.bounds['min_lng'] + i * lng_step
-            network.append({
-                'id': f'road_v_{i}',
-                'type': 'avenue' if i == 2 else 'street',
-                'from': {'lat': self.bounds['min_lat'], 'lng': lng},
-                'to': {'lat': self.bounds['max_lat'], 'lng': lng},
-                'lanes': 2 if i == 2 else 1,
-                'speed_limit': 60 if i == 2 else 50,
+        """Describe the roads of the compiled network"""
+        network = self.network
+        network_roads = []
+        
+        for road, road_id in enumerate(network.road_ids):
+            edges = np.flatnonzero(network.edge_road == road)
+            # Forward edges of a road run from its first node to its last one
+            first, last = edges[0], edges[-2] if len(edges) > 1 else edges[0]
+            network_roads.append({
+                'id': road_id,
+                'type': network.road_types[road],
+                'from': {'lat': float(network.edge_from_lat[first]), 'lng': float(network.edge_from_lng[first])},
+                'to': {'lat': float(network.edge_to_lat[last]), 'lng': float(network.edge_to_lng[last])},
+                'lanes': int(network.edge_lanes[first]),
+                'speed_limit': float(network.edge_speed_limit[first]),
                 'direction': 'bidirectional'
             })
         
-        return network
+        return network_roads
     
     def _generate_intersections(self) -> List[Dict]:
-        """Generate intersections from road network"""
+        """Generate intersections from the network nodes"""
+        network = self.network
         intersections = []
         
-        # Create intersections at road crossings
-        lat_step = (self.bounds['max_lat'] - self.bounds['min_lat']) / 4
-        lng_step = (self.bounds['max_lng'] - self.bounds['min_lng']) / 4
-        
-        for i in range(5):
-            for j in range(5):
-                lat = self.bounds['min_lat'] + i * lat_step
-                lng = self.bounds['min_lng'] + j * lng_step
-                
-                intersection = {
-                    'id': f'intersection_{i}_{j}',
-                    'position': {'lat': lat, 'lng': lng},
-                    'type': 'signalized' if (i + j) % 2 == 0 else 'unsignalized',
-                    'roads': [
-                        f'road_h_{i}',
-                        f'road_v_{j}'
-                    ],
-                    'traffic_volume': random.randint(100, 1000),
-                    'congestion_index': random.uniform(0, 1)
-                }
-                
-                intersections.append(intersection)
+        for node, node_id in enumerate(network.node_ids):
+            # Roads meeting at this node
+            roads = sorted({network.road_ids[r] for r in network.edge_road[network.outgoing(node)] if r >= 0})
+            intersection = {
+                'id': node_id,
+                'position': {'lat': float(network.node_lat[node]), 'lng': float(network.node_lng[node])},
+                # Checkerboard of signalized intersections on the (odd-sized) grid
+                'type': 'signalized' if node % 2 == 0 else 'unsignalized',
+                'roads': roads,
+                'traffic_volume': random.randint(100, 1000),
+                'congestion_index': random.uniform(0, 1)
+            }
+            
+            intersections.append(intersection)
         
         return intersections
     
@@ -139,25 +122,28 @@ class DataGenerator:
         
         specs = vehicle_specs.get(vehicle_type, vehicle_specs['passenger'])
         
-        # Generate position on a random road
-        road = random.choice(self.road_network)
+        # Generate position on a random edge of the network
+        network = self.network
+        edge = random.randrange(network.edge_count)
         progress = random.random()
         
-        lat = road['from']['lat'] + (road['to']['lat'] - road['from']['lat']) * progress
-        lng = road['from']['lng'] + (road['to']['lng'] - road['from']['lng']) * progress
+        lat = float(network.edge_from_lat[edge] + network.edge_dlat[edge] * progress)
+        lng = float(network.edge_from_lng[edge] + network.edge_dlng[edge] * progress)
         
         # Determine speed based on road type and vehicle
-        max_speed = min(specs['max_speed'], road['speed_limit'])
+        max_speed = min(specs['max_speed'], float(network.edge_speed_limit[edge]))
         speed = random.uniform(max_speed * 0.7, max_speed * 0.9)
+        road = int(network.edge_road[edge])
         
         return {
             'type': vehicle_type,
             'specifications': specs,
             'position': {'lat': lat, 'lng': lng},
             'speed': round(speed, 1),
-            'road_id': road['id'],
-            'lane': random.randint(0, road['lanes'] - 1),
-            'heading': self._calculate_heading(road, progress),
+            'road_id': network.road_ids[road] if road >= 0 else network.edge_ids[edge],
+            'edge_id': network.edge_ids[edge],
+            'lane': random.randint(0, int(network.edge_lanes[edge]) - 1),
+            'heading': float(network.edge_heading[edge]),
             'color': self._get_vehicle_color(vehicle_type)
         }
     
@@ -210,20 +196,6 @@ class DataGenerator:
         
         return metrics
     
-    def _calculate_heading(self, road: Dict, progress: float) -> float:
-        """Calculate vehicle heading based on road direction"""
-        dx = road['to']['lng'] - road['from']['lng']
-        dy = road['to']['lat'] - road['from']['lat']
-        
-        # Calculate angle in radians, convert to degrees
-        angle = (180 / 3.14159) * (3.14159 / 2 - (0 if dx == 0 else (dy / dx) if dx != 0 else 0))
-        
-        # Adjust based on direction
-        if dx < 0:
-            angle += 180
-        
-        return angle % 360
-    
     def _get_vehicle_color(self, vehicle_type: str) -> str:
         """Get color for vehicle type"""
         colors = {
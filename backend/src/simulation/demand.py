@@ -0,0 +1,115 @@
+"""
+Time-varying Poisson travel demand: how many trips start where, every tick
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+from .route_table import RouteTable
+from .vehicle_engine import DESIRED_SPEEDS, EMERGENCY
+
+# Relative trip generation per hour of the day (0h..23h), linearly interpolated
+WEEKDAY_PROFILE = (
+    0.15, 0.10, 0.08, 0.08, 0.12, 0.30, 0.65, 1.00, 0.95, 0.70, 0.60, 0.62,
+    0.68, 0.66, 0.62, 0.68, 0.85, 1.00, 0.90, 0.65, 0.45, 0.35, 0.28, 0.20,
+)
+WEEKEND_PROFILE = (
+    0.25, 0.18, 0.12, 0.10, 0.08, 0.10, 0.15, 0.25, 0.40, 0.55, 0.70, 0.80,
+    0.85, 0.85, 0.80, 0.80, 0.80, 0.75, 0.70, 0.60, 0.50, 0.45, 0.38, 0.30,
+)
+FLAT_PROFILE = (1.0,) * 24
+
+# Scenario demand: fleet size expected at the start hour, shape over the day,
+# share of emergency vehicles among new trips
+DEMAND_SCENARIOS = {
+    'default': {'vehicles': 50, 'start_hour': 10.0, 'profile': WEEKDAY_PROFILE, 'emergency_share': 0.0},
+    'rush_hour': {'vehicles': 120, 'start_hour': 7.0, 'profile': WEEKDAY_PROFILE, 'emergency_share': 0.02},
+    'emergency_test': {'vehicles': 30, 'start_hour': 14.0, 'profile': FLAT_PROFILE, 'emergency_share': 0.1},
+    'weekend': {'vehicles': 25, 'start_hour': 11.0, 'profile': WEEKEND_PROFILE, 'emergency_share': 0.0},
+}
+
+
+class DemandModel:
+    """
+    Trips start at the origin nodes of the route table ("sources"), each a
+    Poisson process whose rate follows a time-of-day profile.
+
+    The base rate is sized with Little's law: ``vehicles`` trips in flight at
+    the start hour with trips lasting the mean free-flow route time means
+    ``vehicles / mean_trip_s`` departures per second at that hour (queues at
+    red lights lengthen real trips, so the fleet settles somewhat above). Each tick
+    draws the arrival counts of every source in one Poisson call and returns
+    the route ids of the whole batch.
+    """
+
+    def __init__(self, routes: RouteTable, vehicles: float, start_hour: float = 8.0,
+                 profile: Sequence[float] = WEEKDAY_PROFILE, emergency_share: float = 0.0,
+                 weights: Sequence[float] = None):
+        if len(profile) != 24:
+            raise ValueError(f'A daily profile needs 24 hourly values, got {len(profile)}')
+        self.routes = routes
+        self.vehicles = float(vehicles)
+        self.start_hour = float(start_hour)
+        self.profile = np.asarray(profile, dtype=np.float64)
+        self.emergency_share = float(emergency_share)
+
+        # Sources: every node some route starts from
+        self.sources = np.flatnonzero(np.diff(routes.origin_indptr) > 0)
+        weights = np.ones(len(self.sources)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(weights) != len(self.sources):
+            raise ValueError(f'Expected {len(self.sources)} source weights, got {len(weights)}')
+        self.source_share = weights / weights.sum()
+
+        # Free-flow duration of every route (seconds), averaged over the regular vehicle types
+        network = routes.network
+        pace = 1.0 / np.minimum(DESIRED_SPEEDS[:EMERGENCY, None], network.edge_speed_limit)  # h/km
+        edge_s = network.edge_length * pace.mean(axis=0) * 3600.0
+        self.route_time = np.add.reduceat(edge_s[routes.edges], routes.offsets[:-1])
+        self.mean_trip_s = float(self.route_time.mean())
+
+        start_level = max(self.level_at(0.0), 1e-9)
+        self.base_rate = self.vehicles / self.mean_trip_s / start_level  # departures/s at level 1.0
+
+    @classmethod
+    def for_scenario(cls, routes: RouteTable, scenario_id: str) -> 'DemandModel':
+        """Demand of a named scenario (unknown ids get the default demand)"""
+        return cls(routes, **DEMAND_SCENARIOS.get(scenario_id, DEMAND_SCENARIOS['default']))
+
+    def restrict_to(self, nodes: np.ndarray) -> 'DemandModel':
+        """
+        Keep only the sources flagged in ``nodes`` (boolean, per node id).
+        They keep their share of the full demand, so the restricted model
+        generates exactly the trips of those sources. Returns self.
+        """
+        keep = np.asarray(nodes, dtype=bool)[self.sources]
+        self.sources = self.sources[keep]
+        self.source_share = self.source_share[keep]
+        return self
+
+    def level_at(self, t: float) -> float:
+        """Profile value ``t`` simulated seconds after the start hour"""
+        hour = (self.start_hour + t / 3600.0) % 24.0
+        low = int(hour)
+        frac = hour - low
+        return float(self.profile[low] * (1.0 - frac) + self.profile[(low + 1) % 24] * frac)
+
+    def rate_at(self, t: float) -> float:
+        """Departures per simulated second over all sources at time ``t``"""
+        return self.base_rate * self.level_at(t)
+
+    def arrivals(self, t: float, dt: float, rng: np.random.Generator, scale: float = 1.0) -> np.ndarray:
+        """Route ids of the trips starting during ``[t, t + dt)``"""
+        expected = self.source_share * (self.rate_at(t) * dt * scale)
+        counts = rng.poisson(expected)
+        if not counts.any():
+            return np.zeros(0, dtype=np.int32)
+        return self.routes.sample_from(np.repeat(self.sources, counts), rng)
+
+    def get_status(self, t: float) -> Dict:
+        return {
+            'sources': len(self.sources),
+            'hour': round((self.start_hour + t / 3600.0) % 24.0, 2),
+            'level': round(self.level_at(t), 3),
+            'departures_per_hour': round(self.rate_at(t) * 3600.0, 1),
+            'mean_trip_s': round(self.mean_trip_s, 1)
+        }
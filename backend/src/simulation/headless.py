@@ -0,0 +1,49 @@
+"""
+Headless (faster than real-time) simulation runner
+
+Usage (from backend/src):
+    python -m simulation.headless --scenario rush_hour --duration 3600 --seed 42
+"""
+import argparse
+import json
+import sys
+
+from .mock_simulator import MockSimulator
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the mock simulator without the web server')
+    parser.add_argument('--scenario', default='default', help='Scenario id (default, rush_hour, emergency_test, weekend)')
+    parser.add_argument('--duration', type=float, default=3600.0, help='Simulated duration in seconds')
+    parser.add_argument('--dt', type=float, default=0.1, help='Physics step in simulated seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed -> identical results)')
+    parser.add_argument('--vehicles', type=int, default=None, help='Override the scenario vehicle count')
+    parser.add_argument('--output', default=None, help='Write the run summary to this JSON file')
+    parser.add_argument('--record', default=None, help='Record every tick to this trajectory log')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    
+    simulator = MockSimulator({'seed': args.seed, 'verbose': False})
+    if args.record:
+        simulator.start_simulation(args.scenario, seed=args.seed, vehicle_count=args.vehicles)
+        simulator.start_recording(args.record)
+        summary = simulator.run(args.duration, dt=args.dt)
+        simulator.stop_recording()
+    else:
+        summary = simulator.run(args.duration, dt=args.dt, scenario_id=args.scenario,
+                                seed=args.seed, vehicle_count=args.vehicles)
+    
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f"💾 Summary written to {args.output}")
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,5 +5,15 @@ Simulation package
 from .mock_simulator import MockSimulator
 from .data_generator import DataGenerator
 from .vehicle_manager import VehicleManager
+from .vehicle_engine import VehicleEngine
+from .road_network import RoadNetwork, default_network
+from .spatial_index import SpatialIndex
+from .headless import main as run_headless
+from .batch_runner import BatchRunner
+from .sharded import ShardedSimulator
+from .recorder import TrajectoryRecorder, TrajectoryReader, ReplaySource
+from .clock import SimulationClock
+from .demand import DemandModel
+from .commands import CommandQueue
 
-__all__ = ['MockSimulator', 'DataGenerator', 'VehicleManager']
\ No newline at end of file
+__all__ = ['MockSimulator', 'DataGenerator', 'VehicleManager', 'VehicleEngine', 'RoadNetwork', 'default_network', 'SpatialIndex', 'run_headless', 'BatchRunner', 'ShardedSimulator', 'TrajectoryRecorder', 'TrajectoryReader', 'ReplaySource', 'SimulationClock', 'DemandModel', 'CommandQueue']
\ No newline at end of file
@@ -2,21 +2,39 @@
 Mock traffic simulator (replaces SUMO)
 """
 import time
-import random
 import threading
 from datetime import datetime
 from typing import List, Dict, Any
 import json
 
+import numpy as np
+
+from .road_network import RoadNetwork, default_network
+from .signal_plan import SignalPlan, MovementMap, parse_state, snap_to_nodes
+from .demand import DemandModel, DEMAND_SCENARIOS
+from .profiling import NULL_TIMER
+from .snapshot import Snapshot, light_dicts
+from .checkpoint import read_checkpoint, write_checkpoint, network_fingerprint
+from .vehicle_engine import (
+    VehicleEngine, VEHICLE_TYPES, TYPE_COLOR_CODES, COLOR_PALETTE,
+    EMERGENCY, EMERGENCY_SUBTYPES
+)
+
+# Checkpoint header fields load_checkpoint reads unconditionally
+CHECKPOINT_META = ('network', 'traffic_light_ids', 'simulation_time', 'current_scenario',
+                   'is_running', 'is_paused', 'seed', 'stats', 'metrics', 'rng_state')
+
 class MockSimulator:
     """
     Simulates SUMO for frontend development
     Generates realistic vehicle movement data
     """
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, network: RoadNetwork = None):
         self.config = config or {}
-        self.vehicles: List[Dict] = []
+        self.seed = self.config.get('seed')
+        self.rng = np.random.default_rng(self.seed)
+        self.verbose = self.config.get('verbose', True)
         self.traffic_lights: List[Dict] = []
         self.metrics: Dict = {}
         self.is_running = False
@@ -25,6 +43,12 @@ class MockSimulator:
         self.simulation_time = 0
         self.start_real_time = None
         self.update_interval = self.config.get('update_interval', 0.1)
+        self.metrics_interval = self.config.get('metrics_interval', 0.0)  # 0 = every tick
+        self.demand_scale = self.config.get('demand_scale', 1.0)  # share of the scenario's trip demand
+        self.last_metrics_time = 0.0
+        self.timer = NULL_TIMER  # a profiling.PhaseTimer times each phase of a tick
+        self.recorder = None  # recorder.TrajectoryRecorder while recording
+        self.tick_count = 0
         self.network_bounds = self.config.get('network_bounds', {
             'min_lat': 48.85,
             'max_lat': 48.86,
@@ -34,14 +58,19 @@ class MockSimulator:
         
         # Initialize
         self._initialize_traffic_lights()
-        self._initialize_network_edges()
+        self._initialize_network(network)
+        self._initialize_signals()
+        self._initialize_vehicle_engine()
         
         # Statistics
         self.stats = {
             'total_vehicles_created': 0,
             'total_distance_traveled': 0,
-            'emergency_vehicles_served': 0
+            'emergency_vehicles_served': 0,
+            'trips_completed': 0
         }
+        
+        self.publish()
     
     def _initialize_traffic_lights(self):
         """Initialize mock traffic lights"""
@@ -57,7 +86,7 @@ class MockSimulator:
                     {'duration': 30, 'state': 'rrrGGG'},
                     {'duration': 5, 'state': 'rrryyy'},
                 ],
-                'lastChange': time.time(),
+                'lastChange': 0.0,
                 'efficiency': 0.85
             },
             {
@@ -71,7 +100,7 @@ class MockSimulator:
                     {'duration': 25, 'state': 'GGGrrr'},
                     {'duration': 5, 'state': 'yyyrrr'},
                 ],
-                'lastChange': time.time(),
+                'lastChange': 0.0,
                 'efficiency': 0.78
             },
             {
@@ -85,332 +114,505 @@ class MockSimulator:
                     {'duration': 20, 'state': 'rrGGrr'},
                     {'duration': 5, 'state': 'rryyrr'},
                 ],
-                'lastChange': time.time(),
+                'lastChange': 0.0,
                 'efficiency': 0.92
             }
         ]
     
-    def _initialize_network_edges(self):
-        """Initialize network edges for vehicle movement"""
-        self.edges = [
-            {'id': 'edge_1', 'from_lat': 48.8500, 'from_lng': 2.3500, 'to_lat': 48.8510, 'to_lng': 2.3510, 'length': 1.0},
-            {'id': 'edge_2', 'from_lat': 48.8510, 'from_lng': 2.3510, 'to_lat': 48.8520, 'to_lng': 2.3520, 'length': 1.0},
-            {'id': 'edge_3', 'from_lat': 48.8520, 'from_lng': 2.3520, 'to_lat': 48.8530, 'to_lng': 2.3530, 'length': 1.0},
-            {'id': 'edge_4', 'from_lat': 48.8530, 'from_lng': 2.3530, 'to_lat': 48.8540, 'to_lng': 2.3540, 'length': 1.0},
-            {'id': 'edge_5', 'from_lat': 48.8540, 'from_lng': 2.3540, 'to_lat': 48.8550, 'to_lng': 2.3550, 'length': 1.0},
-        ]
+    def _initialize_signals(self):
+        """Compile the signal plans and map every approach lane to its light and link"""
+        self.signal_plan = SignalPlan.from_lights(self.traffic_lights)
+        self.light_phase, self.light_elapsed = self.signal_plan.flat_phase_at(self.simulation_time)
+        self.light_nodes = snap_to_nodes(
+            self.network,
+            [tl['position']['lat'] for tl in self.traffic_lights],
+            [tl['position']['lng'] for tl in self.traffic_lights]
+        )
+        self.movements = MovementMap(self.network, self.light_nodes, self.signal_plan.link_count)
+    
+    def add_traffic_light(self, traffic_light: Dict) -> Dict:
+        """Add a traffic light and give it control of its nearest free intersection"""
+        if len(self.traffic_lights) >= self.network.node_count:
+            raise ValueError('No free intersection left for a new traffic light')
+        # Own copy: snapshots share the stored dicts, the caller keeps theirs
+        traffic_light = dict(traffic_light, phases=[dict(phase) for phase in traffic_light['phases']])
+        self.traffic_lights.append(traffic_light)
+        anchors = (self.signal_plan.anchor_time, self.signal_plan.anchor_pos)
+        self._initialize_signals()
+        # Lights already running keep their timing
+        self.signal_plan.anchor_time[:-1], self.signal_plan.anchor_pos[:-1] = anchors
+        self._update_traffic_lights(0.0)
+        self.publish()
+        return traffic_light
     
-    def start_simulation(self, scenario_id: str = 'default'):
+    def retime_traffic_light(self, tl_id: str, durations: List[float]) -> Dict:
+        """
+        Actuated control: new phase durations for a light, effective now.
+        KeyError for an unknown light, ValueError unless there is one
+        positive duration per phase.
+        """
+        light = self._light_index(tl_id)
+        tl = self.traffic_lights[light]
+        durations = [float(d) for d in durations]
+        if len(durations) != len(tl['phases']):
+            raise ValueError(f"Traffic light {tl_id} has {len(tl['phases'])} phases, got {len(durations)} durations")
+        if not all(d > 0 for d in durations):
+            raise ValueError('Phase durations must be positive')
+        # New plan and dicts: the ones published in snapshots are never modified
+        plan = self.signal_plan.copy()
+        plan.retime(light, durations, self.simulation_time)
+        self.signal_plan = plan
+        self.traffic_lights[light] = dict(tl, phases=[dict(phase, duration=duration)
+                                                      for phase, duration in zip(tl['phases'], durations)])
+        self._update_traffic_lights(0.0)
+        self.publish()
+        return self.snapshot.lights[light]
+    
+    def _initialize_network(self, network: RoadNetwork = None):
+        """Attach the compiled road network used for vehicle movement"""
+        self.network = network or default_network(self.network_bounds)
+    
+    def _initialize_vehicle_engine(self):
+        """Create the vectorized vehicle engine on top of the network"""
+        self.engine = VehicleEngine(
+            self.network,
+            rng=self.rng,
+            capacity=self.config.get('vehicle_capacity', 1024)
+        )
+        self.demand = self._demand_for('default')
+    
+    def _demand_for(self, scenario_id: str) -> DemandModel:
+        """Trip demand of a scenario over this simulator's sources"""
+        return DemandModel.for_scenario(self.engine.routes, scenario_id)
+    
+    def start_simulation(self, scenario_id: str = 'default', seed: int = None,
+                         vehicle_count: int = None):
         """Start simulation with given scenario"""
+        if seed is not None:
+            self.reseed(seed)
+        
         self.current_scenario = scenario_id
+        self.demand = self._demand_for(scenario_id)
         self.is_running = True
         self.is_paused = False
         self.simulation_time = 0
+        self.last_metrics_time = 0.0
         self.start_real_time = time.time()
+        self._reset_traffic_lights()
         
         # Generate initial vehicles based on scenario
-        vehicle_count = self._get_vehicle_count_for_scenario(scenario_id)
+        if vehicle_count is None:
+            vehicle_count = self._get_vehicle_count_for_scenario(scenario_id)
         self._generate_initial_vehicles(vehicle_count)
+        self.publish()
         
-        print(f"✅ Simulation started with scenario: {scenario_id}")
-        print(f"   Vehicles: {vehicle_count}")
+        if self.verbose:
+            print(f"✅ Simulation started with scenario: {scenario_id}")
+            print(f"   Vehicles: {vehicle_count}")
         
         return True
     
     def stop_simulation(self):
         """Stop simulation"""
+        self.stop_recording()
         self.is_running = False
         self.is_paused = False
-        self.vehicles.clear()
+        self.engine.clear()
         self.simulation_time = 0
-        print("⏹️ Simulation stopped")
+        self.publish()
+        if self.verbose:
+            print("⏹️ Simulation stopped")
         
         return True
     
+    def change_scenario(self, scenario_id: str) -> bool:
+        """Restart the running simulation on another scenario"""
+        self.stop_simulation()
+        return self.start_simulation(scenario_id)
+    
     def pause_simulation(self):
         """Pause simulation"""
         self.is_paused = True
-        print("⏸️ Simulation paused")
+        self.publish()
+        if self.verbose:
+            print("⏸️ Simulation paused")
         
         return True
     
     def resume_simulation(self):
         """Resume simulation"""
         self.is_paused = False
-        print("▶️ Simulation resumed")
+        self.publish()
+        if self.verbose:
+            print("▶️ Simulation resumed")
         
         return True
     
+    def start_recording(self, path: str, keyframe_interval: int = 50):
+        """Record every following tick to a trajectory log (see simulation.recorder)"""
+        from .recorder import TrajectoryRecorder
+        
+        self.stop_recording()
+        self.recorder = TrajectoryRecorder(path, self, keyframe_interval)
+        self.recorder.record()  # initial state
+        if self.verbose:
+            print(f"⏺️ Recording to {path}")
+        return self.recorder
+    
+    def stop_recording(self):
+        """Close the current recording, if any"""
+        if self.recorder is not None:
+            self.recorder.close()
+            if self.verbose:
+                print(f"⏹️ Recording saved: {self.recorder.path} ({self.recorder.frames} frames)")
+            self.recorder = None
+    
+    def reseed(self, seed: int):
+        """Restart the random stream (same seed -> same simulation)"""
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.engine.rng = self.rng
+    
+    def run(self, duration_s: float, dt: float = 0.1, scenario_id: str = None,
+            seed: int = None, vehicle_count: int = None) -> Dict:
+        """
+        Headless run: advance the simulated clock by ``duration_s`` in fixed
+        ``dt`` steps as fast as the CPU allows and return the run summary.
+        Starts the scenario first unless a simulation is already running.
+        """
+        if scenario_id is not None or not self.is_running:
+            self.start_simulation(scenario_id or 'default', seed=seed, vehicle_count=vehicle_count)
+        
+        steps = int(round(duration_s / dt))
+        wall_start = time.perf_counter()
+        for _ in range(steps):
+            self.update_simulation(dt, publish=False)
+        wall_time = time.perf_counter() - wall_start
+        self.publish()
+        
+        return self.get_run_summary(steps=steps, wall_time=wall_time)
+    
+    def get_run_summary(self, steps: int = None, wall_time: float = None) -> Dict:
+        """Deterministic KPIs of the current run (no wall-clock fields except timings)"""
+        metrics = self.calculate_metrics()
+        metrics.pop('timestamp', None)
+        
+        summary = {
+            'scenario': self.current_scenario,
+            'seed': self.seed,
+            'simulation_time': round(self.simulation_time, 3),
+            'vehicle_count': self.vehicle_count,
+            'metrics': metrics,
+            'stats': dict(self.stats)
+        }
+        if steps is not None:
+            summary['steps'] = steps
+        if wall_time is not None:
+            summary['wall_time_s'] = round(wall_time, 3)
+            summary['realtime_factor'] = round(self.simulation_time / wall_time, 1) if wall_time > 0 else None
+        return summary
+    
     def _get_vehicle_count_for_scenario(self, scenario_id: str) -> int:
         """Get vehicle count based on scenario"""
-        scenario_counts = {
-            'default': 50,
-            'rush_hour': 120,
-            'emergency_test': 30,
-            'weekend': 25
-        }
-        return scenario_counts.get(scenario_id, 50)
+        return DEMAND_SCENARIOS.get(scenario_id, DEMAND_SCENARIOS['default'])['vehicles']
+    
+    # Speed ranges (km/h) indexed by vehicle type code
+    SPEED_RANGES = np.array([
+        (30, 60),  # passenger
+        (20, 40),  # bus
+        (30, 70),  # truck
+        (40, 80),  # motorcycle
+        (15, 25),  # bicycle
+        (60, 90),  # emergency
+    ], dtype=np.float64)
+    
+    @property
+    def vehicles(self) -> List[Dict]:
+        """Serialized vehicle list of the latest published snapshot"""
+        return self.snapshot.vehicles
+    
+    @property
+    def vehicle_count(self) -> int:
+        """Number of vehicles currently simulated"""
+        return self.engine.count
+    
+    def _next_serials(self, count: int) -> np.ndarray:
+        """Reserve ``count`` vehicle serial numbers"""
+        first = self.stats['total_vehicles_created']
+        self.stats['total_vehicles_created'] += count
+        return np.arange(first, first + count, dtype=np.int64)
     
     def _generate_initial_vehicles(self, count: int):
         """Generate initial vehicles"""
-        self.vehicles = []
-        vehicle_types = ['passenger', 'bus', 'truck', 'motorcycle', 'bicycle']
-        colors = ['#3b82f6', '#10b981', '#8b5cf6', '#f59e0b', '#ef4444', '#06b6d4']
-        
-        for i in range(count):
-            vehicle_type = random.choice(vehicle_types)
-            color = colors[i % len(colors)]
-            
-            # Choose random edge
-            edge = random.choice(self.edges)
-            
-            # Interpolate position along edge
-            progress = random.random()
-            lat = edge['from_lat'] + (edge['to_lat'] - edge['from_lat']) * progress
-            lng = edge['from_lng'] + (edge['to_lng'] - edge['from_lng']) * progress
-            
-            # Set speed based on vehicle type
-            speed_ranges = {
-                'passenger': (30, 60),
-                'bus': (20, 40),
-                'truck': (30, 70),
-                'motorcycle': (40, 80),
-                'bicycle': (15, 25),
-                'emergency': (60, 90)
-            }
-            min_speed, max_speed = speed_ranges.get(vehicle_type, (30, 60))
-            
-            vehicle = {
-                'id': f'veh_{i:03d}',
-                'type': vehicle_type,
-                'position': {'lat': lat, 'lng': lng},
-                'speed': round(random.uniform(min_speed, max_speed), 1),
-                'lane': f'{edge["id"]}_lane_{random.randint(0, 1)}',
-                'route': [edge['id']] + [e['id'] for e in random.sample(self.edges, 2)],
-                'color': color,
-                'heading': random.uniform(0, 360),
-                'edge': edge['id'],
-                'progress': progress,
-                'direction': 1 if random.random() > 0.5 else -1,
-                'distanceTraveled': 0,
-                'createdAt': time.time()
-            }
-            self.vehicles.append(vehicle)
-            self.stats['total_vehicles_created'] += 1
+        self.engine.clear()
+        if count <= 0:
+            return
+        
+        # Regular types only (emergency vehicles are added on demand)
+        vtype = self.rng.integers(0, EMERGENCY, count).astype(np.uint8)
+        color = (np.arange(count) % len(COLOR_PALETTE)).astype(np.uint8)
+        
+        # Spread the fleet along precomputed routes
+        routes = self.engine.routes
+        route_id = routes.sample(count, self.rng)
+        route_pos = (self.rng.random(count) * routes.length[route_id]).astype(np.int32)
+        progress = self.rng.random(count)
+        
+        # Set speed based on vehicle type
+        low, high = self.SPEED_RANGES[vtype, 0], self.SPEED_RANGES[vtype, 1]
+        speed = np.round(self.rng.uniform(low, high), 1)
+        
+        self.engine.spawn(
+            serial=self._next_serials(count),
+            vtype=vtype,
+            color=color,
+            route_id=route_id,
+            route_pos=route_pos,
+            progress=progress,
+            speed=speed,
+            created=self.simulation_time
+        )
     
-    def update_simulation(self, delta_time: float = 0.1):
-        """Update simulation by one time step"""
+    def update_simulation(self, delta_time: float = 0.1, publish: bool = True):
+        """
+        Update simulation by one time step. ``publish=False`` skips the
+        snapshot, for callers running several steps per frame that publish
+        once after the last one.
+        """
         if not self.is_running or self.is_paused:
             return
         
         self.simulation_time += delta_time
+        timer = self.timer
+        timer.start()
         
         # Update traffic lights
         self._update_traffic_lights(delta_time)
+        timer.mark('lights')
         
         # Update vehicle positions
         self._update_vehicles(delta_time)
+        timer.mark('vehicles')
+        
+        # Start the trips demanded during this step
+        self._manage_vehicle_population(delta_time)
+        timer.mark('population')
+        
+        # Refresh metrics at their own cadence (simulated seconds)
+        if self.simulation_time - self.last_metrics_time >= self.metrics_interval - 1e-9:
+            self.metrics = self.calculate_metrics()
+            self.last_metrics_time = self.simulation_time
+        timer.mark('metrics')
         
-        # Randomly add/remove vehicles
-        self._manage_vehicle_population()
+        if self.recorder is not None:
+            self.recorder.record()
+            timer.mark('record')
         
-        # Calculate metrics
-        self.metrics = self.calculate_metrics()
+        self.tick_count += 1
+        if publish:
+            self.publish()
+            timer.mark('publish')
+    
+    def publish(self):
+        """
+        Publish the current state as an immutable Snapshot. Rebinding
+        ``self.snapshot`` is atomic, so readers never see a half-updated tick.
+        """
+        self.snapshot = Snapshot(self, self.tick_count)
+    
+    def _reset_traffic_lights(self):
+        """Put every light back in its initial phase at simulated time 0"""
+        self.signal_plan = self.signal_plan.copy()
+        self.signal_plan.reset()
+        self._update_traffic_lights(0.0)
     
     def _update_traffic_lights(self, delta_time: float):
-        """Update traffic light states"""
-        current_time = time.time()
-        
-        for tl in self.traffic_lights:
-            phase = tl['phases'][tl['currentPhase']]
-            
-            # Check if phase duration has elapsed
-            if current_time - tl.get('lastChange', 0) > phase['duration']:
-                tl['currentPhase'] = (tl['currentPhase'] + 1) % len(tl['phases'])
-                tl['state'] = tl['phases'][tl['currentPhase']]['state']
-                tl['lastChange'] = current_time
+        """Evaluate every light at the current simulated time (closed form, no per-light loop)"""
+        self.light_phase, self.light_elapsed = self.signal_plan.flat_phase_at(self.simulation_time)
+    
+    def _light_dicts(self) -> List[Dict]:
+        """Light dicts with their current state (only when serializing)"""
+        return light_dicts(self.traffic_lights, self.signal_plan, self.light_phase,
+                           self.light_elapsed, self.simulation_time)
     
     def _update_vehicles(self, delta_time: float):
         """Update vehicle positions and speeds"""
-        for vehicle in self.vehicles:
-            # Check if vehicle is at traffic light
-            near_traffic_light = self._is_near_traffic_light(vehicle)
-            
-            # Adjust speed based on traffic light
-            if near_traffic_light and near_traffic_light['state'][0] == 'r':  # Red light
-                vehicle['speed'] = max(0, vehicle['speed'] - 20 * delta_time)  # Decelerate
-            else:
-                # Normal speed with some variation
-                base_speed = 50 if vehicle['type'] != 'emergency' else 70
-                target_speed = base_speed + random.uniform(-10, 10)
-                vehicle['speed'] += (target_speed - vehicle['speed']) * 0.1
-            
-            # Update progress along edge
-            speed_mps = vehicle['speed'] / 3.6  # Convert km/h to m/s
-            distance = speed_mps * delta_time
-            progress_delta = distance / 1000  # Convert to km progress
-            
-            vehicle['progress'] += progress_delta * vehicle['direction']
-            vehicle['distanceTraveled'] += distance / 1000  # in km
-            
-            # If vehicle reached end of edge, move to next edge
-            if vehicle['progress'] > 1.0 or vehicle['progress'] < 0:
-                # Get next edge from route
-                current_edge_idx = vehicle['route'].index(vehicle['edge']) if vehicle['edge'] in vehicle['route'] else 0
-                next_edge_idx = (current_edge_idx + 1) % len(vehicle['route'])
-                next_edge_id = vehicle['route'][next_edge_idx]
-                
-                # Find next edge
-                next_edge = next((e for e in self.edges if e['id'] == next_edge_id), None)
-                
-                if next_edge:
-                    vehicle['edge'] = next_edge_id
-                    vehicle['progress'] = 0 if vehicle['direction'] > 0 else 1.0
-                    vehicle['lane'] = f'{next_edge_id}_lane_{random.randint(0, 1)}'
-            
-            # Update position based on progress
-            edge = next((e for e in self.edges if e['id'] == vehicle['edge']), None)
-            if edge:
-                lat = edge['from_lat'] + (edge['to_lat'] - edge['from_lat']) * vehicle['progress']
-                lng = edge['from_lng'] + (edge['to_lng'] - edge['from_lng']) * vehicle['progress']
-                vehicle['position'] = {'lat': lat, 'lng': lng}
-                
-                # Update heading (direction of travel)
-                dx = edge['to_lng'] - edge['from_lng']
-                dy = edge['to_lat'] - edge['from_lat']
-                vehicle['heading'] = (180 / 3.14159) * (3.14159 / 2 - (0 if dx == 0 else (dy / dx) if dx != 0 else 0))
-    
-    def _is_near_traffic_light(self, vehicle: Dict) -> Dict:
-        """Check if vehicle is near a traffic light"""
-        for tl in self.traffic_lights:
-            # Simple distance check (in reality, use proper distance calculation)
-            dist = abs(vehicle['position']['lat'] - tl['position']['lat']) + abs(vehicle['position']['lng'] - tl['position']['lng'])
-            if dist < 0.001:  # Within ~100m
-                return tl
-        return None
-    
-    def _manage_vehicle_population(self):
-        """Randomly add or remove vehicles"""
-        # Random chance to add vehicle
-        if random.random() < 0.1:  # 10% chance each update
-            self._add_random_vehicle()
-        
-        # Random chance to remove vehicle
-        if random.random() < 0.05 and len(self.vehicles) > 10:  # 5% chance, keep at least 10
-            vehicle_to_remove = random.choice(self.vehicles)
-            self.vehicles.remove(vehicle_to_remove)
-    
-    def _add_random_vehicle(self):
-        """Add a random vehicle to simulation"""
-        vehicle_types = ['passenger', 'bus', 'truck', 'motorcycle', 'bicycle']
-        if random.random() < 0.1:  # 10% chance for emergency
-            vehicle_type = 'emergency'
-        else:
-            vehicle_type = random.choice(vehicle_types)
-        
-        colors = {
-            'passenger': '#3b82f6',
-            'emergency': '#ef4444',
-            'bus': '#f59e0b',
-            'truck': '#8b5cf6',
-            'motorcycle': '#10b981',
-            'bicycle': '#06b6d4'
-        }
+        self.engine.step(delta_time, self._red_light_mask())
         
-        edge = random.choice(self.edges)
-        progress = random.random()
-        lat = edge['from_lat'] + (edge['to_lat'] - edge['from_lat']) * progress
-        lng = edge['from_lng'] + (edge['to_lng'] - edge['from_lng']) * progress
-        
-        vehicle = {
-            'id': f'veh_{self.stats["total_vehicles_created"]:04d}',
-            'type': vehicle_type,
-            'position': {'lat': lat, 'lng': lng},
-            'speed': random.uniform(30, 60),
-            'lane': f'{edge["id"]}_lane_{random.randint(0, 1)}',
-            'route': [edge['id']] + [e['id'] for e in random.sample(self.edges, 2)],
-            'color': colors.get(vehicle_type, '#3b82f6'),
-            'heading': random.uniform(0, 360),
-            'edge': edge['id'],
-            'progress': progress,
-            'direction': 1 if random.random() > 0.5 else -1,
-            'distanceTraveled': 0,
-            'createdAt': time.time()
-        }
+        # Vehicles at their destination leave the network
+        arrived = self.engine.arrived
+        if len(arrived):
+            self.stats['trips_completed'] += self.engine.remove(arrived)
+    
+    def _red_light_mask(self) -> np.ndarray:
+        """Flag vehicles whose movement is red at the intersection they approach"""
+        n = self.engine.count
+        red_planes = self.signal_plan.red[self.light_phase]
+        return self.movements.facing(
+            red_planes, self.engine.edge[:n], self.engine.direction[:n], self.engine.lane[:n])
+    
+    def _manage_vehicle_population(self, delta_time: float):
+        """Spawn the Poisson arrivals of every demand source in one batch"""
+        route_id = self.demand.arrivals(self.simulation_time, delta_time, self.rng, self.demand_scale)
+        if len(route_id):
+            self._spawn_trips(route_id)
+    
+    def _spawn_trips(self, route_id: np.ndarray):
+        """Add one vehicle at the start of each route"""
+        count = len(route_id)
+        vtype = self.rng.integers(0, EMERGENCY, count).astype(np.uint8)
+        vtype[self.rng.random(count) < self.demand.emergency_share] = EMERGENCY
         
-        self.vehicles.append(vehicle)
-        self.stats['total_vehicles_created'] += 1
+        low, high = self.SPEED_RANGES[vtype, 0], self.SPEED_RANGES[vtype, 1]
+        self.engine.spawn(
+            serial=self._next_serials(count),
+            vtype=vtype,
+            color=TYPE_COLOR_CODES[vtype],
+            route_id=route_id,
+            progress=np.zeros(count),
+            speed=np.round(self.rng.uniform(low, high), 1),
+            created=self.simulation_time
+        )
     
     def add_emergency_vehicle(self) -> Dict:
         """Add an emergency vehicle"""
-        edge = random.choice(self.edges)
-        progress = random.random()
-        lat = edge['from_lat'] + (edge['to_lat'] - edge['from_lat']) * progress
-        lng = edge['from_lng'] + (edge['to_lng'] - edge['from_lng']) * progress
-        
-        emergency_types = ['ambulance', 'police', 'fire_truck']
-        
-        vehicle = {
-            'id': f'emergency_{self.stats["total_vehicles_created"]:04d}',
-            'type': 'emergency',
-            'subtype': random.choice(emergency_types),
-            'position': {'lat': lat, 'lng': lng},
-            'speed': random.uniform(60, 90),
-            'lane': f'{edge["id"]}_lane_{random.randint(0, 1)}',
-            'route': [edge['id']] + [e['id'] for e in random.sample(self.edges, 3)],
-            'color': '#ef4444',
-            'heading': random.uniform(0, 360),
-            'edge': edge['id'],
-            'progress': progress,
-            'direction': 1 if random.random() > 0.5 else -1,
-            'distanceTraveled': 0,
-            'sirenActive': True,
-            'priority': 'highest',
-            'createdAt': time.time()
+        return self.add_vehicles(['emergency'])[0]
+    
+    def add_vehicles(self, vehicle_types: List[str]) -> List[Dict]:
+        """
+        Add one vehicle per requested type in a single insert, each at the
+        start of a random route. Emergency vehicles get a random subtype.
+        """
+        unknown = set(vehicle_types) - set(VEHICLE_TYPES)
+        if unknown:
+            raise ValueError(f'Unknown vehicle type(s): {", ".join(sorted(unknown))}')
+        count = len(vehicle_types)
+        if not count:
+            return []
+        
+        vtype = np.array([VEHICLE_TYPES.index(t) for t in vehicle_types], dtype=np.uint8)
+        emergency = vtype == EMERGENCY
+        subtype = np.where(emergency, self.rng.integers(1, len(EMERGENCY_SUBTYPES), count), 0)
+        low, high = self.SPEED_RANGES[vtype, 0], self.SPEED_RANGES[vtype, 1]
+        
+        slots = self.engine.spawn(
+            serial=self._next_serials(count),
+            vtype=vtype,
+            color=TYPE_COLOR_CODES[vtype],
+            subtype=subtype.astype(np.uint8),
+            route_id=self.engine.routes.sample(count, self.rng),
+            progress=np.zeros(count),
+            speed=np.round(self.rng.uniform(low, high), 1),
+            created=self.simulation_time
+        )
+        self.stats['emergency_vehicles_served'] += int(emergency.sum())
+        vehicles = self.engine.to_dicts(slots)
+        self.publish()
+        
+        return vehicles
+    
+    def get_lane_data(self, edges=None) -> List[Dict]:
+        """
+        Queue length and arrival rate per lane, in the format expected by
+        MaxPressureAlgorithm.calculate_pressure
+        """
+        network, movements = self.network, self.movements
+        edges = np.arange(network.edge_count) if edges is None else np.asarray(edges, dtype=np.int64)
+        lane_counts = network.edge_lanes[edges].astype(np.int64)
+        hours = max(self.simulation_time, 1e-9) / 3600.0
+        arrival_rate = np.round(self.engine.edge_arrivals[edges] / hours / lane_counts, 1)  # vehicles/hour
+        
+        # One row per (edge, lane)
+        edge = np.repeat(edges, lane_counts)
+        lane = np.arange(len(edge)) - np.repeat(np.cumsum(lane_counts) - lane_counts, lane_counts)
+        queue_length = self.engine.queue_lengths()[edge, lane]
+        light = movements.light[edge, 1, lane].astype(np.int64)
+        signalized = light >= 0
+        link = np.full(len(edge), -1, dtype=np.int64)
+        link[signalized] = np.log2(movements.bit[edge, 1, lane][signalized].astype(np.float64))  # one bit set
+        link_count = self.signal_plan.link_count[np.maximum(light, 0)]
+        green_mask = movements.axis_mask[edge, 1, lane]
+        
+        edge_ids = network.edge_ids
+        light_ids = [tl['id'] for tl in self.traffic_lights]
+        lanes = []
+        for e, k, queue, rate, tl, ln, links, mask in zip(
+                edge.tolist(), lane.tolist(), queue_length.tolist(), np.repeat(arrival_rate, lane_counts).tolist(),
+                light.tolist(), link.tolist(), link_count.tolist(), green_mask.tolist()):
+            lane_data = {
+                'id': f'{edge_ids[e]}_lane_{k}',
+                'edge': edge_ids[e],
+                'queue_length': queue,
+                'arrival_rate': rate,
+                'saturation_flow': 1800
+            }
+            if tl >= 0:
+                # Signal link serving this lane and the links compatible with it
+                lane_data['traffic_light'] = light_ids[tl]
+                lane_data['link'] = ln
+                lane_data['link_count'] = links
+                lane_data['green_mask'] = mask
+            lanes.append(lane_data)
+        return lanes
+    
+    def _light_index(self, tl_id: str) -> int:
+        """Index of a traffic light, KeyError for an unknown id"""
+        for light, tl in enumerate(self.traffic_lights):
+            if tl['id'] == tl_id:
+                return light
+        raise KeyError(tl_id)
+    
+    def get_intersection_data(self, tl_id: str) -> Dict:
+        """Approach lanes of the intersection a light controls (input of MaxPressureAlgorithm.optimize_signals)"""
+        node = int(self.light_nodes[self._light_index(tl_id)])
+        return {
+            'id': tl_id,
+            'node': self.network.node_ids[node],
+            'approaches': self.get_lane_data(self.network.incoming(node))
         }
+    
+    def optimize_traffic_light(self, tl_id: str, algorithm) -> Dict:
+        """
+        Re-time a light from the live queues of its approaches. ``algorithm``
+        proposes one phase per approach lane (MaxPressureAlgorithm); each green
+        phase of the light then lasts as long as the longest proposed phase
+        sharing one of its green links. Yellow and unserved phases keep their
+        durations.
+        """
+        light = self._light_index(tl_id)
+        result = algorithm.optimize_signals(self.get_intersection_data(tl_id))
         
-        self.vehicles.append(vehicle)
-        self.stats['total_vehicles_created'] += 1
-        self.stats['emergency_vehicles_served'] += 1
+        plan = self.signal_plan
+        start, end = plan.phase_ptr[light], plan.phase_ptr[light + 1]
+        green = plan.green[start:end]
+        durations = plan.durations[start:end].copy()
+        proposed = np.zeros(end - start)
+        for phase in result['phases']:
+            served = (green & np.uint64(parse_state(phase['state'])[0])) != 0
+            proposed[served] = np.maximum(proposed[served], phase['duration'])
+        durations[proposed > 0] = proposed[proposed > 0]
         
-        return vehicle
+        return {
+            'optimization': result,
+            'traffic_light': self.retime_traffic_light(tl_id, durations.tolist())
+        }
     
     def calculate_metrics(self) -> Dict:
-        """Calculate simulation metrics"""
-        if not self.vehicles:
+        """Calculate simulation metrics (O(1): reads the engine's running totals)"""
+        totals = self.engine.totals
+        if not totals.count:
             return self._get_default_metrics()
         
-        total_vehicles = len(self.vehicles)
-        total_speed = sum(v['speed'] for v in self.vehicles)
-        avg_speed = total_speed / total_vehicles
-        
-        # Count vehicle types
-        vehicle_counts = {}
-        for v in self.vehicles:
-            v_type = v['type']
-            vehicle_counts[v_type] = vehicle_counts.get(v_type, 0) + 1
-        
-        # Calculate CO2 emissions (simplified)
-        total_distance = sum(v['distanceTraveled'] for v in self.vehicles)
-        co2_per_km = {
-            'passenger': 120,
-            'emergency': 180,
-            'bus': 80,
-            'truck': 150,
-            'motorcycle': 60,
-            'bicycle': 0
-        }
-        
-        co2_emissions = 0
-        for v in self.vehicles:
-            co2_emissions += v['distanceTraveled'] * co2_per_km.get(v['type'], 100)
+        avg_speed = totals.avg_speed
+        vehicle_counts = {VEHICLE_TYPES[code]: int(c) for code, c in enumerate(totals.type_counts) if c}
+        total_distance = totals.distance_sum
         
         return {
             'timestamp': datetime.utcnow().isoformat(),
-            'totalVehicles': total_vehicles,
+            'totalVehicles': totals.count,
             'avgSpeed': round(avg_speed, 1),
-            'avgTravelTime': round(random.uniform(30.0, 90.0), 1),
-            'co2Emissions': round(co2_emissions, 1),
+            'avgTravelTime': round(totals.avg_travel_time(self.simulation_time), 1),
+            'co2Emissions': round(totals.co2_sum, 1),
             'vehicleCounts': vehicle_counts,
             'emergencyVehiclesActive': vehicle_counts.get('emergency', 0),
             'throughput': round(total_distance * 60),  # km per hour approximation
@@ -445,30 +647,141 @@ class MockSimulator:
         }
     
     def get_simulation_data(self) -> Dict:
-        """Get complete simulation data for WebSocket"""
-        return {
-            'vehicles': self.vehicles,
-            'traffic_lights': self.traffic_lights,
-            'metrics': self.metrics,
-            'timestamp': time.time(),
+        """Get complete simulation data for WebSocket (from the latest published snapshot)"""
+        return self.snapshot.to_dict()
+    
+    def save_checkpoint(self, path: str):
+        """Write vehicles, traffic-light state, stats and RNG state to a binary file"""
+        arrays = dict(self.engine.export_columns())
+        arrays['edge_arrivals'] = self.engine.edge_arrivals
+        for name, values in self.signal_plan.export_arrays().items():
+            arrays[f'tl_{name}'] = values
+        
+        meta = {
+            'network': network_fingerprint(self.network),
+            'routes': self.engine.routes.fingerprint(),
+            'traffic_light_ids': [tl['id'] for tl in self.traffic_lights],
             'simulation_time': self.simulation_time,
-            'scenario': self.current_scenario,
+            'last_metrics_time': self.last_metrics_time,
+            'current_scenario': self.current_scenario,
             'is_running': self.is_running,
             'is_paused': self.is_paused,
-            'stats': self.stats
+            'seed': self.seed,
+            'stats': self.stats,
+            'metrics': self.metrics,
+            'rng_state': self.rng.bit_generator.state
         }
+        write_checkpoint(path, arrays, meta)
+        
+        if self.verbose:
+            print(f"💾 Checkpoint saved: {path} ({self.engine.count} vehicles)")
+    
+    def _check_checkpoint(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        """Raise ValueError unless the checkpoint fits this simulator (nothing is modified)"""
+        missing = [key for key in CHECKPOINT_META if key not in meta]
+        if missing:
+            raise ValueError(f"Checkpoint header lacks {', '.join(missing)}")
+        if meta['network'] != network_fingerprint(self.network):
+            raise ValueError('Checkpoint was taken on a different road network')
+        if meta.get('routes') != self.engine.routes.fingerprint():
+            raise ValueError('Checkpoint was taken with a different route table')
+        if meta['traffic_light_ids'] != [tl['id'] for tl in self.traffic_lights]:
+            raise ValueError('Checkpoint was taken with different traffic lights')
+        
+        def check_shape(name, shape):
+            if name not in arrays:
+                raise ValueError(f'Checkpoint has no {name} array')
+            if arrays[name].shape != shape:
+                raise ValueError(f'Checkpoint array {name} has shape {arrays[name].shape}, expected {shape}')
+        
+        if 'serial' not in arrays:
+            raise ValueError('Checkpoint has no serial array')
+        count = arrays['serial'].shape
+        for name, _, shape in self.engine.COLUMNS:
+            if name != 'handle':  # handles are local to an engine
+                check_shape(name, count + shape)
+        if 'edge_arrivals' in arrays:  # absent before arrival counts were checkpointed
+            check_shape('edge_arrivals', (self.network.edge_count,))
+        
+        plan = self.signal_plan
+        lights = (len(self.traffic_lights),)
+        if 'tl_durations' in arrays:
+            check_shape('tl_durations', plan.durations.shape)
+            check_shape('tl_anchor_time', lights)
+            check_shape('tl_anchor_pos', lights)
+        else:
+            check_shape('tl_last_change', lights)
+            check_shape('tl_phase', lights)
+            if np.any((arrays['tl_phase'] < 0) | (arrays['tl_phase'] >= np.diff(plan.phase_ptr))):
+                raise ValueError('Checkpoint has a phase index out of range')
+    
+    def load_checkpoint(self, path: str):
+        """
+        Restore a state written by save_checkpoint. The whole checkpoint is
+        validated first, so a rejected one leaves the simulator untouched.
+        """
+        arrays, meta = read_checkpoint(path)
+        self._check_checkpoint(arrays, meta)
+        
+        self.engine.import_columns(arrays)
+        if 'edge_arrivals' in arrays:
+            self.engine.edge_arrivals[:] = arrays['edge_arrivals']
+        
+        plan = self.signal_plan.copy()  # the published snapshot keeps the current one
+        if 'tl_durations' in arrays:
+            plan.import_arrays({
+                name: arrays[f'tl_{name}'] for name in ('durations', 'anchor_time', 'anchor_pos')})
+        else:
+            # Checkpoints written before signal plans: phase index + time of last change
+            plan.anchor_time = np.array(arrays['tl_last_change'], dtype=np.float64)
+            plan.anchor_pos = plan.phase_start[plan.phase_ptr[:-1] + arrays['tl_phase']]
+        plan_durations = plan.durations.tolist()
+        self.traffic_lights = [
+            dict(tl, phases=[dict(phase, duration=plan_durations[start + k])
+                             for k, phase in enumerate(tl['phases'])])
+            for tl, start in zip(self.traffic_lights, plan.phase_ptr.tolist())
+        ]
+        self.signal_plan = plan
+        
+        self.simulation_time = meta['simulation_time']
+        self.last_metrics_time = meta.get('last_metrics_time', self.simulation_time)
+        self.current_scenario = meta['current_scenario']
+        self.demand = self._demand_for(self.current_scenario)
+        self.is_running = meta['is_running']
+        self.is_paused = meta['is_paused']
+        self.seed = meta['seed']
+        self.stats = dict(meta['stats'])
+        self.stats.setdefault('trips_completed', 0)
+        self.metrics = meta['metrics']
+        self._update_traffic_lights(0.0)
+        self.rng.bit_generator.state = meta['rng_state']
+        self.publish()
+        
+        if self.verbose:
+            print(f"📂 Checkpoint loaded: {path} ({self.engine.count} vehicles)")
+    
+    @staticmethod
+    def _parse_vehicle_id(vehicle_id: str) -> int:
+        """Extract the serial number from a vehicle id ('veh_0042' -> 42)"""
+        try:
+            return int(str(vehicle_id).rsplit('_', 1)[-1])
+        except ValueError:
+            return -1
     
     def get_vehicle_by_id(self, vehicle_id: str) -> Dict:
-        """Get vehicle by ID"""
-        for vehicle in self.vehicles:
-            if vehicle['id'] == vehicle_id:
-                return vehicle
-        return None
+        """Get vehicle by ID (as of the latest published snapshot)"""
+        snapshot = self.snapshot
+        row = snapshot.find(self._parse_vehicle_id(vehicle_id))
+        if row < 0:
+            return None
+        vehicle = snapshot.view(row)
+        return vehicle.to_dict() if vehicle.id == vehicle_id else None
     
     def remove_vehicle(self, vehicle_id: str) -> bool:
         """Remove vehicle by ID"""
-        for i, vehicle in enumerate(self.vehicles):
-            if vehicle['id'] == vehicle_id:
-                self.vehicles.pop(i)
-                return True
-        return False
\ No newline at end of file
+        slot = self.engine.find(self._parse_vehicle_id(vehicle_id))
+        if slot < 0 or self.engine.vehicle_id(slot) != vehicle_id:
+            return False
+        self.engine.remove(slot)
+        self.publish()
+        return True
@@ -0,0 +1,56 @@
+"""
+Lightweight per-phase timing of simulation ticks
+"""
+import time
+from collections import defaultdict
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+class PhaseTimer:
+    """
+    Collects wall-clock durations of the named phases of each tick.
+    ``start`` opens a tick, every ``mark(phase)`` closes the phase that
+    began at the previous mark.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.samples[phase].append(now - self._last)
+        self._last = now
+
+    def reset(self):
+        self.samples.clear()
+
+    def summary(self, percentiles: Sequence[float] = (50, 95, 99)) -> Dict[str, Dict[str, float]]:
+        """Latency percentiles (ms) per phase"""
+        result = {}
+        for phase, samples in self.samples.items():
+            ms = np.asarray(samples) * 1000.0
+            stats = {f'p{int(p)}': round(float(np.percentile(ms, p)), 4) for p in percentiles}
+            stats['mean'] = round(float(ms.mean()), 4)
+            stats['max'] = round(float(ms.max()), 4)
+            stats['samples'] = len(ms)
+            result[phase] = stats
+        return result
+
+
+class NullTimer:
+    """Stand-in used when profiling is off"""
+
+    def start(self):
+        pass
+
+    def mark(self, phase: str):
+        pass
+
+
+NULL_TIMER = NullTimer()
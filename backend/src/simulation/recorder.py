@@ -0,0 +1,443 @@
+"""
+Append-only trajectory recording and seekable replay
+
+Log layout (little-endian):
+    8 bytes   magic  b'UFREC001'
+    4 bytes   uint32 header length
+    N bytes   JSON header (network, traffic lights, scenario, coordinate origin)
+    frames    b'KEYF' | b'DELT', float64 simulated time (rounded to 1 us), uint64 payload length,
+              payload = uint32 JSON length + JSON block table + column blocks
+
+Every frame carries the moving columns of all vehicles (float32/int32,
+int64 serials).
+Keyframes also carry the static columns (type, color, ...) of every vehicle;
+delta frames only those of vehicles that appeared since the previous frame.
+A sidecar ``<log>.idx`` maps each frame to its time, file offset and kind,
+so seeking reads one keyframe's statics plus the frames after it.
+"""
+import copy
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .checkpoint import network_fingerprint
+from .commands import UnsupportedCommand
+from .mock_simulator import MockSimulator
+from .road_network import RoadNetwork, default_network
+
+MAGIC = b'UFREC001'
+VERSION = 1
+KEYFRAME = b'KEYF'
+DELTA = b'DELT'
+_FRAME = struct.Struct('<4sdQ')
+INDEX_DTYPE = np.dtype([('time', '<f8'), ('offset', '<u8'), ('keyframe', 'u1')])
+# Frame times are rounded to 1 us, so steps accumulated in floating point
+# (30.000000000000156) are stored and looked up as the time they stand for
+TIME_DECIMALS = 6
+
+# Columns written every frame (position is stored relative to the origin)
+DYNAMIC_COLUMNS = (
+    ('serial', '<i8'), ('lat', '<f4'), ('lng', '<f4'), ('speed', '<f4'),
+    ('heading', '<f4'), ('progress', '<f4'), ('distance', '<f4'),
+    ('edge', '<i4'), ('lane', '<i4'), ('route_id', '<i4'),
+)
+# Columns that never change during a vehicle's life
+STATIC_COLUMNS = (
+    ('serial', '<i8'), ('vtype', 'u1'), ('color', 'u1'), ('subtype', 'u1'), ('created', '<f4'),
+)
+
+
+def _encode_blocks(blocks: Dict[str, np.ndarray], meta: Dict) -> bytes:
+    """JSON block table followed by the raw blocks (8-byte aligned)"""
+    table, chunks, offset = {}, [], 0
+    for name, array in blocks.items():
+        offset = (offset + 7) // 8 * 8
+        table[name] = [array.dtype.str, len(array), offset]
+        chunks.append((offset, array.tobytes()))
+        offset += array.nbytes
+    header = json.dumps({'blocks': table, 'meta': meta}).encode('utf-8')
+    body = bytearray(offset)
+    for start, chunk in chunks:
+        body[start:start + len(chunk)] = chunk
+    return struct.pack('<I', len(header)) + header + bytes(body)
+
+
+def _decode_blocks(payload) -> Tuple[Dict[str, np.ndarray], Dict]:
+    (header_length,) = struct.unpack_from('<I', payload, 0)
+    header = json.loads(bytes(payload[4:4 + header_length]).decode('utf-8'))
+    body = 4 + header_length
+    blocks = {
+        name: np.frombuffer(payload, dtype=np.dtype(dtype), count=count, offset=body + offset)
+        for name, (dtype, count, offset) in header['blocks'].items()
+    }
+    return blocks, header['meta']
+
+
+class TrajectoryRecorder:
+    """Appends one frame per simulator tick to a trajectory log"""
+
+    def __init__(self, path: str, simulator: MockSimulator, keyframe_interval: int = 50):
+        self.path = path
+        self.simulator = simulator
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.frames = 0
+        self.last_time = None
+        self._previous_serials = np.zeros(0, dtype=np.int64)
+
+        bounds = simulator.network_bounds
+        self.origin = (bounds['min_lat'], bounds['min_lng'])
+        header = json.dumps({
+            'version': VERSION,
+            'network': network_fingerprint(simulator.network),
+            'routes': simulator.engine.routes.fingerprint(),
+            'network_bounds': bounds,
+            'origin': self.origin,
+            'scenario': simulator.current_scenario,
+            'seed': simulator.seed,
+            'traffic_lights': simulator._light_dicts(),
+            'keyframe_interval': self.keyframe_interval,
+        }).encode('utf-8')
+
+        self._log = open(path, 'wb')
+        self._log.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self._index = open(f'{path}.idx', 'wb')
+
+    def record(self):
+        """Append the simulator's current state"""
+        simulator = self.simulator
+        frame_time = round(simulator.simulation_time, TIME_DECIMALS)
+        if self.last_time is not None and frame_time < self.last_time:
+            raise ValueError('Simulated time went backwards; start a new recording')
+        engine = simulator.engine
+        n = engine.count
+        serial = engine.serial[:n]
+
+        blocks = {}
+        for name, dtype in DYNAMIC_COLUMNS:
+            values = getattr(engine, name)[:n]
+            if name == 'lat':
+                values = values - self.origin[0]
+            elif name == 'lng':
+                values = values - self.origin[1]
+            blocks[name] = values.astype(dtype)
+
+        keyframe = self.frames % self.keyframe_interval == 0
+        rows = slice(0, n) if keyframe else ~np.isin(serial, self._previous_serials)
+        for name, dtype in STATIC_COLUMNS:
+            blocks[f'static_{name}'] = getattr(engine, name)[:n][rows].astype(dtype)
+        blocks['tl_phase'] = simulator.light_phase.astype('<i4')
+        blocks['tl_elapsed'] = simulator.light_elapsed.astype('<f4')
+
+        payload = _encode_blocks(blocks, {
+            'metrics': simulator.metrics,
+            'stats': simulator.stats,
+            'scenario': simulator.current_scenario
+        })
+        offset = self._log.tell()
+        self._log.write(_FRAME.pack(KEYFRAME if keyframe else DELTA, frame_time, len(payload)))
+        self._log.write(payload)
+
+        entry = np.array([(frame_time, offset, keyframe)], dtype=INDEX_DTYPE)
+        self._index.write(entry.tobytes())
+        if keyframe:
+            self.flush()
+
+        self._previous_serials = serial.copy()
+        self.last_time = frame_time
+        self.frames += 1
+
+    def flush(self):
+        self._log.flush()
+        self._index.flush()
+
+    def close(self):
+        if not self._log.closed:
+            self.flush()
+            self._log.close()
+            self._index.close()
+
+
+class TrajectoryReader:
+    """Random access to the frames of a trajectory log"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'Not a trajectory log: {path}')
+            (header_length,) = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(header_length).decode('utf-8'))
+        if self.header.get('version') != VERSION:
+            raise ValueError(f"Unsupported trajectory log version: {self.header.get('version')}")
+        self._first_frame = len(MAGIC) + 4 + header_length
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = self._load_index()
+        if not len(self.index):
+            raise ValueError(f'Trajectory log has no frame: {path}')
+        self.times = np.round(self.index['time'], TIME_DECIMALS)  # logs written before rounding
+        self.keyframes = np.flatnonzero(self.index['keyframe'])
+
+        # Static columns accumulated from the current keyframe up to ``_static_frame``
+        self._static_keyframe = -1
+        self._static_frame = -1
+        self._static: Dict[str, np.ndarray] = {}
+
+    def _load_index(self) -> np.ndarray:
+        """Read the sidecar index, rebuilding it by scanning the log if it is stale"""
+        index_path = f'{self.path}.idx'
+        if os.path.exists(index_path):
+            index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+            last = int(index['offset'][-1]) if len(index) else len(self._map)
+            if last + _FRAME.size <= len(self._map):
+                _, _, length = _FRAME.unpack_from(self._map, last)
+                if last + _FRAME.size + length == len(self._map):
+                    return index
+        entries = []
+        offset = self._first_frame
+        while offset + _FRAME.size <= len(self._map):
+            tag, sim_time, length = _FRAME.unpack_from(self._map, offset)
+            if offset + _FRAME.size + length > len(self._map):
+                break  # truncated last frame (recording interrupted)
+            entries.append((sim_time, offset, tag == KEYFRAME))
+            offset += _FRAME.size + length
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def start_time(self) -> float:
+        return float(self.times[0])
+
+    @property
+    def end_time(self) -> float:
+        return float(self.times[-1])
+
+    def frame_at(self, t: float) -> int:
+        """Index of the last frame at or before ``t`` (compared at the stored 1 us resolution)"""
+        return max(0, int(np.searchsorted(self.times, round(t, TIME_DECIMALS), side='right')) - 1)
+
+    def read_frame(self, frame: int) -> Tuple[Dict[str, np.ndarray], Dict]:
+        offset = int(self.index['offset'][frame])
+        _, _, length = _FRAME.unpack_from(self._map, offset)
+        start = offset + _FRAME.size
+        return _decode_blocks(memoryview(self._map)[start:start + length])
+
+    def _statics_until(self, frame: int):
+        """Static columns of every vehicle seen from the covering keyframe to ``frame``"""
+        keyframe = int(self.keyframes[np.searchsorted(self.keyframes, frame, side='right') - 1])
+        if keyframe != self._static_keyframe or frame < self._static_frame:
+            self._static_keyframe, self._static_frame = keyframe, keyframe - 1
+            self._static = {name: np.zeros(0, dtype=dtype) for name, dtype in STATIC_COLUMNS}
+
+        if frame > self._static_frame:
+            parts = {name: [self._static[name]] for name, _ in STATIC_COLUMNS}
+            for k in range(self._static_frame + 1, frame + 1):
+                blocks, _ = self.read_frame(k)
+                for name, _ in STATIC_COLUMNS:
+                    parts[name].append(blocks[f'static_{name}'])
+            merged = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+            # Keep the latest row per serial, sorted by serial for lookups
+            order = np.argsort(merged['serial'], kind='stable')[::-1]
+            _, first = np.unique(merged['serial'][order], return_index=True)
+            keep = order[first]
+            self._static = {name: array[keep] for name, array in merged.items()}
+            self._static_frame = frame
+        return self._static
+
+    def state_at(self, t: float) -> Tuple[float, Dict[str, np.ndarray], Dict[str, np.ndarray], Dict]:
+        """(frame time, vehicle columns, light arrays, meta) of the frame showing time ``t``"""
+        frame = self.frame_at(t)
+        blocks, meta = self.read_frame(frame)
+        static = self._statics_until(frame)
+        origin_lat, origin_lng = self.header['origin']
+
+        serial = blocks['serial'].astype(np.int64)
+        rows = np.searchsorted(static['serial'], serial)
+        n = len(serial)
+        columns = {
+            'serial': serial,
+            'lat': blocks['lat'].astype(np.float64) + origin_lat,
+            'lng': blocks['lng'].astype(np.float64) + origin_lng,
+            'speed': blocks['speed'].astype(np.float64),
+            'heading': blocks['heading'].astype(np.float64),
+            'progress': blocks['progress'].astype(np.float64),
+            'distance': blocks['distance'].astype(np.float64),
+            'edge': blocks['edge'],
+            'lane': blocks['lane'],
+            'route_id': blocks['route_id'],
+            'route_pos': np.zeros(n, dtype=np.int32),
+            'direction': np.ones(n, dtype=np.int8),
+            'vtype': static['vtype'][rows],
+            'color': static['color'][rows],
+            'subtype': static['subtype'][rows],
+            'created': static['created'][rows].astype(np.float64),
+        }
+        lights = {'phase': blocks['tl_phase'], 'elapsed': blocks['tl_elapsed'].astype(np.float64)}
+        return float(self.times[frame]), columns, lights, meta
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class ReplaySource:
+    """
+    Plays a trajectory log back with the simulator interface used by
+    SimulationStream and the REST routes, without simulating anything.
+    ``speed`` scales how fast ``update_simulation`` moves through the log.
+    """
+
+    def __init__(self, path: str, network: Optional[RoadNetwork] = None,
+                 speed: float = 1.0, loop: bool = False):
+        self.reader = TrajectoryReader(path)
+        header = self.reader.header
+        self.speed = speed
+        self.loop = loop
+
+        # An idle simulator only provides the serialization of the frames
+        self.view = MockSimulator({'verbose': False, 'network_bounds': header['network_bounds']},
+                                  network or default_network(header['network_bounds']))
+        if header['network'] != network_fingerprint(self.view.network):
+            raise ValueError('Recording was made on a different road network')
+        if header['routes'] != self.view.engine.routes.fingerprint():
+            raise ValueError('Recording was made with a different route table')
+        self.view.traffic_lights = copy.deepcopy(header['traffic_lights'])
+        self.view._initialize_signals()
+
+        self.position = self.reader.start_time
+        self.is_running = False
+        self.is_paused = False
+        self.current_scenario = header.get('scenario')
+        self._loaded_time = None
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Playback control (simulator interface)
+    # ------------------------------------------------------------------
+    @property
+    def simulation_time(self) -> float:
+        return self.position
+
+    @property
+    def duration(self) -> float:
+        return self.reader.end_time - self.reader.start_time
+
+    @property
+    def vehicle_count(self) -> int:
+        return self.view.snapshot.vehicle_count
+
+    @property
+    def snapshot(self):
+        """Snapshot of the frame at the playback position"""
+        return self.view.snapshot
+
+    def start_simulation(self, scenario_id: str = None, **kwargs):
+        """Play from the beginning (the scenario is the recorded one)"""
+        self.seek(self.reader.start_time)
+        self.is_running = True
+        self.is_paused = False
+        return True
+
+    def stop_simulation(self):
+        self.is_running = False
+        self.is_paused = False
+        self.seek(self.reader.start_time)
+        return True
+
+    def pause_simulation(self):
+        self.is_paused = True
+        return True
+
+    def resume_simulation(self):
+        self.is_paused = False
+        return True
+
+    def seek(self, t: float):
+        """Jump to simulated time ``t`` (clamped to the recording)"""
+        self.position = min(max(t, self.reader.start_time), self.reader.end_time)
+        self._load()
+
+    def update_simulation(self, delta_time: float = 0.1, publish: bool = True):
+        """
+        Advance the playback clock by ``delta_time * speed`` simulated
+        seconds; the frame is loaded on ``publish`` (or the next ``publish()``)
+        """
+        if not self.is_running or self.is_paused:
+            return
+        position = self.position + delta_time * self.speed
+        if position > self.reader.end_time:
+            if self.loop:
+                position = self.reader.start_time + (position - self.reader.end_time) % max(self.duration, 1e-9)
+            else:
+                position = self.reader.end_time
+                self.is_running = False
+        self.position = position
+        if publish:
+            self._load()
+
+    def publish(self):
+        """Publish the frame at the playback position"""
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Data
+    # ------------------------------------------------------------------
+    def _load(self):
+        """Put the frame covering ``position`` into the view and publish it (once per frame)"""
+        frame_time = float(self.reader.times[self.reader.frame_at(self.position)])
+        if frame_time == self._loaded_time:
+            return
+        frame_time, columns, lights, meta = self.reader.state_at(self.position)
+        view = self.view
+        view.engine.import_columns(columns)
+        view.light_phase = lights['phase'].astype(np.int64)
+        view.light_elapsed = lights['elapsed']
+        view.simulation_time = frame_time
+        view.metrics = meta['metrics']
+        view.stats = meta['stats']
+        view.current_scenario = meta.get('scenario', self.current_scenario)
+        self._loaded_time = frame_time
+        view.publish()
+
+    def get_simulation_data(self) -> Dict:
+        data = self.view.get_simulation_data()
+        data.update({
+            'simulation_time': self.position,
+            'is_running': self.is_running,
+            'is_paused': self.is_paused,
+            'replay': {
+                'start': self.reader.start_time,
+                'end': self.reader.end_time,
+                'speed': self.speed
+            }
+        })
+        return data
+
+    def get_vehicle_by_id(self, vehicle_id: str) -> Dict:
+        return self.view.get_vehicle_by_id(vehicle_id)
+
+    # Recordings are read-only
+    def add_vehicles(self, vehicle_types) -> List[Dict]:
+        raise UnsupportedCommand('Cannot add vehicles to a replay')
+
+    def add_emergency_vehicle(self) -> Dict:
+        raise UnsupportedCommand('Cannot add vehicles to a replay')
+
+    def remove_vehicle(self, vehicle_id: str) -> bool:
+        raise UnsupportedCommand('Cannot remove vehicles from a replay')
+
+    def change_scenario(self, scenario_id: str) -> bool:
+        raise UnsupportedCommand('Cannot change the scenario of a replay')
+
+    def optimize_traffic_light(self, tl_id: str, algorithm) -> Dict:
+        raise UnsupportedCommand('Cannot re-time the traffic lights of a replay')
+
+    def close(self):
+        self.reader.close()
+
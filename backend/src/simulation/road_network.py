@@ -0,0 +1,257 @@
+"""
+Compiled road network shared by the simulator, the optimizer and the data generator
+"""
+import heapq
+import math
+from functools import cached_property, lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .spatial_index import SpatialIndex, build_index
+
+KM_PER_DEGREE_LAT = 111.0
+
+DEFAULT_BOUNDS = {
+    'min_lat': 48.85,
+    'max_lat': 48.86,
+    'min_lng': 2.35,
+    'max_lng': 2.36,
+}
+
+
+def _frozen(values, dtype) -> np.ndarray:
+    """Contiguous read-only array"""
+    array = np.ascontiguousarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+def _csr(keys: np.ndarray, size: int):
+    """Group row indices by ``keys`` -> (indptr, indices)"""
+    order = np.argsort(keys, kind='stable')
+    counts = np.bincount(keys, minlength=size)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return _frozen(indptr, np.int64), _frozen(order, np.int32)
+
+
+class RoadNetwork:
+    """
+    Immutable directed road graph with integer node/edge ids.
+
+    All per-node and per-edge attributes are read-only NumPy arrays indexed by
+    the integer id, and adjacency is stored in CSR form (``out_indptr`` /
+    ``out_edges`` and ``in_indptr`` / ``in_edges``), so every lookup is plain
+    array indexing.
+    """
+
+    def __init__(self, node_ids: Sequence[str], node_lat, node_lng,
+                 edge_ids: Sequence[str], edge_from, edge_to,
+                 edge_lanes=None, edge_speed_limit=None, edge_road=None,
+                 road_ids: Sequence[str] = (), road_types: Sequence[str] = ()):
+        # Nodes
+        self.node_ids = tuple(node_ids)
+        self.node_index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.node_lat = _frozen(node_lat, np.float64)
+        self.node_lng = _frozen(node_lng, np.float64)
+
+        # Edges
+        self.edge_ids = tuple(edge_ids)
+        self.edge_index = {edge_id: i for i, edge_id in enumerate(self.edge_ids)}
+        self.edge_from = _frozen(edge_from, np.int32)
+        self.edge_to = _frozen(edge_to, np.int32)
+        edge_count = len(self.edge_ids)
+        self.edge_lanes = _frozen(
+            np.ones(edge_count) if edge_lanes is None else edge_lanes, np.int8)
+        self.edge_speed_limit = _frozen(
+            np.full(edge_count, 50.0) if edge_speed_limit is None else edge_speed_limit, np.float64)
+        self.edge_road = _frozen(
+            np.full(edge_count, -1) if edge_road is None else edge_road, np.int32)
+
+        # Roads (named groups of edges, e.g. 'road_h_2')
+        self.road_ids = tuple(road_ids)
+        self.road_types = tuple(road_types)
+
+        # Precomputed geometry
+        self.edge_from_lat = _frozen(self.node_lat[self.edge_from], np.float64)
+        self.edge_from_lng = _frozen(self.node_lng[self.edge_from], np.float64)
+        self.edge_to_lat = _frozen(self.node_lat[self.edge_to], np.float64)
+        self.edge_to_lng = _frozen(self.node_lng[self.edge_to], np.float64)
+        self.edge_dlat = _frozen(self.edge_to_lat - self.edge_from_lat, np.float64)
+        self.edge_dlng = _frozen(self.edge_to_lng - self.edge_from_lng, np.float64)
+
+        mid_lat = np.radians((self.edge_from_lat + self.edge_to_lat) / 2)
+        dy_km = self.edge_dlat * KM_PER_DEGREE_LAT
+        dx_km = self.edge_dlng * KM_PER_DEGREE_LAT * np.cos(mid_lat)
+        self.edge_length = _frozen(np.hypot(dx_km, dy_km), np.float64)  # km
+        # Compass heading: 0 = north, 90 = east
+        self.edge_heading = _frozen(np.degrees(np.arctan2(dx_km, dy_km)) % 360, np.float64)
+
+        # Adjacency
+        self.out_indptr, self.out_edges = _csr(self.edge_from, self.node_count)
+        self.in_indptr, self.in_edges = _csr(self.edge_to, self.node_count)
+
+    def __repr__(self) -> str:
+        return f'RoadNetwork(nodes={self.node_count}, edges={self.edge_count})'
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_ids)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def outgoing(self, node: int) -> np.ndarray:
+        """Edges leaving ``node``"""
+        return self.out_edges[self.out_indptr[node]:self.out_indptr[node + 1]]
+
+    def incoming(self, node: int) -> np.ndarray:
+        """Edges entering ``node``"""
+        return self.in_edges[self.in_indptr[node]:self.in_indptr[node + 1]]
+
+    def nearest_node(self, lat: float, lng: float) -> int:
+        """Index of the node closest to a coordinate"""
+        return int(np.argmin(np.abs(self.node_lat - lat) + np.abs(self.node_lng - lng)))
+
+    @cached_property
+    def node_grid(self) -> SpatialIndex:
+        """Spatial index over intersections (item index == node index)"""
+        return build_index(self.node_lat, self.node_lng)
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def shortest_path_tree(self, source: int, edge_cost: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Dijkstra from ``source`` to every node. Returns, per node, the last
+        edge of its shortest path (-1 for the source and unreachable nodes).
+        """
+        cost = self.edge_length if edge_cost is None else edge_cost
+        best = np.full(self.node_count, math.inf)
+        best[source] = 0.0
+        via_edge = np.full(self.node_count, -1, dtype=np.int64)
+        heap = [(0.0, source)]
+
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if dist > best[node]:
+                continue
+            for edge in self.outgoing(node).tolist():
+                nxt = int(self.edge_to[edge])
+                candidate = dist + float(cost[edge])
+                if candidate < best[nxt]:
+                    best[nxt] = candidate
+                    via_edge[nxt] = edge
+                    heapq.heappush(heap, (candidate, nxt))
+        return via_edge
+
+    def shortest_path(self, source: int, target: int, edge_cost: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Dijkstra over the CSR adjacency. Returns the list of edge indices from
+        ``source`` to ``target`` (empty if unreachable or source == target).
+        """
+        cost = self.edge_length if edge_cost is None else edge_cost
+        best = {source: 0.0}
+        via_edge = {}
+        heap = [(0.0, source)]
+
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if dist > best.get(node, math.inf):
+                continue
+            for edge in self.outgoing(node).tolist():
+                nxt = int(self.edge_to[edge])
+                candidate = dist + float(cost[edge])
+                if candidate < best.get(nxt, math.inf):
+                    best[nxt] = candidate
+                    via_edge[nxt] = edge
+                    heapq.heappush(heap, (candidate, nxt))
+
+        if target not in via_edge:
+            return []
+        path = []
+        node = target
+        while node != source:
+            edge = via_edge[node]
+            path.append(edge)
+            node = int(self.edge_from[edge])
+        path.reverse()
+        return path
+
+    # ------------------------------------------------------------------
+    # Builders
+    # ------------------------------------------------------------------
+    @classmethod
+    def grid(cls, bounds: Dict = None, rows: int = 5, cols: int = 5) -> 'RoadNetwork':
+        """
+        Manhattan grid: ``rows`` horizontal roads crossing ``cols`` vertical
+        roads, every road segment being a pair of opposite directed edges.
+        The middle roads are wider/faster (highway and avenue).
+        """
+        bounds = bounds or DEFAULT_BOUNDS
+        lat_step = (bounds['max_lat'] - bounds['min_lat']) / (rows - 1)
+        lng_step = (bounds['max_lng'] - bounds['min_lng']) / (cols - 1)
+
+        node_ids, node_lat, node_lng = [], [], []
+        for i in range(rows):
+            for j in range(cols):
+                node_ids.append(f'intersection_{i}_{j}')
+                node_lat.append(bounds['min_lat'] + i * lat_step)
+                node_lng.append(bounds['min_lng'] + j * lng_step)
+
+        road_ids, road_types, road_lanes, road_speed = [], [], [], []
+        for i in range(rows):
+            road_ids.append(f'road_h_{i}')
+            road_types.append('highway' if i == rows // 2 else 'street')
+            road_lanes.append(2 if i == rows // 2 else 1)
+            road_speed.append(70 if i == rows // 2 else 50)
+        for j in range(cols):
+            road_ids.append(f'road_v_{j}')
+            road_types.append('avenue' if j == cols // 2 else 'street')
+            road_lanes.append(2 if j == cols // 2 else 1)
+            road_speed.append(60 if j == cols // 2 else 50)
+
+        edge_ids, edge_from, edge_to, edge_road = [], [], [], []
+
+        def add_segment(road: int, segment: int, a: int, b: int):
+            road_id = road_ids[road]
+            edge_ids.extend([f'{road_id}_s{segment}', f'{road_id}_s{segment}_r'])
+            edge_from.extend([a, b])
+            edge_to.extend([b, a])
+            edge_road.extend([road, road])
+
+        for i in range(rows):
+            for j in range(cols - 1):
+                add_segment(i, j, i * cols + j, i * cols + j + 1)
+        for j in range(cols):
+            for i in range(rows - 1):
+                add_segment(rows + j, i, i * cols + j, (i + 1) * cols + j)
+
+        edge_road = np.asarray(edge_road)
+        return cls(
+            node_ids, node_lat, node_lng,
+            edge_ids, edge_from, edge_to,
+            edge_lanes=np.asarray(road_lanes)[edge_road],
+            edge_speed_limit=np.asarray(road_speed)[edge_road],
+            edge_road=edge_road,
+            road_ids=road_ids,
+            road_types=road_types,
+        )
+
+
+@lru_cache(maxsize=8)
+def _cached_grid(bounds_key: tuple, rows: int, cols: int) -> RoadNetwork:
+    return RoadNetwork.grid(dict(bounds_key), rows, cols)
+
+
+def default_network(bounds: Dict = None, rows: int = 5, cols: int = 5) -> RoadNetwork:
+    """Shared grid network for the given bounds (built once per bounds)"""
+    bounds = bounds or DEFAULT_BOUNDS
+    return _cached_grid(tuple(sorted(bounds.items())), rows, cols)
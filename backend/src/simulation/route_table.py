@@ -0,0 +1,125 @@
+"""
+Precomputed origin-destination routes for bulk vehicle spawning
+"""
+import hashlib
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .road_network import RoadNetwork, _csr
+
+
+class RouteTable:
+    """
+    Feasible routes over a RoadNetwork, stored as one flat int32 buffer of
+    edge ids with CSR offsets: route ``r`` is ``edges[offsets[r]:offsets[r + 1]]``.
+
+    Every route is a shortest path between an origin and a destination node,
+    so consecutive edges are connected. Spawning draws route ids in bulk and
+    reads the edge at a position with one gather.
+    """
+
+    def __init__(self, network: RoadNetwork, edges, offsets):
+        self.network = network
+        self.edges = np.ascontiguousarray(edges, dtype=np.int32)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self.length = np.diff(self.offsets)
+        if len(self.length) == 0 or self.length.min() < 1:
+            raise ValueError('A route table needs at least one route and no empty route')
+
+        self.origin = network.edge_from[self.edges[self.offsets[:-1]]]
+        self.destination = network.edge_to[self.edges[self.offsets[1:] - 1]]
+        # Routes grouped by origin node (CSR), for rerouting from where a vehicle stands
+        self.origin_indptr, self.origin_routes = _csr(self.origin.astype(np.int64), network.node_count)
+        self._edge_id_tuples = {}
+
+    def __len__(self) -> int:
+        return len(self.length)
+
+    def __repr__(self) -> str:
+        return f'RouteTable(routes={len(self)}, edges={len(self.edges)})'
+
+    @classmethod
+    def build(cls, network: RoadNetwork, origins: int = 256, destinations: int = 16,
+              seed: int = 0) -> 'RouteTable':
+        """
+        Shortest paths from up to ``origins`` nodes (every node on small
+        networks) to ``destinations`` random reachable nodes each. One
+        Dijkstra tree per origin serves all of its destinations.
+        """
+        rng = np.random.default_rng(seed)
+        nodes = np.arange(network.node_count)
+        if origins < network.node_count:
+            nodes = np.sort(rng.choice(network.node_count, origins, replace=False))
+
+        routes: List[List[int]] = []
+        for origin in nodes.tolist():
+            via_edge = network.shortest_path_tree(origin)
+            reachable = np.flatnonzero(via_edge >= 0)
+            if not len(reachable):
+                continue
+            for target in rng.choice(reachable, min(destinations, len(reachable)), replace=False).tolist():
+                path = []
+                node = target
+                while node != origin:
+                    edge = int(via_edge[node])
+                    path.append(edge)
+                    node = int(network.edge_from[edge])
+                path.reverse()
+                routes.append(path)
+
+        offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+        np.cumsum([len(route) for route in routes], out=offsets[1:])
+        edges = np.fromiter((edge for route in routes for edge in route), dtype=np.int32, count=offsets[-1])
+        return cls(network, edges, offsets)
+
+    # ------------------------------------------------------------------
+    # Sampling
+    # ------------------------------------------------------------------
+    def sample(self, n: int, rng: np.random.Generator) -> np.ndarray:
+        """``n`` route ids drawn uniformly"""
+        return rng.integers(0, len(self), n).astype(np.int32)
+
+    def sample_from(self, nodes: Sequence[int], rng: np.random.Generator) -> np.ndarray:
+        """
+        A route starting at each of ``nodes``; nodes that are no route's
+        origin get a uniformly drawn route instead.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        start = self.origin_indptr[nodes]
+        count = self.origin_indptr[nodes + 1] - start
+        pick = start + (rng.random(len(nodes)) * count).astype(np.int64)
+        fallback = rng.integers(0, len(self), len(nodes))
+        return np.where(count > 0, self.origin_routes[np.minimum(pick, len(self.origin_routes) - 1)],
+                        fallback).astype(np.int32)
+
+    def edge_at(self, route_ids, position) -> np.ndarray:
+        """Edge at ``position`` along each route"""
+        return self.edges[self.offsets[route_ids] + position]
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+    def route(self, route_id: int) -> np.ndarray:
+        return self.edges[self.offsets[route_id]:self.offsets[route_id + 1]]
+
+    def edge_id_tuple(self, route_id: int) -> Tuple[str, ...]:
+        """Edge ids of a route as one immutable tuple, cached and shared per route"""
+        ids = self._edge_id_tuples.get(route_id)
+        if ids is None:
+            edge_ids = self.network.edge_ids
+            ids = self._edge_id_tuples[route_id] = tuple(edge_ids[e] for e in self.route(route_id).tolist())
+        return ids
+
+    def fingerprint(self) -> str:
+        """Identifies the table content (checkpoints must be restored on the same routes)"""
+        digest = hashlib.sha1(self.offsets.tobytes())
+        digest.update(self.edges.tobytes())
+        return digest.hexdigest()
+
+
+@lru_cache(maxsize=8)
+def default_route_table(network: RoadNetwork) -> RouteTable:
+    """Route table shared by every simulator on ``network`` (built once)"""
+    return RouteTable.build(network)
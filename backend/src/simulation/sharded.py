@@ -0,0 +1,475 @@
+"""
+Spatially sharded simulation: one worker process per region of the network
+"""
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .commands import UnsupportedCommand
+from .mock_simulator import MockSimulator
+from .road_network import RoadNetwork, default_network
+from .vehicle_engine import VehicleEngine
+
+ROW_DTYPE = VehicleEngine.ROW_DTYPE
+_HEADER_BYTES = 64  # row count, padded so the rows stay cache-line aligned
+
+
+def _region_cuts(network: RoadNetwork, regions: int) -> np.ndarray:
+    """Longitudes between the regions: quantiles of the edge midpoint longitudes"""
+    mid_lng = network.edge_from_lng + network.edge_dlng / 2
+    return np.quantile(mid_lng, np.arange(1, regions) / regions)
+
+
+def partition_edges(network: RoadNetwork, regions: int) -> np.ndarray:
+    """
+    Region of every edge: vertical strips cut at the quantiles of the edge
+    midpoint longitudes, so each region owns about the same number of edges.
+    """
+    if regions <= 1:
+        return np.zeros(network.edge_count, dtype=np.int32)
+    mid_lng = network.edge_from_lng + network.edge_dlng / 2
+    return np.searchsorted(_region_cuts(network, regions), mid_lng, side='right').astype(np.int32)
+
+
+def partition_nodes(network: RoadNetwork, regions: int) -> np.ndarray:
+    """Region of every node (the strip of ``partition_edges`` its longitude falls in)"""
+    if regions <= 1:
+        return np.zeros(network.node_count, dtype=np.int32)
+    return np.searchsorted(_region_cuts(network, regions), network.node_lng, side='right').astype(np.int32)
+
+
+def border_edges(network: RoadNetwork, edge_region: np.ndarray) -> np.ndarray:
+    """Edges a vehicle of another region can turn onto (an incoming edge of their start node is foreign)"""
+    low = np.full(network.node_count, np.iinfo(np.int32).max)
+    high = np.full(network.node_count, -1)
+    np.minimum.at(low, network.edge_to, edge_region)
+    np.maximum.at(high, network.edge_to, edge_region)
+    start = network.edge_from
+    return np.flatnonzero((low[start] < edge_region) | (high[start] > edge_region))
+
+
+class HandoverBox:
+    """
+    Fixed-capacity block of packed vehicle rows in shared memory.
+
+    Each worker owns one box and writes the vehicles leaving its region into
+    it; the other workers read it after the tick barrier, so rows are copied
+    once into the box and once into the receiving engine - never pickled.
+    """
+
+    def __init__(self, capacity: int, name: Optional[str] = None):
+        self.capacity = capacity
+        size = _HEADER_BYTES + capacity * ROW_DTYPE.itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.rows = np.ndarray((capacity,), dtype=ROW_DTYPE, buffer=self.shm.buf, offset=_HEADER_BYTES)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def count(self) -> int:
+        return int(self._count[0])
+
+    def write(self, rows: np.ndarray) -> int:
+        """Replace the box content; returns how many rows fit"""
+        n = min(len(rows), self.capacity)
+        self.rows[:n] = rows[:n]
+        self._count[0] = n
+        return n
+
+    def read(self) -> np.ndarray:
+        return self.rows[:self.count]
+
+    def clear(self):
+        self._count[0] = 0
+
+    def close(self):
+        # Views must be dropped before the mapping can be closed
+        self._count = self.rows = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class RegionSimulator(MockSimulator):
+    """
+    MockSimulator running one region: trips start only from the demand
+    sources inside the region (a trip whose first edge lies across the
+    border is handed over after its first step), and its vehicle serials
+    interleave with the other regions so ids stay unique across the city.
+    """
+
+    def __init__(self, region: int, regions: int, config=None, network: RoadNetwork = None):
+        self.region = region  # set first: the demand is built during MockSimulator.__init__
+        self.regions = regions
+        super().__init__(dict(config or {}, verbose=False), network)
+        self.serial_base = 0
+
+    def _demand_for(self, scenario_id: str):
+        """The scenario's demand, restricted to the sources in this region"""
+        own = partition_nodes(self.network, self.regions) == self.region
+        return super()._demand_for(scenario_id).restrict_to(own)
+
+    def _next_serials(self, count: int) -> np.ndarray:
+        """Serials ``base + k * regions + region`` (disjoint between regions)"""
+        first = self.stats['total_vehicles_created']
+        self.stats['total_vehicles_created'] += count
+        local = np.arange(first, first + count, dtype=np.int64)
+        return self.serial_base + local * self.regions + self.region
+
+
+def _region_worker(region: int, regions: int, config: Dict, network: RoadNetwork,
+                   box_names: List[str], capacity: int, conn):
+    """Worker loop: applies the coordinator's commands to one region"""
+    simulator = RegionSimulator(region, regions, config, network)
+    edge_region = partition_edges(simulator.network, regions)
+    border = border_edges(simulator.network, edge_region)
+    own_border = edge_region[border] == region
+    boxes = [HandoverBox(capacity, name) for name in box_names]
+    outbox = boxes[region]
+    engine = simulator.engine
+
+    try:
+        while True:
+            command, payload = conn.recv()
+            try:
+                if command == 'start':
+                    scenario_id, seed, serial_base = payload
+                    simulator.start_simulation(scenario_id, seed=seed, vehicle_count=0)
+                    simulator.serial_base = serial_base
+                    reply = engine.count
+
+                elif command == 'step':
+                    delta_time, ghost_rear, ghost_speed = payload
+                    # Leaders across the border: the other regions' rearmost vehicles
+                    foreign = ~own_border
+                    engine.set_ghosts(border[foreign], ghost_rear[foreign], ghost_speed[foreign])
+                    simulator.update_simulation(delta_time, publish=False)
+                    # Vehicles now on another region's edges go to the outbox
+                    leaving = np.flatnonzero(edge_region[engine.edge[:engine.count]] != region)
+                    sent = outbox.write(engine.export_rows(leaving))
+                    engine.remove(leaving[:sent])  # overflow stays here until the next tick
+                    reply = sent
+
+                elif command == 'absorb':
+                    # Every outbox is complete once all workers have answered 'step'
+                    for source, box in enumerate(boxes):
+                        if source == region or not box.count:
+                            continue
+                        rows = box.read()
+                        mine = rows[edge_region[rows['edge']] == region]
+                        if len(mine):
+                            engine.import_columns(mine, append=True)
+                    # Rearmost vehicle of every border edge this region owns (inf elsewhere)
+                    rear, speed = engine.edge_tails(border)
+                    rear[~own_border] = np.inf
+                    reply = (engine.count, rear, speed)
+
+                elif command == 'snapshot':
+                    reply = (engine.export_rows(np.arange(engine.count)), simulator.stats)
+
+                elif command == 'stop':
+                    simulator.stop_simulation()
+                    reply = True
+
+                elif command == 'close':
+                    conn.send(('ok', True))
+                    break
+
+                else:
+                    raise ValueError(f'Unknown command: {command}')
+
+                conn.send(('ok', reply))
+            except Exception as e:
+                conn.send(('error', f'{type(e).__name__}: {e}'))
+    finally:
+        for box in boxes:
+            box.close()
+        conn.close()
+
+
+class ShardedSimulator:
+    """
+    Runs the city as ``workers`` regions, each in its own process with its
+    own VehicleEngine. Ticks are lock-step: every region steps, publishes the
+    vehicles that crossed its border into its shared-memory outbox, then every
+    region absorbs the rows that landed on its edges. Car following looks
+    across the border through ghosts: the rearmost vehicle of every border
+    edge, as of the last barrier, is passed to the regions that do not own it.
+
+    Exposes the same surface as MockSimulator that SimulationStream and the
+    REST routes use (``get_simulation_data``, ``update_simulation``,
+    start/stop/pause/resume, ``vehicle_count``).
+    """
+
+    def __init__(self, workers: int = 4, config=None, network: RoadNetwork = None,
+                 handover_capacity: int = 65536):
+        self.config = config or {}
+        self.workers = max(1, workers)
+        self.verbose = self.config.get('verbose', True)
+        self.handover_capacity = handover_capacity
+        self.network = network or default_network(self.config.get('network_bounds'))
+        self.edge_region = partition_edges(self.network, self.workers)
+        self.border = border_edges(self.network, self.edge_region)
+        self._ghosts = (np.full(len(self.border), np.inf), np.zeros(len(self.border)))
+
+        # Merged view served to readers; never ticked itself
+        self.view = MockSimulator(dict(self.config, verbose=False), self.network)
+        self._view_time = None
+        self._snapshot_wanted = False  # set by readers, served at the end of the next tick
+        self._region_counts = [0] * self.workers
+        self._region_stats: List[Dict] = []
+        self._initial_count = 0
+        self.handovers = 0
+
+        self._processes = []
+        self._pipes = []
+        self._boxes: List[HandoverBox] = []
+
+    # ------------------------------------------------------------------
+    # Worker pool
+    # ------------------------------------------------------------------
+    def _launch(self):
+        """Create the shared-memory boxes and start one process per region"""
+        if self._processes:
+            return
+        # One outbox per region plus the coordinator's (initial population)
+        self._boxes = [HandoverBox(self.handover_capacity) for _ in range(self.workers + 1)]
+        names = [box.name for box in self._boxes]
+        context = mp.get_context('spawn')
+        worker_config = {k: v for k, v in self.config.items() if k != 'verbose'}
+
+        for region in range(self.workers):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_region_worker,
+                args=(region, self.workers, worker_config, self.network, names,
+                      self.handover_capacity, child),
+                daemon=True
+            )
+            process.start()
+            child.close()
+            self._processes.append(process)
+            self._pipes.append(parent)
+
+        if self.verbose:
+            print(f"🧩 Sharded simulation: {self.workers} regions")
+
+    def _broadcast(self, command: str, payloads=None) -> list:
+        """Send a command to every region and wait for all replies (the tick barrier)"""
+        for region, pipe in enumerate(self._pipes):
+            pipe.send((command, payloads[region] if payloads is not None else None))
+        replies = []
+        for region, pipe in enumerate(self._pipes):
+            status, reply = pipe.recv()
+            if status != 'ok':
+                raise RuntimeError(f'Region {region} failed on {command}: {reply}')
+            replies.append(reply)
+        return replies
+
+    def close(self):
+        """Stop the worker processes and release the shared memory"""
+        if self._processes:
+            try:
+                self._broadcast('close')
+            except (EOFError, BrokenPipeError, RuntimeError):
+                pass
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        for pipe in self._pipes:
+            pipe.close()
+        for box in self._boxes:
+            box.close()
+            box.unlink()
+        self._processes, self._pipes, self._boxes = [], [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Simulation control
+    # ------------------------------------------------------------------
+    @property
+    def is_running(self) -> bool:
+        return self.view.is_running
+
+    @property
+    def is_paused(self) -> bool:
+        return self.view.is_paused
+
+    @property
+    def current_scenario(self):
+        return self.view.current_scenario
+
+    @property
+    def simulation_time(self) -> float:
+        return self.view.simulation_time
+
+    @property
+    def vehicle_count(self) -> int:
+        return sum(self._region_counts)
+
+    def start_simulation(self, scenario_id: str = 'default', seed: int = None,
+                         vehicle_count: int = None):
+        """Generate the initial fleet once, then scatter it to the regions"""
+        self._launch()
+        seed = self.config.get('seed') if seed is None else seed
+
+        # The view generates the population exactly like the single-process engine
+        self.view.start_simulation(scenario_id, seed=seed, vehicle_count=vehicle_count)
+        initial = self.view.engine.export_rows(np.arange(self.view.engine.count))
+        if len(initial) > self.handover_capacity:
+            raise ValueError(f'{len(initial)} initial vehicles exceed the handover capacity '
+                             f'({self.handover_capacity})')
+
+        # Region serials continue after the initial fleet, interleaved by region
+        serial_base = self._initial_count = self.view.stats['total_vehicles_created']
+        region_seeds = np.random.SeedSequence(seed).spawn(self.workers)
+        self._broadcast('start', [
+            (scenario_id, int(s.generate_state(1)[0]), serial_base) for s in region_seeds])
+
+        self._boxes[-1].write(initial)
+        self._absorb()
+        self._boxes[-1].clear()
+        self._view_time = None
+
+        if self.verbose:
+            print(f"✅ Sharded simulation started with scenario: {scenario_id}")
+            print(f"   Vehicles: {self.vehicle_count} over {self.workers} regions")
+        return True
+
+    def stop_simulation(self):
+        if self._processes:
+            self._broadcast('stop')
+        self._region_counts = [0] * self.workers
+        self._view_time = None
+        return self.view.stop_simulation()
+
+    def pause_simulation(self):
+        return self.view.pause_simulation()
+
+    def resume_simulation(self):
+        return self.view.resume_simulation()
+
+    def update_simulation(self, delta_time: float = 0.1, publish: bool = True):
+        """One synchronized tick across every region (``publish`` as in MockSimulator)"""
+        if not self.is_running or self.is_paused:
+            return
+        payload = (delta_time,) + self._ghosts
+        self.handovers += sum(self._broadcast('step', [payload] * self.workers))
+        self._absorb()
+
+        # Lights are a pure function of simulated time: the view mirrors them
+        self.view.simulation_time += delta_time
+        self.view._update_traffic_lights(delta_time)
+        self.view.tick_count += 1
+        if publish:
+            self.publish()
+
+    def _absorb(self):
+        """
+        Second half of the tick barrier: every region takes the vehicles that
+        landed on its edges, and the rearmost vehicle of each border edge
+        (from its owner) becomes a ghost leader for the other regions next tick
+        """
+        replies = self._broadcast('absorb')
+        self._region_counts = [count for count, _, _ in replies]
+        rear = np.stack([rear for _, rear, _ in replies])
+        speed = np.stack([speed for _, _, speed in replies])
+        owner = np.argmin(rear, axis=0)
+        columns = np.arange(len(self.border))
+        self._ghosts = (rear[owner, columns], speed[owner, columns])
+
+    def publish(self):
+        """Gathering every region is costly: only publish when someone reads"""
+        if self._snapshot_wanted:
+            self._snapshot_wanted = False
+            self._sync_view()
+
+    def run(self, duration_s: float, dt: float = 0.1, scenario_id: str = None,
+            seed: int = None, vehicle_count: int = None) -> Dict:
+        """Headless run, same contract as MockSimulator.run"""
+        if scenario_id is not None or not self.is_running:
+            self.start_simulation(scenario_id or 'default', seed=seed, vehicle_count=vehicle_count)
+
+        steps = int(round(duration_s / dt))
+        wall_start = time.perf_counter()
+        for _ in range(steps):
+            self.update_simulation(dt, publish=False)
+        wall_time = time.perf_counter() - wall_start
+
+        self._sync_view()
+        summary = self.view.get_run_summary(steps=steps, wall_time=wall_time)
+        summary['regions'] = self.workers
+        summary['handovers'] = self.handovers
+        return summary
+
+    # ------------------------------------------------------------------
+    # Merged view
+    # ------------------------------------------------------------------
+    def _sync_view(self):
+        """Gather every region's vehicles into the view engine (once per tick)"""
+        if self._view_time == self.view.simulation_time or not self._processes:
+            return
+        replies = self._broadcast('snapshot')
+        engine = self.view.engine
+        engine.clear()
+        for rows, _ in replies:
+            engine.import_columns(rows, append=True)
+        self._region_stats = [stats for _, stats in replies]
+
+        stats = self.view.stats
+        stats['total_vehicles_created'] = self._initial_count + sum(
+            s['total_vehicles_created'] for s in self._region_stats)
+        stats['emergency_vehicles_served'] = sum(s['emergency_vehicles_served'] for s in self._region_stats)
+        stats['trips_completed'] = sum(s['trips_completed'] for s in self._region_stats)
+        self.view.metrics = self.view.calculate_metrics()
+        self._view_time = self.view.simulation_time
+        self.view.publish()
+
+    @property
+    def snapshot(self):
+        """
+        Latest merged snapshot. Readers never talk to the workers (that would
+        race with the tick): they ask for a fresh merge after the next tick.
+        """
+        self._snapshot_wanted = True
+        return self.view.snapshot
+
+    def get_simulation_data(self) -> Dict:
+        """Same payload as MockSimulator.get_simulation_data, merged over regions"""
+        return self.snapshot.to_dict()
+
+    def get_vehicle_by_id(self, vehicle_id: str) -> Dict:
+        self._snapshot_wanted = True
+        return self.view.get_vehicle_by_id(vehicle_id)
+
+    # Vehicles live in the worker processes, which only take synchronized ticks
+    def add_vehicles(self, vehicle_types) -> List[Dict]:
+        raise UnsupportedCommand('Cannot add vehicles to a sharded simulation')
+
+    def add_emergency_vehicle(self) -> Dict:
+        raise UnsupportedCommand('Cannot add vehicles to a sharded simulation')
+
+    def remove_vehicle(self, vehicle_id: str) -> bool:
+        raise UnsupportedCommand('Cannot remove vehicles from a sharded simulation')
+
+    def change_scenario(self, scenario_id: str) -> bool:
+        raise UnsupportedCommand('Cannot change the scenario of a running sharded simulation; restart it')
+
+    def optimize_traffic_light(self, tl_id: str, algorithm) -> Dict:
+        raise UnsupportedCommand('Cannot re-time the traffic lights of a sharded simulation')
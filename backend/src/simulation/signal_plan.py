@@ -0,0 +1,270 @@
+"""
+Traffic-signal plans compiled into arrays for closed-form state lookups
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .road_network import RoadNetwork
+
+# Signal state characters (SUMO convention); anything else counts as red
+GREEN_CHARS = 'Gg'
+YELLOW_CHARS = 'yYu'
+MAX_LINKS = 64  # one bit per signal link in a uint64 plane
+
+
+def parse_state(state: str) -> Tuple[int, int, int]:
+    """State string -> (green, yellow, red) bitmasks, bit k = link k"""
+    if len(state) > MAX_LINKS:
+        raise ValueError(f'At most {MAX_LINKS} links per light, got {len(state)}')
+    green = yellow = red = 0
+    for link, char in enumerate(state):
+        if char in GREEN_CHARS:
+            green |= 1 << link
+        elif char in YELLOW_CHARS:
+            yellow |= 1 << link
+        else:
+            red |= 1 << link
+    return green, yellow, red
+
+
+def encode_state(green: int, yellow: int, link_count: int) -> str:
+    """Bitmasks -> state string for the frontend"""
+    return ''.join('G' if green >> link & 1 else 'y' if yellow >> link & 1 else 'r'
+                   for link in range(link_count))
+
+
+class SignalPlan:
+    """
+    Cyclic phase plans of many lights.
+
+    Phases of every light are laid end to end on one time axis: light ``i``
+    owns ``[base[i], base[i] + cycle[i])`` and each of its phases ends at a
+    cumulative offset inside that range. The phase of every light at a
+    simulated time ``t`` is then cycle arithmetic plus one ``searchsorted``
+    over all lights - no per-tick state, so any ``t`` can be evaluated
+    (seeking, replay, late ticks).
+
+    Each light is anchored: at ``anchor_time`` it was ``anchor_pos`` seconds
+    into its cycle. Actuated control re-times a light by changing its phase
+    durations and re-anchoring it (see ``retime``).
+    """
+
+    def __init__(self, durations: Sequence[Sequence[float]], states: Sequence[Sequence[str]],
+                 initial_phases: Sequence[int] = None):
+        # Per-phase bit planes (bit k = signal link k); strings only on serialization
+        planes = np.array([parse_state(state) for light in states for state in light],
+                          dtype=np.uint64).reshape(-1, 3)
+        self.green, self.yellow, self.red = planes[:, 0].copy(), planes[:, 1].copy(), planes[:, 2].copy()
+        self.link_count = np.array([max(map(len, light), default=0) for light in states], dtype=np.int64)
+        counts = np.array([len(light) for light in durations], dtype=np.int64)
+        if np.any(counts == 0):
+            raise ValueError('Every light needs at least one phase')
+        self.phase_ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.phase_ptr[1:])
+        self.light_of_phase = np.repeat(np.arange(len(counts)), counts)
+        self.durations = np.array([d for light in durations for d in light], dtype=np.float64)
+
+        self.initial_phases = np.zeros(len(counts), dtype=np.int64) if initial_phases is None \
+            else np.asarray(initial_phases, dtype=np.int64)
+        self._compile()
+        self.reset()
+
+    @classmethod
+    def from_lights(cls, traffic_lights: List[Dict]) -> 'SignalPlan':
+        """Compile the simulator's traffic-light dicts"""
+        return cls(
+            durations=[[phase['duration'] for phase in tl['phases']] for tl in traffic_lights],
+            states=[[phase['state'] for phase in tl['phases']] for tl in traffic_lights],
+            initial_phases=[tl.get('currentPhase', 0) for tl in traffic_lights]
+        )
+
+    def __len__(self) -> int:
+        return len(self.phase_ptr) - 1
+
+    def copy(self) -> 'SignalPlan':
+        """Plan with its own arrays (copy before re-timing a plan a snapshot may hold)"""
+        plan = object.__new__(SignalPlan)
+        plan.__dict__ = {name: value.copy() if isinstance(value, np.ndarray) else value
+                         for name, value in self.__dict__.items()}
+        return plan
+
+    def _compile(self):
+        """Rebuild the cumulative offsets from ``durations``"""
+        ends = np.cumsum(self.durations)
+        first = self.phase_ptr[:-1]
+        light_end = ends[self.phase_ptr[1:] - 1]
+        self.axis_base = np.concatenate([[0.0], light_end[:-1]])
+        self.cycle = light_end - self.axis_base
+        self.axis_ends = ends
+        self.phase_start = ends - self.durations - self.axis_base[self.light_of_phase]
+        self._first = first
+
+    def reset(self):
+        """Every light at the start of its initial phase at t = 0"""
+        self.anchor_time = np.zeros(len(self), dtype=np.float64)
+        self.anchor_pos = self.phase_start[self._first + self.initial_phases].copy()
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def flat_phase_at(self, t):
+        """
+        Global phase index of every light at time ``t`` (a scalar or one
+        time per light) and the seconds already spent in that phase.
+        """
+        local = np.mod(t - self.anchor_time + self.anchor_pos, self.cycle)
+        flat = np.searchsorted(self.axis_ends, self.axis_base + local, side='right')
+        flat = np.minimum(flat, self.phase_ptr[1:] - 1)  # guards local == cycle after rounding
+        return flat, local - self.phase_start[flat]
+
+    def phase_at(self, t):
+        """Phase number (within each light's plan) and elapsed seconds at ``t``"""
+        flat, elapsed = self.flat_phase_at(t)
+        return flat - self._first, elapsed
+
+    def state_string(self, flat: int) -> str:
+        """State string of a (global) phase index"""
+        light = self.light_of_phase[flat]
+        return encode_state(int(self.green[flat]), int(self.yellow[flat]), int(self.link_count[light]))
+
+    def states_at(self, t) -> List[str]:
+        """Signal state strings of every light at ``t``"""
+        flat, _ = self.flat_phase_at(t)
+        return [self.state_string(i) for i in flat.tolist()]
+
+    # ------------------------------------------------------------------
+    # Actuated control
+    # ------------------------------------------------------------------
+    def retime(self, light: int, durations: Sequence[float], t: float):
+        """
+        Replace the phase durations of ``light`` from time ``t`` on. The
+        light keeps its current phase, which restarts with its new duration.
+        """
+        start, end = self.phase_ptr[light], self.phase_ptr[light + 1]
+        if len(durations) != end - start:
+            raise ValueError(f'Light {light} has {end - start} phases, got {len(durations)} durations')
+        phase, _ = self.phase_at(t)
+        self.durations[start:end] = durations
+        self._compile()
+        self.anchor_time[light] = t
+        self.anchor_pos[light] = self.phase_start[start + phase[light]]
+
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays needed to restore the plan timing (checkpoints)"""
+        return {
+            'durations': self.durations,
+            'anchor_time': self.anchor_time,
+            'anchor_pos': self.anchor_pos,
+        }
+
+    def import_arrays(self, arrays: Dict[str, np.ndarray]):
+        self.durations = np.array(arrays['durations'], dtype=np.float64)
+        self._compile()
+        self.anchor_time = np.array(arrays['anchor_time'], dtype=np.float64)
+        self.anchor_pos = np.array(arrays['anchor_pos'], dtype=np.float64)
+
+
+def snap_to_nodes(network: RoadNetwork, lat: Sequence[float], lng: Sequence[float]) -> np.ndarray:
+    """
+    Nearest intersection of every light (one light per intersection, first
+    come first served). The nearest node of every light comes from one
+    batched node-grid query; a light whose node is already taken searches
+    the grid in a square around it, widened until the nearest free node
+    found is provably the nearest. Raises ValueError when there are more
+    lights than nodes.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    if len(lat) > network.node_count:
+        raise ValueError(f'{len(lat)} traffic lights but only {network.node_count} intersections')
+    grid = network.node_grid
+    nearest = grid.query_radius(lat, lng, 2 * grid.cell_size).tolist()
+    taken = np.zeros(network.node_count, dtype=bool)
+    nodes = np.empty(len(lat), dtype=np.int64)
+    for light, node in enumerate(nearest):
+        if node < 0 or taken[node]:
+            node = _nearest_free(network, taken, lat[light], lng[light])
+        nodes[light] = node
+        taken[node] = True
+    return nodes
+
+
+def _nearest_free(network: RoadNetwork, taken: np.ndarray, lat: float, lng: float) -> int:
+    """Nearest node not ``taken`` (Manhattan distance in degrees)"""
+    grid = network.node_grid
+    reach = grid.cell_size
+    while True:
+        cells = grid.cell_range(lat - reach, lng - reach, lat + reach, lng + reach)
+        items = grid.query_cells(*cells)
+        whole = 4 * len(items) > network.node_count
+        if whole:  # the square holds a good part of the network: one pass over every node is cheaper
+            items = np.arange(network.node_count)
+        else:
+            items = np.sort(items)  # ties go to the lowest node index
+        items = items[~taken[items]]
+        if len(items):
+            dist = np.abs(network.node_lat[items] - lat) + np.abs(network.node_lng[items] - lng)
+            best = int(np.argmin(dist))
+            if whole or dist[best] <= reach:  # nodes outside the square are farther than ``reach``
+                return int(items[best])
+            reach = float(dist[best])
+        elif whole or cells == grid.cell_range(-90.0, -180.0, 90.0, 180.0):
+            raise ValueError('No free intersection left for a traffic light')
+        else:
+            reach *= 2
+
+class MovementMap:
+    """
+    Which light and which signal link control every movement, i.e. every
+    (edge, travel direction, lane) approaching a signalized intersection.
+
+    Links are split between the two axes: approaches travelling north/south
+    use the first half of the state string, east/west ones the second half,
+    and the lanes of an axis are dealt out over its links in order. Lookups
+    are plain array indexing, so testing a whole fleet against the current
+    red planes is one gather and one bitwise AND.
+    """
+
+    def __init__(self, network: RoadNetwork, light_nodes: Sequence[int], link_counts: Sequence[int]):
+        max_lanes = int(network.edge_lanes.max()) if network.edge_count else 1
+        shape = (network.edge_count, 2, max_lanes)  # direction index 1 = along the edge
+        self.light = np.full(shape, -1, dtype=np.int32)
+        self.bit = np.zeros(shape, dtype=np.uint64)
+        self.axis_mask = np.zeros(shape, dtype=np.uint64)  # links compatible with the movement
+
+        for light, (node, links) in enumerate(zip(light_nodes, link_counts)):
+            # Approaches: incoming edges driven forward, outgoing edges driven backward
+            approaches = [(e, 1) for e in network.incoming(node).tolist()] + \
+                         [(e, 0) for e in network.outgoing(node).tolist()]
+            headings = np.radians([network.edge_heading[e] + (0 if d else 180) for e, d in approaches])
+            north_south = np.abs(np.cos(headings)) >= np.abs(np.sin(headings))
+
+            half = max(1, links // 2)
+            groups = ((0, half), (half, links) if links > 1 else (0, 1))
+            for axis, (first, last) in enumerate(groups):
+                mask = ((1 << last) - 1) ^ ((1 << first) - 1)
+                k = 0
+                for (edge, direction), is_ns in zip(approaches, north_south):
+                    if is_ns != (axis == 0):
+                        continue
+                    for lane in range(int(network.edge_lanes[edge])):
+                        link = first + k % (last - first)
+                        self.light[edge, direction, lane] = light
+                        self.bit[edge, direction, lane] = 1 << link
+                        self.axis_mask[edge, direction, lane] = mask
+                        k += 1
+
+    def lookup(self, edge, direction, lane):
+        """(light, link bit) of each movement; light -1 = unsignalized"""
+        index = (edge, (np.asarray(direction) > 0).astype(np.intp), lane)
+        return self.light[index], self.bit[index]
+
+    def facing(self, planes: np.ndarray, edge, direction, lane) -> np.ndarray:
+        """
+        True for movements whose link is set in their light's plane
+        (``planes`` holds one current bit plane per light, e.g. red)
+        """
+        light, bit = self.lookup(edge, direction, lane)
+        padded = np.append(planes, np.uint64(0))  # light -1 hits the empty plane
+        return (padded[light] & bit) != 0
@@ -0,0 +1,127 @@
+"""
+Immutable end-of-tick snapshots shared with concurrent readers
+"""
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .signal_plan import SignalPlan
+from .vehicle_engine import VehicleView
+
+
+def light_dicts(traffic_lights: List[Dict], plan: SignalPlan, light_phase: np.ndarray,
+                light_elapsed: np.ndarray, simulation_time: float) -> List[Dict]:
+    """New light dicts carrying the state of every light (the configured dicts are not touched)"""
+    phases = (light_phase - plan.phase_ptr[:-1]).tolist()
+    last_change = (simulation_time - light_elapsed).tolist()
+    lights = []
+    for tl, flat, phase, changed in zip(traffic_lights, light_phase.tolist(), phases, last_change):
+        light = dict(tl)
+        light['phases'] = [dict(p) for p in tl['phases']]
+        light['currentPhase'] = phase
+        light['state'] = plan.state_string(flat)
+        light['lastChange'] = round(changed, 3) + 0.0  # no -0.0
+        lights.append(light)
+    return lights
+
+
+class Snapshot:
+    """
+    State of the simulation at the end of one tick, never modified after
+    it is built.
+
+    The simulation thread builds a new snapshot at the end of every tick and
+    publishes it by rebinding one attribute, an atomic operation, so readers
+    (websocket handlers, REST routes, the stream) take ``simulator.snapshot``
+    once and work on a consistent tick without locks. A reader may hold an
+    old snapshot for as long as it likes: the next tick publishes fresh
+    buffers instead of overwriting these ones.
+
+    Publishing only copies the vehicle columns and light arrays; the dicts
+    are built lazily on the first read and cached for the other readers.
+    """
+
+    __slots__ = ('engine', 'columns', 'traffic_lights', 'plan', 'light_phase', 'light_elapsed',
+                 'simulation_time', 'metrics', 'stats', 'scenario', 'is_running', 'is_paused',
+                 'tick', 'timestamp', '_vehicles', '_lights', '_order')
+
+    def __init__(self, simulator, tick: int = 0):
+        self.engine = simulator.engine  # only its immutable tables are used (edge ids, routes)
+        self.columns = simulator.engine.copy_columns()
+        # Replaced, never mutated, by the simulator when lights are added or re-timed
+        self.traffic_lights = tuple(simulator.traffic_lights)
+        self.plan = simulator.signal_plan
+        self.light_phase = simulator.light_phase.copy()
+        self.light_elapsed = simulator.light_elapsed.copy()
+        self.simulation_time = simulator.simulation_time
+        self.metrics = simulator.metrics  # replaced, never mutated, by calculate_metrics
+        self.stats = dict(simulator.stats)
+        self.scenario = simulator.current_scenario
+        self.is_running = simulator.is_running
+        self.is_paused = simulator.is_paused
+        self.tick = tick
+        self.timestamp = time.time()
+        self._vehicles: Optional[List[Dict]] = None
+        self._lights: Optional[List[Dict]] = None
+        self._order: Optional[np.ndarray] = None
+
+    @property
+    def vehicle_count(self) -> int:
+        return len(self.columns['serial'])
+
+    @property
+    def vehicles(self) -> List[Dict]:
+        """Vehicle dicts (built on first access; treat as read-only)"""
+        if self._vehicles is None:
+            self._vehicles = self.engine.columns_to_dicts(self.columns)
+        return self._vehicles
+
+    @property
+    def lights(self) -> List[Dict]:
+        """Traffic-light dicts (built on first access; treat as read-only)"""
+        if self._lights is None:
+            self._lights = light_dicts(self.traffic_lights, self.plan, self.light_phase,
+                                       self.light_elapsed, self.simulation_time)
+        return self._lights
+
+    @property
+    def serial_order(self) -> np.ndarray:
+        """Rows sorted by serial (sorted on first access, shared by every lookup)"""
+        if self._order is None:
+            order = np.argsort(self.columns['serial'])
+            order.flags.writeable = False
+            self._order = order
+        return self._order
+
+    def find(self, serial: int) -> int:
+        """Row of the vehicle with ``serial`` or -1 (binary search, O(log n))"""
+        order = self.serial_order
+        serials = self.columns['serial']
+        pos = int(np.searchsorted(serials, serial, sorter=order))
+        if pos < len(order) and serials[order[pos]] == serial:
+            return int(order[pos])
+        return -1
+
+    def view(self, row: int) -> VehicleView:
+        """One vehicle, without serializing the rest of the fleet"""
+        return VehicleView(self.engine, self.columns, row)
+
+    def views(self):
+        """Every vehicle as a VehicleView (no dicts built)"""
+        for row in range(self.vehicle_count):
+            yield VehicleView(self.engine, self.columns, row)
+
+    def to_dict(self) -> Dict:
+        """Payload of ``get_simulation_data``"""
+        return {
+            'vehicles': self.vehicles,
+            'traffic_lights': self.lights,
+            'metrics': self.metrics,
+            'timestamp': self.timestamp,
+            'simulation_time': self.simulation_time,
+            'scenario': self.scenario,
+            'is_running': self.is_running,
+            'is_paused': self.is_paused,
+            'stats': self.stats
+        }
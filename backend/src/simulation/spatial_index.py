@@ -0,0 +1,160 @@
+"""
+Uniform-grid spatial index for batched proximity queries
+"""
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+_KEY_OFFSET = 1 << 30  # keeps negative cell coordinates positive inside the key
+
+
+class SpatialIndex:
+    """
+    Buckets 2-D points (lat/lng degrees) into square cells of ``cell_size``.
+
+    Items are kept sorted by cell key, so a cell is a contiguous range of
+    ``order`` found with ``searchsorted``. Queries are vectorized over the
+    query points: each neighbouring cell offset and each slot inside a cell
+    is one NumPy pass, so the cost depends on local density, not on the
+    total number of indexed items.
+    """
+
+    def __init__(self, cell_size: float, lat=None, lng=None, metric: str = 'manhattan'):
+        if metric not in ('manhattan', 'euclidean'):
+            raise ValueError(f'Unknown metric: {metric}')
+        self.cell_size = float(cell_size)
+        self.metric = metric
+        self.lat = np.zeros(0, dtype=np.float64)
+        self.lng = np.zeros(0, dtype=np.float64)
+        self._rebuild()
+        if lat is not None:
+            self.add(lat, lng)
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    def _cells(self, lat: np.ndarray, lng: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Integer cell coordinates (x = lng, y = lat)"""
+        return (np.floor(lng / self.cell_size).astype(np.int64),
+                np.floor(lat / self.cell_size).astype(np.int64))
+
+    @staticmethod
+    def _keys(cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        return ((cx + _KEY_OFFSET) << 32) | (cy + _KEY_OFFSET)
+
+    def _rebuild(self):
+        """Sort items by cell key and compute the per-cell ranges"""
+        keys = self._keys(*self._cells(self.lat, self.lng))
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        self.cell_keys, self.cell_start, counts = np.unique(
+            sorted_keys, return_index=True, return_counts=True)
+        self.cell_end = self.cell_start + counts
+        self.max_occupancy = int(counts.max()) if len(counts) else 0
+        # Occupied extent in cell coordinates (x0, y0, x1, y1), empty when x0 > x1
+        if len(self.cell_keys):
+            cx = (self.cell_keys >> 32) - _KEY_OFFSET
+            cy = (self.cell_keys & 0xFFFFFFFF) - _KEY_OFFSET
+            self.extent = (int(cx.min()), int(cy.min()), int(cx.max()), int(cy.max()))
+        else:
+            self.extent = (0, 0, -1, -1)
+
+    def add(self, lat, lng) -> np.ndarray:
+        """Index new points; returns their item indices"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        first = len(self.lat)
+        self.lat = np.concatenate([self.lat, lat])
+        self.lng = np.concatenate([self.lng, lng])
+        self._rebuild()
+        return np.arange(first, len(self.lat))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def _distance(self, items: np.ndarray, lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+        dlat = self.lat[items] - lat
+        dlng = self.lng[items] - lng
+        if self.metric == 'manhattan':
+            return np.abs(dlat) + np.abs(dlng)
+        return np.hypot(dlat, dlng)
+
+    def query_radius(self, lat, lng, radius: float,
+                     return_distance: bool = False):
+        """
+        For each query point, the index of the nearest item within ``radius``
+        (-1 when there is none). Optionally also returns the distances.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        best = np.full(len(lat), -1, dtype=np.int64)
+        best_dist = np.full(len(lat), np.inf)
+
+        if len(self.lat) and len(lat):
+            qx, qy = self._cells(lat, lng)
+            reach = max(1, math.ceil(radius / self.cell_size))
+
+            for dx in range(-reach, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    keys = self._keys(qx + dx, qy + dy)
+                    pos = np.searchsorted(self.cell_keys, keys)
+                    pos = np.minimum(pos, len(self.cell_keys) - 1)
+                    hit = np.flatnonzero(self.cell_keys[pos] == keys)
+                    if not len(hit):
+                        continue
+                    start = self.cell_start[pos[hit]]
+                    end = self.cell_end[pos[hit]]
+
+                    # One vectorized pass per slot inside the visited cells
+                    for k in range(int((end - start).max())):
+                        live = start + k < end
+                        queries = hit[live]
+                        items = self.order[start[live] + k]
+                        dist = self._distance(items, lat[queries], lng[queries])
+                        better = (dist <= radius) & (dist < best_dist[queries])
+                        best[queries[better]] = items[better]
+                        best_dist[queries[better]] = dist[better]
+
+        if return_distance:
+            return best, best_dist
+        return best
+
+    def cell_range(self, min_lat: float, min_lng: float,
+                   max_lat: float, max_lng: float) -> Tuple[int, int, int, int]:
+        """
+        Cells (x0, y0, x1, y1) covering a bounding box, clipped to the
+        occupied extent (so a world-sized box costs no more than the data)
+        """
+        x0, y0 = self._cells(np.array([min_lat]), np.array([min_lng]))
+        x1, y1 = self._cells(np.array([max_lat]), np.array([max_lng]))
+        ex0, ey0, ex1, ey1 = self.extent
+        return (max(int(x0[0]), ex0), max(int(y0[0]), ey0),
+                min(int(x1[0]), ex1), min(int(y1[0]), ey1))
+
+    def query_cells(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """Indices of the items in a range of cells (unsorted, cell by cell)"""
+        if x0 > x1 or y0 > y1:
+            return np.zeros(0, dtype=np.int64)
+        cx, cy = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        keys = self._keys(cx.ravel(), cy.ravel())
+        pos = np.minimum(np.searchsorted(self.cell_keys, keys), len(self.cell_keys) - 1)
+        pos = pos[self.cell_keys[pos] == keys]  # occupied cells only (an empty one maps to its successor)
+        if not len(pos):
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([self.order[s:e] for s, e in zip(self.cell_start[pos], self.cell_end[pos])])
+
+
+def build_index(lat, lng, cell_size: Optional[float] = None, **kwargs) -> SpatialIndex:
+    """Index points with a cell size derived from their spread when not given"""
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    if cell_size is None:
+        span = max(float(np.ptp(lat)) if len(lat) else 0.0,
+                   float(np.ptp(lng)) if len(lng) else 0.0, 1e-6)
+        # Roughly one item per cell for evenly spread points
+        cell_size = span / max(1.0, math.sqrt(len(lat)))
+    return SpatialIndex(cell_size, lat, lng, **kwargs)
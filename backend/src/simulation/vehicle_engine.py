@@ -0,0 +1,607 @@
+"""
+Vectorized vehicle state engine (struct-of-arrays)
+"""
+import gc
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import MetricsAccumulator
+from .road_network import RoadNetwork
+from .route_table import RouteTable, default_route_table
+
+# Interned codes - vehicles store small integers, strings only appear on serialization
+VEHICLE_TYPES = ['passenger', 'bus', 'truck', 'motorcycle', 'bicycle', 'emergency']
+TYPE_CODES = {vehicle_type: code for code, vehicle_type in enumerate(VEHICLE_TYPES)}
+EMERGENCY = TYPE_CODES['emergency']
+
+COLOR_PALETTE = ['#3b82f6', '#10b981', '#8b5cf6', '#f59e0b', '#ef4444', '#06b6d4']
+COLOR_CODES = {color: code for code, color in enumerate(COLOR_PALETTE)}
+TYPE_COLOR_CODES = np.array([
+    COLOR_CODES['#3b82f6'],  # passenger
+    COLOR_CODES['#f59e0b'],  # bus
+    COLOR_CODES['#8b5cf6'],  # truck
+    COLOR_CODES['#10b981'],  # motorcycle
+    COLOR_CODES['#06b6d4'],  # bicycle
+    COLOR_CODES['#ef4444'],  # emergency
+], dtype=np.uint8)
+
+# Subtype 0 means "regular vehicle"; anything else is a dispatched emergency vehicle
+EMERGENCY_SUBTYPES = ['', 'ambulance', 'police', 'fire_truck']
+
+# Car following (Intelligent Driver Model), indexed by vehicle type code
+VEHICLE_LENGTHS = np.array([4.5, 12.0, 10.0, 2.2, 1.8, 6.0])      # m
+DESIRED_SPEEDS = np.array([50.0, 40.0, 45.0, 55.0, 20.0, 70.0])  # km/h
+MAX_ACCEL = 1.5       # m/s^2
+COMFORT_DECEL = 2.0   # m/s^2
+MAX_DECEL = 9.0       # m/s^2, physical braking limit
+MIN_GAP = 2.0         # m, bumper-to-bumper standstill distance
+TIME_HEADWAY = 1.2    # s
+QUEUE_SPEED = 7.2     # km/h, below this a vehicle counts as queued
+
+_POSITION_BITS = 24   # lane sort key: position along the edge in cm (edges < 167 km)
+_POSITION_LIMIT = (1 << _POSITION_BITS) - 1
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Suspend the cyclic garbage collector while building many acyclic objects
+    (serialization would otherwise trigger a collection every few hundred dicts)
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class VehicleEngine:
+    """
+    Keeps the whole fleet in contiguous NumPy arrays and advances it in one step.
+
+    Each column is a capacity-sized buffer; only the first ``count`` rows are live.
+    Edge geometry comes from the compiled RoadNetwork and is indexed by edge id.
+
+    Rows move when vehicles are removed (swap-remove), so callers that need to
+    hold on to a vehicle use its serial: ``find`` resolves it in O(1) through
+    a stable internal handle that follows the vehicle from slot to slot.
+    """
+
+    # (name, dtype, trailing shape)
+    COLUMNS = (
+        ('serial', np.int64, ()),
+        ('handle', np.int32, ()),
+        ('vtype', np.uint8, ()),
+        ('color', np.uint8, ()),
+        ('subtype', np.uint8, ()),
+        ('lat', np.float64, ()),
+        ('lng', np.float64, ()),
+        ('speed', np.float64, ()),
+        ('heading', np.float64, ()),
+        ('edge', np.int32, ()),
+        ('lane', np.int8, ()),
+        ('progress', np.float64, ()),
+        ('direction', np.int8, ()),
+        ('distance', np.float64, ()),
+        ('created', np.float64, ()),
+        ('route_id', np.int32, ()),
+        ('route_pos', np.int32, ()),
+    )
+    # One vehicle as a packed record (used to ship rows between processes)
+    ROW_DTYPE = np.dtype([(name, dtype, shape) for name, dtype, shape in COLUMNS])
+    # Columns the JSON serialization reads
+    SERIALIZED = ('serial', 'vtype', 'color', 'subtype', 'lat', 'lng', 'speed', 'heading',
+                  'edge', 'lane', 'progress', 'direction', 'distance', 'created', 'route_id')
+
+    def __init__(self, network: RoadNetwork, rng: Optional[np.random.Generator] = None,
+                 capacity: int = 1024, routes: Optional[RouteTable] = None):
+        self.network = network
+        self.routes = routes if routes is not None else default_route_table(network)
+        self.edge_ids = network.edge_ids
+        self.edge_from_lat = network.edge_from_lat
+        self.edge_from_lng = network.edge_from_lng
+        self.edge_dlat = network.edge_dlat
+        self.edge_dlng = network.edge_dlng
+        self.edge_length = network.edge_length
+        self.edge_heading = network.edge_heading
+        self.edge_lanes = network.edge_lanes
+        self.edge_speed_limit = network.edge_speed_limit
+        self.max_lanes = int(network.edge_lanes.max()) if network.edge_count else 1
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.totals = MetricsAccumulator(len(VEHICLE_TYPES))
+
+        self.count = 0
+        self.capacity = 0
+        self._allocate(max(1, capacity))
+        self._reset_index()
+
+        # Lane ordering of the last step: rows sorted by (lane, position) and
+        # the row of each vehicle's leader (-1 when it leads its lane)
+        self.lane_order = np.zeros(0, dtype=np.int64)
+        self.leader = np.zeros(0, dtype=np.int64)
+        self.edge_arrivals = np.zeros(network.edge_count, dtype=np.int64)
+        self.arrived = np.zeros(0, dtype=np.int64)  # slots that reached their destination
+        # Rearmost vehicles simulated elsewhere (other regions), see set_ghosts
+        self.ghost_edges: Optional[np.ndarray] = None
+        self.ghost_rear = self.ghost_speed = None
+        self._lane_ids: Optional[List[str]] = None  # interned '<edge>_lane_<k>' strings
+
+    def __len__(self) -> int:
+        return self.count
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _allocate(self, capacity: int):
+        """Grow every column buffer (and the handle table) to ``capacity`` rows"""
+        for name, dtype, shape in self.COLUMNS:
+            buffer = np.zeros((capacity,) + shape, dtype=dtype)
+            if self.count:
+                buffer[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, buffer)
+        handle_slot = np.full(capacity, -1, dtype=np.int64)
+        if self.capacity:
+            handle_slot[:self.capacity] = self._handle_slot
+        self._handle_slot = handle_slot
+        self.capacity = capacity
+
+    def _reserve(self, extra: int):
+        """Make room for ``extra`` more rows (amortized doubling)"""
+        needed = self.count + extra
+        if needed > self.capacity:
+            self._allocate(max(needed, self.capacity * 2))
+
+    def _reset_index(self):
+        """Forget every id -> handle -> slot mapping"""
+        self.index = {}  # serial -> handle
+        self._handle_slot[:] = -1
+        self._free_handles = np.zeros(0, dtype=np.int32)
+        self._next_handle = 0
+
+    def _acquire_handles(self, n: int) -> np.ndarray:
+        """Hand out ``n`` handles, recycling freed ones first"""
+        reused = min(n, len(self._free_handles))
+        handles = np.empty(n, dtype=np.int32)
+        if reused:
+            handles[:reused] = self._free_handles[len(self._free_handles) - reused:]
+            self._free_handles = self._free_handles[:len(self._free_handles) - reused]
+        fresh = n - reused
+        handles[reused:] = np.arange(self._next_handle, self._next_handle + fresh)
+        self._next_handle += fresh
+        return handles
+
+    def _register(self, start: int, end: int):
+        """Give the rows [start, end) handles and index them by serial"""
+        handles = self._acquire_handles(end - start)
+        self.handle[start:end] = handles
+        self._handle_slot[handles] = np.arange(start, end)
+        self.index.update(zip(self.serial[start:end].tolist(), handles.tolist()))
+
+    def clear(self):
+        """Drop all vehicles (buffers are kept for reuse)"""
+        self.count = 0
+        self.totals.reset()
+        self._reset_index()
+        self.lane_order = self.leader = self.arrived = np.zeros(0, dtype=np.int64)
+        self.edge_arrivals[:] = 0
+        self.ghost_edges = self.ghost_rear = self.ghost_speed = None
+
+    def spawn(self, serial, vtype, color, route_id, progress, speed, lane=None,
+              route_pos=0, subtype=0, heading=None, created=0.0) -> np.ndarray:
+        """
+        Append a batch of vehicles on routes of the route table, at
+        ``route_pos`` (edge index along the route) and ``progress`` on that
+        edge. Scalars are broadcast to the batch size; ``lane`` defaults to
+        a random lane. ``created`` is the simulated time of creation.
+        Returns the new slots.
+        """
+        serial = np.atleast_1d(np.asarray(serial, dtype=np.int64))
+        n = len(serial)
+        self._reserve(n)
+        start, end = self.count, self.count + n
+
+        route_id = np.broadcast_to(np.asarray(route_id, dtype=np.int32), (n,))
+        route_pos = np.broadcast_to(np.asarray(route_pos, dtype=np.int32), (n,))
+        edge = self.routes.edge_at(route_id, route_pos)
+        progress = np.broadcast_to(np.asarray(progress, dtype=np.float64), (n,))
+        if lane is None:
+            lane = self.random_lanes(edge)
+
+        self.serial[start:end] = serial
+        self.vtype[start:end] = vtype
+        self.color[start:end] = color
+        self.subtype[start:end] = subtype
+        self.edge[start:end] = edge
+        self.progress[start:end] = progress
+        self.speed[start:end] = speed
+        self.lane[start:end] = lane
+        self.direction[start:end] = 1  # routes follow the edge direction
+        self.distance[start:end] = 0.0
+        self.created[start:end] = created
+        self.heading[start:end] = self.edge_heading[edge] if heading is None else heading
+        self.route_id[start:end] = route_id
+        self.route_pos[start:end] = route_pos
+        self.lat[start:end] = self.edge_from_lat[edge] + self.edge_dlat[edge] * progress
+        self.lng[start:end] = self.edge_from_lng[edge] + self.edge_dlng[edge] * progress
+
+        self.count = end
+        self._register(start, end)
+        self.totals.add(self.vtype[start:end], self.speed[start:end], self.distance[start:end],
+                        self.created[start:end])
+        return np.arange(start, end)
+
+    def remove(self, slots) -> int:
+        """
+        Swap-remove the given slots: the last live rows are moved into the
+        holes, so the fleet stays dense and removal costs O(removed), not O(n).
+        Returns the number of vehicles removed.
+        """
+        slots = np.unique(np.atleast_1d(np.asarray(slots, dtype=np.int64)))
+        if not len(slots):
+            return 0
+        n = self.count
+        remaining = n - len(slots)
+
+        self.totals.remove(self.vtype[slots], self.speed[slots], self.distance[slots], self.created[slots])
+        handles = self.handle[slots]
+        self._handle_slot[handles] = -1
+        self._free_handles = np.concatenate([self._free_handles, handles])
+        for serial in self.serial[slots].tolist():
+            del self.index[serial]
+
+        # Holes below the new end are filled by the surviving rows above it
+        holes = slots[slots < remaining]
+        if len(holes):
+            tail = np.arange(remaining, n)
+            movers = tail[~np.isin(tail, slots, assume_unique=True)]
+            for name, _, _ in self.COLUMNS:
+                column = getattr(self, name)
+                column[holes] = column[movers]
+            self._handle_slot[self.handle[holes]] = holes
+
+        self.count = remaining
+        return len(slots)
+
+    def export_columns(self) -> Dict[str, np.ndarray]:
+        """Live rows of every column (views, not copies)"""
+        return {name: getattr(self, name)[:self.count] for name, _, _ in self.COLUMNS}
+
+    def export_rows(self, slots) -> np.ndarray:
+        """Copy the given slots into a packed ``ROW_DTYPE`` record array"""
+        slots = np.atleast_1d(np.asarray(slots, dtype=np.int64))
+        rows = np.empty(len(slots), dtype=self.ROW_DTYPE)
+        for name, _, _ in self.COLUMNS:
+            rows[name] = getattr(self, name)[slots]
+        return rows
+
+    def import_columns(self, columns: Dict[str, np.ndarray], append: bool = False) -> np.ndarray:
+        """
+        Load rows produced by ``export_columns`` (or a ``ROW_DTYPE`` record
+        array from ``export_rows``); returns their slots.
+        Handles are local to an engine, so imported rows get fresh ones.
+        """
+        n = len(columns['serial'])
+        if not append:
+            self.clear()
+        self._reserve(n)
+        start, end = self.count, self.count + n
+        for name, _, _ in self.COLUMNS:
+            if name != 'handle':
+                getattr(self, name)[start:end] = columns[name]
+        self.count = end
+        self._register(start, end)
+        self.totals.add(self.vtype[start:end], self.speed[start:end], self.distance[start:end],
+                        self.created[start:end])
+        return np.arange(start, end)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def find(self, serial: int) -> int:
+        """Return the slot holding ``serial`` or -1 (O(1))"""
+        handle = self.index.get(serial)
+        return -1 if handle is None else int(self._handle_slot[handle])
+
+    def random_lanes(self, edges: np.ndarray) -> np.ndarray:
+        """Pick a random lane on each of ``edges``"""
+        return (self.rng.random(len(edges)) * self.edge_lanes[edges]).astype(np.int8)
+
+    # ------------------------------------------------------------------
+    # Physics
+    # ------------------------------------------------------------------
+    def lane_keys(self) -> np.ndarray:
+        """Lane of every live vehicle as one integer: (edge, lane, travel direction)"""
+        n = self.count
+        return ((self.edge[:n].astype(np.int64) * self.max_lanes + self.lane[:n]) * 2
+                + (self.direction[:n] > 0))
+
+    def _sort_lanes(self, along: np.ndarray):
+        """
+        Sort vehicles by lane then by distance travelled on the edge, and
+        link each vehicle to the one right ahead of it in the same lane.
+        O(n log n); the sort is what replaces pairwise vehicle checks.
+        """
+        keys = self.lane_keys()
+        # One packed int64 key (lane, position in cm) sorts ~6x faster than lexsort
+        position = np.minimum(along * 100.0, _POSITION_LIMIT).astype(np.int64)
+        order = np.argsort((keys << _POSITION_BITS) | position)
+        sorted_keys = keys[order]
+        same_lane = sorted_keys[1:] == sorted_keys[:-1]
+
+        leader = np.full(len(keys), -1, dtype=np.int64)
+        leader[order[:-1][same_lane]] = order[1:][same_lane]
+        self.lane_order = order
+        self.leader = leader
+        return leader
+
+    def _rearmost(self, rear: np.ndarray, speed: np.ndarray):
+        """Per edge: rear of its rearmost vehicle (m along the edge, inf when empty) and that vehicle's speed"""
+        edge = self.edge[:len(rear)]
+        tail = np.full(len(self.edge_arrivals), np.inf)
+        np.minimum.at(tail, edge, rear)
+        tail_speed = np.zeros(len(tail))
+        is_tail = rear == tail[edge]
+        tail_speed[edge[is_tail]] = speed[is_tail]
+        return tail, tail_speed
+
+    def edge_tails(self, edges: np.ndarray):
+        """
+        Rear (m along the edge) and speed (km/h) of the rearmost vehicle on
+        each of ``edges`` (inf and 0 when empty), for ``set_ghosts`` elsewhere
+        """
+        n = self.count
+        edge = self.edge[:n]
+        direction = self.direction[:n]
+        progress = self.progress[:n]
+        along = np.where(direction > 0, progress, 1.0 - progress) * self.edge_length[edge] * 1000.0
+        tail, tail_speed = self._rearmost(along - VEHICLE_LENGTHS[self.vtype[:n]], self.speed[:n])
+        return tail[edges], tail_speed[edges]
+
+    def set_ghosts(self, edges: np.ndarray, rear: np.ndarray, speed: np.ndarray):
+        """
+        Rearmost vehicles on ``edges`` that this engine does not simulate
+        (``edge_tails`` of another engine): vehicles heading onto those edges
+        follow them like local ones. Kept until replaced or ``clear``.
+        """
+        self.ghost_edges = np.asarray(edges, dtype=np.int64)
+        self.ghost_rear = np.asarray(rear, dtype=np.float64)
+        self.ghost_speed = np.asarray(speed, dtype=np.float64)
+
+    def step(self, delta_time: float, stopping: Optional[np.ndarray] = None):
+        """
+        Advance every vehicle by ``delta_time`` seconds with IDM car following.
+        ``stopping`` flags vehicles facing a red light: the end of their edge
+        then acts as a stopped virtual leader.
+        """
+        n = self.count
+        if n == 0:
+            return
+
+        speed = self.speed[:n]
+        vtype = self.vtype[:n]
+        edge = self.edge[:n]
+        progress = self.progress[:n]
+        direction = self.direction[:n]
+
+        # Distances along the edge in the direction of travel (m)
+        edge_m = self.edge_length[edge] * 1000.0
+        along = np.where(direction > 0, progress, 1.0 - progress) * edge_m
+
+        # Gap to the leader (bumper to bumper) and its speed
+        leader = self._sort_lanes(along)
+        has_leader = leader >= 0
+        ahead = np.where(has_leader, leader, 0)
+        v = speed / 3.6
+        gap = np.where(has_leader, along[ahead] - along - VEHICLE_LENGTHS[vtype[ahead]], np.inf)
+        leader_v = np.where(has_leader, v[ahead], 0.0)
+
+        # Lane leaders look across the node at the rearmost vehicle of their next edge
+        # (any lane: the entry lane is only drawn on arrival), so queues spill back
+        tail, tail_v = self._rearmost(along - VEHICLE_LENGTHS[vtype], v)
+        if self.ghost_edges is not None:
+            ghost = self.ghost_edges
+            closer = self.ghost_rear < tail[ghost]
+            tail[ghost[closer]] = self.ghost_rear[closer]
+            tail_v[ghost[closer]] = self.ghost_speed[closer] / 3.6
+
+        route_id = self.route_id[:n]
+        next_pos = self.route_pos[:n] + 1
+        route_length = self.routes.length[route_id]
+        next_edge = self.routes.edge_at(route_id, np.minimum(next_pos, route_length - 1))
+        across = ~has_leader & (next_pos < route_length) & np.isfinite(tail[next_edge])
+        across_gap = edge_m - along + tail[next_edge]
+        gap = np.where(across, across_gap, gap)
+        leader_v = np.where(across, tail_v[next_edge], leader_v)
+        if stopping is not None:
+            stop_gap = edge_m - along
+            virtual = stopping & (stop_gap < gap)
+            gap = np.where(virtual, stop_gap, gap)
+            leader_v = np.where(virtual, 0.0, leader_v)
+        gap = np.maximum(gap, 0.1)
+
+        # IDM acceleration
+        desired = np.where(vtype == EMERGENCY, DESIRED_SPEEDS[vtype],
+                           np.minimum(DESIRED_SPEEDS[vtype], self.edge_speed_limit[edge])) / 3.6
+        wanted_gap = MIN_GAP + np.maximum(
+            0.0, v * TIME_HEADWAY + v * (v - leader_v) / (2.0 * np.sqrt(MAX_ACCEL * COMFORT_DECEL)))
+        accel = MAX_ACCEL * (1.0 - (v / desired) ** 4 - (wanted_gap / gap) ** 2)
+        new_v = np.maximum(0.0, v + np.maximum(accel, -MAX_DECEL) * delta_time)
+
+        # Never drive into the leader
+        travel = np.minimum((v + new_v) / 2.0 * delta_time, np.maximum(gap - 0.1, 0.0))
+        speed[:] = new_v * 3.6
+
+        # Progress along the current edge (edge lengths are in km)
+        distance_km = travel / 1000.0
+        progress += travel / edge_m * direction
+        self.distance[:n] += distance_km
+        self.totals.advance(vtype, speed, distance_km)
+
+        # Vehicles leaving their edge move on to the next edge of their route;
+        # those past the last edge wait at the destination in ``arrived``
+        leaving = np.flatnonzero((progress > 1.0) | (progress < 0.0))
+        self.arrived = np.zeros(0, dtype=np.int64)
+        if len(leaving):
+            route_pos = self.route_pos[leaving] + 1
+            done = route_pos >= self.routes.length[self.route_id[leaving]]
+            self.arrived = leaving[done]
+            progress[self.arrived] = np.clip(progress[self.arrived], 0.0, 1.0)
+            moving = leaving[~done]
+            self.route_pos[moving] = route_pos[~done]
+            edge[moving] = self.routes.edge_at(self.route_id[moving], self.route_pos[moving])
+            progress[moving] = np.where(direction[moving] > 0, 0.0, 1.0)
+            self.lane[moving] = self.random_lanes(edge[moving])
+            self.edge_arrivals += np.bincount(edge[moving], minlength=len(self.edge_arrivals))
+
+        self.lat[:n] = self.edge_from_lat[edge] + self.edge_dlat[edge] * progress
+        self.lng[:n] = self.edge_from_lng[edge] + self.edge_dlng[edge] * progress
+        self.heading[:n] = self.edge_heading[edge]
+
+    def queue_lengths(self, threshold: float = QUEUE_SPEED) -> np.ndarray:
+        """Queued (near-standstill) vehicles per (edge, lane) -> shape (edges, max_lanes)"""
+        n = self.count
+        queued = self.speed[:n] < threshold
+        cells = self.edge[:n].astype(np.int64) * self.max_lanes + self.lane[:n]
+        counts = np.bincount(cells[queued], minlength=len(self.edge_arrivals) * self.max_lanes)
+        return counts.reshape(-1, self.max_lanes)
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+    def vehicle_id(self, slot: int) -> str:
+        """Public id of the vehicle in ``slot``"""
+        prefix = 'emergency' if self.subtype[slot] else 'veh'
+        return f'{prefix}_{int(self.serial[slot]):04d}'
+
+    def copy_columns(self) -> Dict[str, np.ndarray]:
+        """Read-only copies of the serialized columns of the live fleet (snapshots)"""
+        n = self.count
+        columns = {}
+        for name in self.SERIALIZED:
+            column = getattr(self, name)[:n].copy()
+            column.flags.writeable = False
+            columns[name] = column
+        return columns
+
+    def to_dicts(self, slots=None) -> List[Dict]:
+        """Build the JSON-ready vehicle dicts (only called when serializing)"""
+        if slots is None:
+            slots = slice(0, self.count)
+        return self.columns_to_dicts({name: getattr(self, name)[slots] for name in self.SERIALIZED})
+
+    @property
+    def lane_ids(self) -> List[str]:
+        """Lane id strings, built once and indexed by ``edge * max_lanes + lane``"""
+        if self._lane_ids is None:
+            self._lane_ids = [f'{edge_id}_lane_{lane}' for edge_id in self.edge_ids
+                              for lane in range(self.max_lanes)]
+        return self._lane_ids
+
+    def columns_to_dicts(self, columns: Dict[str, np.ndarray]) -> List[Dict]:
+        """
+        Vehicle dicts of column arrays (live slices, copies or ``ROW_DTYPE``
+        records). This is the API boundary: strings are shared (interned type,
+        color, edge and lane ids, one route tuple per route), so a dict only
+        owns its numbers.
+        """
+        edge_ids = self.edge_ids
+        lane_ids = self.lane_ids
+        max_lanes = self.max_lanes
+        route_ids = self.routes.edge_id_tuple
+        rows = zip(*(columns[name].tolist() for name in self.SERIALIZED))
+
+        vehicles = []
+        with _gc_paused():
+            for (serial, vtype, color, subtype, lat, lng, speed, heading, edge, lane,
+                 progress, direction, distance, created, route_id) in rows:
+                edge_id = edge_ids[edge]
+                vehicle = {
+                    'id': f'{"emergency" if subtype else "veh"}_{serial:04d}',
+                    'type': VEHICLE_TYPES[vtype],
+                    'position': {'lat': lat, 'lng': lng},
+                    'speed': speed,
+                    'lane': lane_ids[edge * max_lanes + lane],
+                    'route': route_ids(route_id),
+                    'color': COLOR_PALETTE[color],
+                    'heading': heading,
+                    'edge': edge_id,
+                    'progress': progress,
+                    'direction': direction,
+                    'distanceTraveled': distance,
+                    'createdAt': created
+                }
+                if subtype:
+                    vehicle['subtype'] = EMERGENCY_SUBTYPES[subtype]
+                    vehicle['sirenActive'] = True
+                    vehicle['priority'] = 'highest'
+                vehicles.append(vehicle)
+        return vehicles
+
+    def to_dict(self, slot: int) -> Dict:
+        """Serialize a single vehicle"""
+        return self.to_dicts(slice(slot, slot + 1))[0]
+
+
+class VehicleView:
+    """
+    One vehicle of a column set (engine slices or snapshot copies), read
+    field by field on access. A view holds three references, so code that
+    looks at a few vehicles never builds their dicts; ``to_dict`` produces
+    the JSON shape at the API boundary.
+    """
+
+    __slots__ = ('engine', 'columns', 'row')
+
+    def __init__(self, engine: VehicleEngine, columns: Dict[str, np.ndarray], row: int):
+        self.engine = engine
+        self.columns = columns
+        self.row = row
+
+    def __repr__(self) -> str:
+        return f'VehicleView({self.id}, {self.type})'
+
+    def _get(self, name: str):
+        return self.columns[name][self.row].item()
+
+    @property
+    def serial(self) -> int:
+        return self._get('serial')
+
+    @property
+    def id(self) -> str:
+        prefix = 'emergency' if self._get('subtype') else 'veh'
+        return f'{prefix}_{self.serial:04d}'
+
+    @property
+    def type(self) -> str:
+        return VEHICLE_TYPES[self._get('vtype')]
+
+    @property
+    def color(self) -> str:
+        return COLOR_PALETTE[self._get('color')]
+
+    @property
+    def position(self) -> Tuple[float, float]:
+        return self._get('lat'), self._get('lng')
+
+    @property
+    def speed(self) -> float:
+        return self._get('speed')
+
+    @property
+    def edge(self) -> str:
+        return self.engine.edge_ids[self._get('edge')]
+
+    @property
+    def route(self) -> Tuple[str, ...]:
+        return self.engine.routes.edge_id_tuple(self._get('route_id'))
+
+    def to_dict(self) -> Dict:
+        """JSON-ready dict (same shape as ``VehicleEngine.to_dicts``)"""
+        row = self.row
+        return self.engine.columns_to_dicts(
+            {name: self.columns[name][row:row + 1] for name in VehicleEngine.SERIALIZED})[0]
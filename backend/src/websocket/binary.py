@@ -0,0 +1,105 @@
+"""
+Packed little-endian binary frames of vehicle positions and signal states
+"""
+import struct
+from typing import Dict, List
+
+import numpy as np
+
+from simulation.signal_plan import encode_state
+from simulation.vehicle_engine import COLOR_PALETTE, EMERGENCY_SUBTYPES, VEHICLE_TYPES
+
+FORMAT_VERSION = 1
+MAGIC = b'UFVB'
+# magic, version, reserved, seq, vehicle count, simulation time, light count, padding
+HEADER = struct.Struct('<4sHHIIdII')
+
+# Sections in wire order: (name, count, dtype, source column, scale). Arrays
+# are laid out largest item first, so every array starts at a multiple of its
+# item size and a client can view the buffer as typed arrays without copying.
+# Wire value = round(value * scale); divide by scale to decode.
+SECTIONS = (
+    ('green', 'lights', '<u8', None, 1),       # bit k = signal link k
+    ('yellow', 'lights', '<u8', None, 1),
+    ('serial', 'vehicles', '<u4', 'serial', 1),
+    ('lat', 'vehicles', '<i4', 'lat', 1e7),    # ~1 cm
+    ('lng', 'vehicles', '<i4', 'lng', 1e7),
+    ('edge', 'vehicles', '<i4', 'edge', 1),
+    ('speed', 'vehicles', '<u2', 'speed', 100),      # 0.01 km/h, up to 655 km/h
+    ('heading', 'vehicles', '<u2', 'heading', 100),  # 0.01 degree
+    ('phase', 'lights', '<u2', None, 1),
+    ('type', 'vehicles', '<u1', 'vtype', 1),
+    ('subtype', 'vehicles', '<u1', 'subtype', 1),    # 0 = not an emergency vehicle
+    ('color', 'vehicles', '<u1', 'color', 1),
+    ('lane', 'vehicles', '<u1', 'lane', 1),
+)
+BYTES_PER_VEHICLE = sum(np.dtype(dtype).itemsize for _, count, dtype, _, _ in SECTIONS if count == 'vehicles')
+BYTES_PER_LIGHT = sum(np.dtype(dtype).itemsize for _, count, dtype, _, _ in SECTIONS if count == 'lights')
+
+
+def frame_schema(snapshot) -> Dict:
+    """
+    Layout description sent once to a binary client when it connects: the
+    sections in order with their dtype and scale, and the lookup tables
+    the integer codes index into (vehicle types, edge ids, light ids).
+    """
+    return {
+        'version': FORMAT_VERSION,
+        'magic': MAGIC.decode(),
+        'header': {'format': HEADER.format, 'size': HEADER.size,
+                   'fields': ['magic', 'version', 'reserved', 'seq', 'vehicles',
+                              'simulation_time', 'lights', 'padding']},
+        'sections': [{'name': name, 'count': count, 'dtype': dtype, 'scale': scale}
+                     for name, count, dtype, _, scale in SECTIONS],
+        'types': list(VEHICLE_TYPES),
+        'subtypes': list(EMERGENCY_SUBTYPES),
+        'colors': list(COLOR_PALETTE),
+        'edges': list(snapshot.engine.edge_ids),
+        'lights': [{'id': tl['id'], 'links': int(links)}
+                   for tl, links in zip(snapshot.traffic_lights, snapshot.plan.link_count.tolist())]
+    }
+
+
+def pack_frame(snapshot, seq: int = 0) -> bytes:
+    """One frame of ``snapshot`` (every vehicle and light) as a packed buffer"""
+    columns = snapshot.columns
+    flat = snapshot.light_phase
+    lights = {
+        'green': snapshot.plan.green[flat],
+        'yellow': snapshot.plan.yellow[flat],
+        'phase': flat - snapshot.plan.phase_ptr[:-1]
+    }
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, 0, seq & 0xFFFFFFFF, snapshot.vehicle_count,
+                         snapshot.simulation_time, len(flat), 0)]
+    for name, count, dtype, column, scale in SECTIONS:
+        values = lights[name] if column is None else columns[column]
+        if scale != 1:
+            values = np.rint(values * scale)
+        parts.append(values.astype(dtype).tobytes())
+    return b''.join(parts)
+
+
+def unpack_frame(buffer: bytes) -> Dict:
+    """Decode a packed frame into arrays (scaled back to floats where quantized)"""
+    magic, version, _, seq, vehicles, simulation_time, lights, _ = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f'Not a version {FORMAT_VERSION} vehicle frame')
+    frame = {'seq': seq, 'simulation_time': simulation_time}
+    offset = HEADER.size
+    counts = {'vehicles': vehicles, 'lights': lights}
+    for name, count, dtype, _, scale in SECTIONS:
+        values = np.frombuffer(buffer, dtype=dtype, count=counts[count], offset=offset)
+        offset += values.nbytes
+        frame[name] = values / scale if scale != 1 else values
+    return frame
+
+
+def frame_bytes(vehicles: int, lights: int) -> int:
+    """Size of a frame with this many vehicles and lights"""
+    return HEADER.size + vehicles * BYTES_PER_VEHICLE + lights * BYTES_PER_LIGHT
+
+
+def light_states(frame: Dict, links: List[int]) -> List[str]:
+    """Signal state strings of an unpacked frame (the JSON ``state`` field)"""
+    return [encode_state(int(green), int(yellow), count)
+            for green, yellow, count in zip(frame['green'].tolist(), frame['yellow'].tolist(), links)]
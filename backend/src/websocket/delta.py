@@ -0,0 +1,169 @@
+"""
+Delta-encoded vehicle frames: periodic keyframes plus per-frame diffs
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Tracked vehicle fields: (group, engine columns, decimals kept on the wire).
+# Values are compared once rounded, so a field is re-sent when its wire value
+# changes and sub-quantum jitter never goes out.
+DELTA_FIELDS = (
+    ('position', ('lat', 'lng'), 5),      # ~1 m
+    ('speed', ('speed',), 0),             # 1 km/h
+    ('heading', ('heading',), 0),         # 1 degree
+    ('progress', ('progress',), 2),
+    ('distanceTraveled', ('distance',), 2),
+    ('lane', ('edge', 'lane'), None),     # exact (integers)
+    ('route', ('route_id',), None),
+)
+
+
+class DeltaEncoder:
+    """
+    Turns successive snapshots into ``vehicle_delta`` frames.
+
+    Every frame has a sequence number ``seq``. Keyframes (every
+    ``keyframe_interval`` frames, and the first one) carry the full vehicle
+    dicts; the frames in between carry only
+
+    - ``added``: full dicts of vehicles that appeared,
+    - ``removed``: ids of vehicles that left,
+    - ``changed``: per field group, the ids whose value moved past the
+      group's precision and their new values, column-wise
+      (``{'position': {'ids': [...], 'lat': [...], 'lng': [...]}, ...}``).
+
+    A client applies frames in order and ignores those with a ``seq`` not
+    above the one it holds; when ``seq`` is not its last one plus one it has
+    missed a frame and asks for a ``keyframe`` (resync).
+
+    The encoder keeps what it last sent per vehicle (rows sorted by serial),
+    so one encoder serves every delta client of a stream.
+    """
+
+    def __init__(self, keyframe_interval: int = 50):
+        self.keyframe_interval = keyframe_interval
+        self.reset()
+
+    def reset(self):
+        """Start over: the next frame is a keyframe"""
+        self.seq = 0
+        self.last_keyframe = -1
+        self._published = (0, None)  # (seq, snapshot) of the last frame, swapped in one assignment
+        self._serial = np.zeros(0, dtype=np.int64)  # vehicles sent last frame, sorted by serial
+        self._ids: List[str] = []
+        self._sent: Dict[str, np.ndarray] = {}
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _quantize(columns: Dict[str, np.ndarray], rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """Integer wire value of every tracked field, one (rows, fields) array per group"""
+        quantized = {}
+        for group, names, decimals in DELTA_FIELDS:
+            values = np.stack([columns[name][rows] for name in names], axis=1)
+            if decimals is not None:
+                values = np.rint(values * 10.0 ** decimals)
+            quantized[group] = values.astype(np.int64)
+        return quantized
+
+    def encode(self, snapshot) -> Dict:
+        """Next frame for ``snapshot`` (a keyframe when one is due)"""
+        self.seq += 1
+        columns = snapshot.columns
+        order = snapshot.serial_order
+        serial = columns['serial'][order]
+        ids = _vehicle_ids(columns, order)
+        current = self._quantize(columns, order)
+        previous_serial, previous_ids, previous = self._serial, self._ids, self._sent
+        self._serial, self._ids, self._sent = serial, ids, current
+
+        if self.last_keyframe < 0 or self.seq - self.last_keyframe >= self.keyframe_interval:
+            self.last_keyframe = self.seq
+            self._published = (self.seq, snapshot)
+            return self._keyframe_of(self.seq, snapshot)
+
+        # Match the current fleet against the last frame, by serial
+        if len(previous_serial):
+            pos = np.minimum(np.searchsorted(previous_serial, serial), len(previous_serial) - 1)
+            known = previous_serial[pos] == serial
+        else:
+            pos = np.zeros(len(serial), dtype=np.int64)
+            known = np.zeros(len(serial), dtype=bool)
+        gone = np.ones(len(previous_serial), dtype=bool)
+        gone[pos[known]] = False
+
+        engine = snapshot.engine
+        changed = {}
+        for group, _, decimals in DELTA_FIELDS:
+            value = current[group]
+            moved = known.copy()
+            moved[known] = np.any(value[known] != previous[group][pos[known]], axis=1)
+            rows = np.flatnonzero(moved)
+            if len(rows):
+                changed[group] = _group_payload(engine, group, decimals, value[rows],
+                                                [ids[r] for r in rows.tolist()])
+
+        added_rows = order[~known]
+        added = engine.columns_to_dicts({name: columns[name][added_rows] for name in engine.SERIALIZED}) \
+            if len(added_rows) else []
+        removed = [previous_ids[i] for i in np.flatnonzero(gone).tolist()]
+
+        self._published = (self.seq, snapshot)
+        return {
+            'seq': self.seq,
+            'keyframe': False,
+            'simulation_time': snapshot.simulation_time,
+            'count': len(ids),
+            'added': added,
+            'removed': removed,
+            'changed': changed
+        }
+
+    # ------------------------------------------------------------------
+    # Keyframes
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _keyframe_of(seq: int, snapshot) -> Dict:
+        return {
+            'seq': seq,
+            'keyframe': True,
+            'simulation_time': snapshot.simulation_time,
+            'count': snapshot.vehicle_count,
+            'vehicles': snapshot.vehicles
+        }
+
+    def keyframe(self) -> Optional[Dict]:
+        """
+        Resync frame for one client: the full state as of the last frame
+        sent, with its ``seq``, so the next broadcast delta applies on top.
+        None before the first frame (that one is a keyframe anyway).
+        """
+        seq, snapshot = self._published
+        if snapshot is None:
+            return None
+        return self._keyframe_of(seq, snapshot)
+
+
+def _vehicle_ids(columns: Dict[str, np.ndarray], rows: np.ndarray) -> List[str]:
+    """Public ids of the given rows ('veh_0042' / 'emergency_0042')"""
+    return [f'{"emergency" if subtype else "veh"}_{serial:04d}'
+            for serial, subtype in zip(columns['serial'][rows].tolist(), columns['subtype'][rows].tolist())]
+
+
+def _group_payload(engine, group: str, decimals: Optional[int], values: np.ndarray, ids: List[str]) -> Dict:
+    """Column-wise wire values of one field group for the vehicles in ``ids``"""
+    if group == 'lane':
+        edges = values[:, 0]
+        cells = (edges * engine.max_lanes + values[:, 1]).tolist()
+        edge_ids, lane_ids = engine.edge_ids, engine.lane_ids
+        return {'ids': ids, 'edge': [edge_ids[e] for e in edges.tolist()], 'lane': [lane_ids[c] for c in cells]}
+    if group == 'route':
+        route_ids = engine.routes.edge_id_tuple
+        return {'ids': ids, 'route': [route_ids(r) for r in values[:, 0].tolist()]}
+    scale = 10.0 ** decimals
+    if group == 'position':
+        return {'ids': ids, 'lat': (values[:, 0] / scale).tolist(), 'lng': (values[:, 1] / scale).tolist()}
+    column = values[:, 0] / scale if decimals else values[:, 0]
+    return {'ids': ids, group: column.tolist()}
@@ -15,6 +15,7 @@ class WebSocketEvents:
         'SUBSCRIBE': 'subscribe',
         'UNSUBSCRIBE': 'unsubscribe',
         'GET_STATUS': 'get_status',
+        'RESYNC': 'resync',
         'PING': 'ping'
     }
     
@@ -22,6 +23,11 @@ class WebSocketEvents:
     SERVER_EVENTS = {
         'SIMULATION_UPDATE': 'simulation_update',
         'VEHICLE_UPDATE': 'vehicle_update',
+        'VEHICLE_DELTA': 'vehicle_delta',
+        'VEHICLE_FRAME': 'vehicle_frame',
+        'BINARY_FORMAT': 'binary_format',
+        'VIEWPORT_UPDATE': 'viewport_update',
+        'FRAME': 'frame',
         'TRAFFIC_LIGHT_UPDATE': 'traffic_light_update',
         'METRICS_UPDATE': 'metrics_update',
         'SIMULATION_STATUS': 'simulation_status',
@@ -0,0 +1,139 @@
+"""
+Per-tick frame builder: every payload serialized once and shared by all recipients
+"""
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class Encoded:
+    """A JSON value serialized ahead of time; FrameJSON splices it into packets as is"""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+
+class FrameJSON:
+    """
+    JSON module of the Socket.IO server (``SocketIO(json=FrameJSON)``).
+
+    An emitted packet is the list ``[event, payload]``; when the payload is
+    ``Encoded`` its text is copied into the packet instead of dumping the
+    objects again, so one serialization serves every emit of the tick.
+    Anything else goes through the standard json module.
+    """
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        if isinstance(obj, list) and any(isinstance(item, Encoded) for item in obj):
+            return '[' + ','.join(item.text if isinstance(item, Encoded) else json.dumps(item, *args, **kwargs)
+                                  for item in obj) + ']'
+        return json.dumps(obj, *args, **kwargs)
+
+    @staticmethod
+    def loads(*args, **kwargs):
+        return json.loads(*args, **kwargs)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+class FrameBuilder:
+    """
+    Payloads of one stream frame, built from one snapshot.
+
+    Components (vehicles, traffic lights, metrics, the scalar fields) are
+    serialized to JSON at most once, on first use, and the event payloads
+    are assembled by splicing those texts: ``simulation_update`` and
+    ``vehicle_update`` share the vehicle list text, ``simulation_update``
+    and ``traffic_light_update`` the light list text. Every payload is
+    cached as an ``Encoded`` value, so emitting it to any number of clients
+    or rooms costs no further serialization. The frame has one timestamp.
+
+    ``envelope`` coalesces the events a client is due into one ``frame``
+    event: ``{"seq", "timestamp", "events": {name: payload, ...}}``.
+    """
+
+    EVENTS = ('simulation_update', 'vehicle_update', 'traffic_light_update', 'metrics_update',
+              'simulation_status')
+
+    def __init__(self, snapshot, seq: int = 0, status: Optional[Dict] = None):
+        self.snapshot = snapshot
+        self.seq = seq
+        self.timestamp = datetime.utcnow().isoformat()
+        self.status = status
+        self._parts: Dict[str, str] = {}
+        self._payloads: Dict[Tuple[str, bool], Encoded] = {}
+        self._envelopes: Dict[Tuple, Encoded] = {}
+
+    def part(self, name: str) -> str:
+        """JSON text of one component ('vehicles', 'traffic_lights', 'metrics', 'fields', 'timestamp')"""
+        text = self._parts.get(name)
+        if text is None:
+            snapshot = self.snapshot
+            if name == 'vehicles':
+                text = _dumps(snapshot.vehicles)
+            elif name == 'traffic_lights':
+                text = _dumps(snapshot.lights)
+            elif name == 'metrics':
+                text = _dumps(snapshot.metrics)
+            elif name == 'timestamp':
+                text = _dumps(self.timestamp)
+            elif name == 'fields':
+                # simulation_update's scalar fields, without the braces
+                text = _dumps({
+                    'timestamp': snapshot.timestamp,
+                    'simulation_time': snapshot.simulation_time,
+                    'scenario': snapshot.scenario,
+                    'is_running': snapshot.is_running,
+                    'is_paused': snapshot.is_paused,
+                    'stats': snapshot.stats
+                })[1:-1]
+            else:
+                raise KeyError(f'Unknown frame component: {name}')
+            self._parts[name] = text
+        return text
+
+    def payload(self, event: str, lean: bool = False) -> Encoded:
+        """
+        Payload of ``event`` for this frame. ``lean`` drops the vehicle list
+        from simulation_update (clients that get vehicles another way).
+        """
+        key = (event, lean and event == 'simulation_update')
+        encoded = self._payloads.get(key)
+        if encoded is None:
+            part = self.part
+            if event == 'simulation_update':
+                vehicles = '' if key[1] else f'"vehicles":{part("vehicles")},'
+                text = (f'{{{vehicles}"traffic_lights":{part("traffic_lights")},'
+                        f'"metrics":{part("metrics")},{part("fields")}}}')
+            elif event == 'vehicle_update':
+                text = (f'{{"vehicles":{part("vehicles")},"count":{self.snapshot.vehicle_count},'
+                        f'"timestamp":{part("timestamp")}}}')
+            elif event == 'traffic_light_update':
+                text = f'{{"traffic_lights":{part("traffic_lights")},"timestamp":{part("timestamp")}}}'
+            elif event == 'metrics_update':
+                text = f'{{"metrics":{part("metrics")},"timestamp":{part("timestamp")}}}'
+            elif event == 'simulation_status':
+                text = _dumps(dict(self.status or {}, timestamp=self.timestamp))
+            else:
+                raise KeyError(f'Unknown frame event: {event}')
+            encoded = self._payloads[key] = Encoded(text)
+        return encoded
+
+    def envelope(self, events: Iterable[str], lean: bool = False) -> Encoded:
+        """One ``frame`` payload carrying ``events`` (built once per distinct event set)"""
+        events = tuple(events)
+        key = (events, lean)
+        encoded = self._envelopes.get(key)
+        if encoded is None:
+            body = ','.join(f'"{event}":{self.payload(event, lean).text}' for event in events)
+            encoded = self._envelopes[key] = Encoded(
+                f'{{"seq":{self.seq},"timestamp":{self.part("timestamp")},"events":{{{body}}}}}')
+        return encoded
@@ -5,6 +5,18 @@ import time
 from flask import request
 from flask_socketio import emit, join_room, leave_room
 
+from websocket.binary import pack_frame
+from websocket.viewport import Viewport
+
+# Vehicle wire formats a client can ask for at connect time
+WIRE_FORMATS = ('json', 'binary')
+
+def _connect_option(auth, key: str, default=None):
+    """Connection option from the auth payload, else from the query string (per key)"""
+    if isinstance(auth, dict) and auth.get(key) is not None:
+        return auth[key]
+    return request.args.get(key, default)
+
 class WebSocketManager:
     """Manages WebSocket connections and events"""
     
@@ -12,6 +24,8 @@ class WebSocketManager:
         self.socketio = socketio
         self.simulator = simulator
         self.simulation_stream = simulation_stream
+        # Mutations wait for the stream loop's next tick boundary
+        self.commands = simulation_stream.commands
         self.connected_clients = set()
         self.client_info = {}  # Store additional client info
         
@@ -21,8 +35,8 @@ class WebSocketManager:
     def _register_handlers(self):
         """Register all WebSocket event handlers"""
         @self.socketio.on('connect')
-        def handle_connect():
-            self.on_connect()
+        def handle_connect(auth=None):
+            self.on_connect(auth)
         
         @self.socketio.on('disconnect')
         def handle_disconnect():
@@ -47,17 +61,28 @@ class WebSocketManager:
         @self.socketio.on('unsubscribe')
         def handle_unsubscribe(data):
             self.on_unsubscribe(data)
+        
+        @self.socketio.on('resync')
+        def handle_resync(data=None):
+            self.on_resync(data)
     
-    def on_connect(self):
+    def on_connect(self, auth=None):
         """Handle new client connection"""
         client_id = request.sid
         self.connected_clients.add(client_id)
         
+        # Wire format negotiated at connect: io(url, {auth: {format: 'binary'}}) or ?format=binary
+        wire_format = _connect_option(auth, 'format', 'json')
+        # ...and whether its events come coalesced in one 'frame' event per stream frame
+        envelope = _connect_option(auth, 'envelope') in (True, '1', 'true')
+        
         # Store client info
         self.client_info[client_id] = {
             'connected_at': time.time(),
             'last_activity': time.time(),
             'subscriptions': set(),
+            'format': wire_format if wire_format in WIRE_FORMATS else 'json',
+            'envelope': envelope,
             'ip': request.remote_addr
         }
         
@@ -67,9 +92,23 @@ class WebSocketManager:
         emit('connect', {
             'message': 'Connected to Urban Flow WebSocket API',
             'client_id': client_id,
+            'format': self.client_info[client_id]['format'],
+            'envelope': self.client_info[client_id]['envelope'],
             'timestamp': time.time()
         })
         
+        if wire_format not in WIRE_FORMATS:
+            emit('error', {'message': f'Unknown format: {wire_format} (using json)'})
+        
+        if self.client_info[client_id]['envelope']:
+            self.simulation_stream.enable_envelope(client_id)
+        
+        # Binary clients get the frame layout once, then packed vehicle_frame buffers
+        binary = self.client_info[client_id]['format'] == 'binary'
+        if binary:
+            join_room(self.simulation_stream.BINARY_ROOM)
+            emit('binary_format', self.simulation_stream.enable_binary(client_id))
+        
         # Send current simulation status
         emit('simulation_status', {
             'status': 'running' if self.simulator.is_running else 'stopped',
@@ -80,8 +119,12 @@ class WebSocketManager:
         
         # If simulation is running, send current data
         if self.simulator.is_running and not self.simulator.is_paused:
-            data = self.simulator.get_simulation_data()
-            emit('simulation_update', data)
+            if binary:
+                snapshot = self.simulator.snapshot
+                emit('vehicle_frame', pack_frame(snapshot, snapshot.tick))
+            else:
+                data = self.simulator.get_simulation_data()
+                emit('simulation_update', data)
     
     def on_disconnect(self):
         """Handle client disconnection"""
@@ -93,6 +136,11 @@ class WebSocketManager:
         if client_id in self.client_info:
             del self.client_info[client_id]
         
+        self.simulation_stream.disable_delta(client_id)
+        self.simulation_stream.disable_binary(client_id)
+        self.simulation_stream.clear_viewport(client_id)
+        self.simulation_stream.disable_envelope(client_id)
+        
         print(f"❌ Client disconnected: {client_id}")
     
     def on_command(self, data):
@@ -114,7 +162,7 @@ class WebSocketManager:
         try:
             if command == 'start':
                 scenario_id = data.get('scenario_id', 'default')
-                success = self.simulator.start_simulation(scenario_id)
+                success = self.commands.call('start_simulation', scenario_id)
                 
                 if success:
                     # Start streaming if not already
@@ -137,7 +185,7 @@ class WebSocketManager:
                     emit('error', {'message': 'Failed to start simulation'})
             
             elif command == 'pause':
-                success = self.simulator.pause_simulation()
+                success = self.commands.call('pause_simulation')
                 
                 if success:
                     emit('simulation_status', {
@@ -148,7 +196,7 @@ class WebSocketManager:
                     emit('error', {'message': 'Failed to pause simulation'})
             
             elif command == 'resume':
-                success = self.simulator.resume_simulation()
+                success = self.commands.call('resume_simulation')
                 
                 if success:
                     emit('simulation_status', {
@@ -159,7 +207,7 @@ class WebSocketManager:
                     emit('error', {'message': 'Failed to resume simulation'})
             
             elif command == 'stop':
-                success = self.simulator.stop_simulation()
+                success = self.commands.call('stop_simulation')
                 
                 if success:
                     emit('simulation_status', {
@@ -170,9 +218,8 @@ class WebSocketManager:
                     emit('error', {'message': 'Failed to stop simulation'})
             
             elif command == 'reset':
-                # Stop and reset
-                self.simulator.stop_simulation()
-                self.simulator.simulation_time = 0
+                # Stop and reset (stopping rewinds the simulated clock)
+                self.commands.call('stop_simulation')
                 
                 emit('simulation_status', {
                     'status': 'stopped',
@@ -181,11 +228,13 @@ class WebSocketManager:
                 })
             
             elif command == 'speed':
-                speed = data.get('speed', 1.0)
-                # Note: In mock simulator, speed control would be implemented
-                emit('notification', {
+                speed = self.simulation_stream.set_speed(float(data.get('speed', 1.0)))
+                
+                # Broadcast so every client shows the same speed
+                self.socketio.emit('notification', {
                     'type': 'info',
                     'message': f'Simulation speed set to {speed}x',
+                    'simulation_speed': speed,
                     'timestamp': time.time()
                 })
             
@@ -196,7 +245,8 @@ class WebSocketManager:
                     'is_paused': self.simulator.is_paused,
                     'current_scenario': self.simulator.current_scenario,
                     'simulation_time': self.simulator.simulation_time,
-                    'vehicle_count': len(self.simulator.vehicles),
+                    'vehicle_count': self.simulator.vehicle_count,
+                    'simulation_speed': self.simulation_stream.clock.warp,
                     'timestamp': time.time()
                 })
             
@@ -218,7 +268,7 @@ class WebSocketManager:
         
         try:
             # Add emergency vehicle to simulation
-            vehicle = self.simulator.add_emergency_vehicle()
+            vehicle = self.commands.call('add_emergency_vehicle')
             
             if vehicle:
                 # Send notification
@@ -261,11 +311,8 @@ class WebSocketManager:
         try:
             # Check if simulation is running
             if self.simulator.is_running:
-                # Stop current simulation
-                self.simulator.stop_simulation()
-                
-                # Start new simulation with requested scenario
-                success = self.simulator.start_simulation(scenario_id)
+                # Stop the current simulation and start the requested scenario in one command
+                success = self.commands.call('change_scenario', scenario_id)
                 
                 if success:
                     emit('simulation_status', {
@@ -309,6 +356,17 @@ class WebSocketManager:
             emit('error', {'message': 'No event_type specified'})
             return
         
+        # Viewport: {'event_type': 'viewport', 'bbox': {...}, 'zoom': 15}; subscribe again to pan/zoom
+        if event_type == 'viewport':
+            try:
+                viewport = Viewport.parse(data)
+            except ValueError as e:
+                emit('error', {'message': str(e)})
+                return
+            if client_id in self.client_info:
+                self.client_info[client_id]['viewport'] = viewport._asdict()
+            self.simulation_stream.set_viewport(client_id, viewport)
+        
         # Add subscription
         if client_id in self.client_info:
             self.client_info[client_id]['subscriptions'].add(event_type)
@@ -318,6 +376,13 @@ class WebSocketManager:
             'subscribed': True,
             'message': f'Subscribed to {event_type} events'
         })
+        
+        # Delta frames replace the full vehicle lists, starting from a keyframe
+        if event_type == 'vehicle_delta':
+            join_room(self.simulation_stream.DELTA_ROOM)
+            keyframe = self.simulation_stream.enable_delta(client_id)
+            if keyframe:
+                emit('vehicle_delta', keyframe)
     
     def on_unsubscribe(self, data):
         """Handle unsubscription from events"""
@@ -337,12 +402,31 @@ class WebSocketManager:
         if client_id in self.client_info and event_type in self.client_info[client_id]['subscriptions']:
             self.client_info[client_id]['subscriptions'].remove(event_type)
         
+        if event_type == 'vehicle_delta':
+            self.simulation_stream.disable_delta(client_id)
+            leave_room(self.simulation_stream.DELTA_ROOM)
+        elif event_type == 'viewport':
+            self.simulation_stream.clear_viewport(client_id)
+            self.client_info.get(client_id, {}).pop('viewport', None)
+        
         emit('subscription_update', {
             'event_type': event_type,
             'subscribed': False,
             'message': f'Unsubscribed from {event_type} events'
         })
     
+    def on_resync(self, data=None):
+        """Send a keyframe to a delta client that missed a frame"""
+        client_id = request.sid
+        
+        if client_id not in self.simulation_stream.delta_clients:
+            emit('error', {'message': 'Not subscribed to vehicle_delta'})
+            return
+        
+        keyframe = self.simulation_stream.delta.keyframe()
+        if keyframe:
+            emit('vehicle_delta', keyframe)
+    
     def get_connected_clients_count(self) -> int:
         """Get number of connected clients"""
         return len(self.connected_clients)
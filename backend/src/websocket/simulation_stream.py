@@ -7,22 +7,53 @@ import json
 from datetime import datetime
 from typing import Dict, Any
 
+from simulation.clock import SimulationClock
+from simulation.commands import CommandQueue
+from websocket.binary import frame_schema, pack_frame
+from websocket.delta import DeltaEncoder
+from websocket.frames import FrameBuilder
+from websocket.viewport import Viewport, ViewportCuller
+
 class SimulationStream:
     """
     Manages real-time streaming of simulation data via WebSocket
+    
+    Clients subscribed to ``vehicle_delta`` (room DELTA_ROOM) get a delta
+    frame every stream frame instead of the full vehicle lists; clients that
+    connected with the binary format (room BINARY_ROOM) get a packed
+    ``vehicle_frame`` of every vehicle and light instead. Clients that
+    subscribed with a map viewport get only what their map shows, at the
+    level of detail of their zoom (``viewport_update``).
+    
+    Every frame's payloads come from one FrameBuilder, so each is serialized
+    once whoever receives it; clients that connected with ``envelope`` get
+    the events they are due coalesced into one ``frame`` event.
     """
     
-    def __init__(self, socketio, simulator):
+    DELTA_ROOM = 'vehicle_delta'
+    BINARY_ROOM = 'vehicle_frame'
+    
+    def __init__(self, socketio, simulator, commands: CommandQueue = None):
         self.socketio = socketio
         self.simulator = simulator
+        # Mutations from handlers, applied by this loop between ticks
+        self.commands = commands or CommandQueue(simulator)
         self.stream_thread = None
         self.streaming = False
-        self.update_interval = 0.1  # 100ms
+        self.update_interval = 0.1  # 100ms between frames (wall time)
+        # Simulated time advances in fixed steps at warp x wall time
+        self.clock = SimulationClock(step=getattr(simulator, 'update_interval', 0.1))
         self.last_metrics_update = 0
         self.metrics_interval = 2.0  # Update metrics every 2 seconds
         self.last_vehicle_update = 0
         self.vehicle_interval = 0.5  # Update vehicles every 500ms
         self.clients = {}  # Track connected clients
+        self.delta = DeltaEncoder()
+        self.delta_clients = set()  # sids receiving vehicle_delta frames
+        self.binary_clients = set()  # sids receiving packed vehicle_frame buffers
+        self.viewports = ViewportCuller()  # sid -> map viewport, culled every frame
+        self.envelope_clients = set()  # sids receiving one coalesced 'frame' event per frame
+        self.frame_seq = 0
         
         print("📡 Simulation stream initialized")
     
@@ -33,6 +64,7 @@ class SimulationStream:
             return
         
         self.streaming = True
+        self.commands.attach()
         self.stream_thread = threading.Thread(target=self._stream_loop, daemon=True)
         self.stream_thread.start()
         
@@ -44,6 +76,7 @@ class SimulationStream:
         
         if self.stream_thread and self.stream_thread.is_alive():
             self.stream_thread.join(timeout=2.0)
+        self.commands.detach()
         
         print("⏹️ Simulation stream stopped")
     
@@ -51,61 +84,79 @@ class SimulationStream:
         """Main streaming loop"""
         print("🔄 Starting simulation stream loop")
         
+        last_tick = time.monotonic()
+        next_frame = last_tick
+        
         while self.streaming:
             try:
                 current_time = time.time()
+                now = time.monotonic()
+                wall_dt, last_tick = now - last_tick, now
+                
+                # Tick boundary: apply queued start/stop/spawn/remove commands
+                self.commands.drain()
                 
                 # Check if simulation is running and not paused
                 if self.simulator.is_running and not self.simulator.is_paused:
-                    # Update simulation
-                    self.simulator.update_simulation(self.update_interval)
+                    # Advance by the fixed sub-steps covering this frame at the current warp
+                    self.clock.tick(self.simulator, wall_dt)
                     
                     # Get simulation data
-                    simulation_data = self.simulator.get_simulation_data()
+                    snapshot = self.simulator.snapshot
+                    due = []
                     
-                    # Send full simulation update (less frequent)
+                    # Full simulation update (less frequent)
                     if int(current_time * 10) % 2 == 0:  # Every 200ms
-                        self.socketio.emit('simulation_update', simulation_data)
+                        due.append('simulation_update')
                     
-                    # Send vehicle updates (more frequent)
+                    # Vehicle updates (more frequent)
                     if current_time - self.last_vehicle_update >= self.vehicle_interval:
-                        vehicle_data = {
-                            'vehicles': simulation_data['vehicles'],
-                            'count': len(simulation_data['vehicles']),
-                            'timestamp': datetime.utcnow().isoformat()
-                        }
-                        self.socketio.emit('vehicle_update', vehicle_data)
+                        due.append('vehicle_update')
                         self.last_vehicle_update = current_time
                     
-                    # Send traffic light updates
-                    traffic_light_data = {
-                        'traffic_lights': simulation_data['traffic_lights'],
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
-                    self.socketio.emit('traffic_light_update', traffic_light_data)
+                    # Traffic light updates
+                    due.append('traffic_light_update')
                     
-                    # Send metrics updates (less frequent)
+                    # Metrics updates (less frequent)
                     if current_time - self.last_metrics_update >= self.metrics_interval:
-                        metrics_data = {
-                            'metrics': simulation_data['metrics'],
-                            'timestamp': datetime.utcnow().isoformat()
-                        }
-                        self.socketio.emit('metrics_update', metrics_data)
+                        due.append('metrics_update')
                         self.last_metrics_update = current_time
                     
-                    # Send simulation status periodically
+                    # Simulation status periodically
+                    status_data = None
                     if int(current_time) % 5 == 0:  # Every 5 seconds
                         status_data = {
                             'status': 'running',
                             'is_paused': False,
                             'current_scenario': self.simulator.current_scenario,
                             'simulation_time': self.simulator.simulation_time,
-                            'vehicle_count': len(self.simulator.vehicles),
-                            'timestamp': datetime.utcnow().isoformat()
+                            'vehicle_count': self.simulator.vehicle_count,
+                            'simulation_speed': self.clock.warp,
+                            'effective_speed': round(self.clock.effective_warp, 2)
                         }
-                        self.socketio.emit('simulation_status', status_data)
+                        due.append('simulation_status')
+                    
+                    # Every payload serialized once for all recipients
+                    self._emit_frame(self._new_frame(snapshot, status_data), due)
+                    
+                    # Send vehicle deltas (every frame)
+                    if self.delta_clients:
+                        self.socketio.emit('vehicle_delta', self.delta.encode(snapshot), to=self.DELTA_ROOM)
+                    else:
+                        self.delta.reset()  # the next subscriber starts from a keyframe
+                    
+                    # Send packed vehicles and signal states (every frame)
+                    if self.binary_clients:
+                        self.socketio.emit('vehicle_frame', pack_frame(snapshot, snapshot.tick), to=self.BINARY_ROOM)
+                    
+                    # Send every viewport group its vehicles, edge or density layer (every frame)
+                    for client_ids, viewport_data in self.viewports.cull(snapshot):
+                        self.socketio.emit('viewport_update', viewport_data, to=client_ids)
                 
                 else:
+                    # No backlog builds up while paused or stopped
+                    self.clock.reset()
+                    
                     # Simulation is stopped or paused
                     if int(current_time) % 10 == 0:  # Every 10 seconds
                         status = 'paused' if self.simulator.is_paused else 'stopped'
@@ -113,13 +164,18 @@ class SimulationStream:
                             'status': status,
                             'is_paused': self.simulator.is_paused,
                             'current_scenario': self.simulator.current_scenario,
-                            'simulation_time': self.simulator.simulation_time,
-                            'timestamp': datetime.utcnow().isoformat()
+                            'simulation_time': self.simulator.simulation_time
                         }
-                        self.socketio.emit('simulation_status', status_data)
+                        self._emit_frame(self._new_frame(self.simulator.snapshot, status_data),
+                                         ['simulation_status'])
                 
-                # Small sleep to prevent CPU overload
-                time.sleep(self.update_interval)
+                # Constant frame rate: sleep until the next frame deadline whatever the warp
+                next_frame += self.update_interval
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame = time.monotonic()  # overran the frame: don't burst to catch up
             
             except Exception as e:
                 print(f"❌ Error in stream loop: {e}")
@@ -130,31 +186,102 @@ class SimulationStream:
                 })
                 # Small delay before retry
                 time.sleep(1.0)
+                self.clock.reset()
+                last_tick = next_frame = time.monotonic()
+    
+    def set_speed(self, speed: float) -> float:
+        """Set the time-warp factor (simulated seconds per wall second); returns the clamped value"""
+        warp = self.clock.set_warp(speed)
+        print(f"⏩ Simulation speed set to {warp}x")
+        return warp
+    
+    def enable_delta(self, client_id: str) -> Dict[str, Any]:
+        """
+        Switch a client (already in DELTA_ROOM) to delta frames; returns the
+        keyframe it starts from, or None when the next broadcast frame is one
+        """
+        self.delta_clients.add(client_id)
+        return self.delta.keyframe()
+    
+    def disable_delta(self, client_id: str):
+        """Back to full vehicle_update lists"""
+        self.delta_clients.discard(client_id)
+    
+    def enable_binary(self, client_id: str) -> Dict[str, Any]:
+        """Switch a client (already in BINARY_ROOM) to packed frames; returns the frame schema"""
+        self.binary_clients.add(client_id)
+        return frame_schema(self.simulator.snapshot)
+    
+    def disable_binary(self, client_id: str):
+        """Back to JSON vehicle and light updates"""
+        self.binary_clients.discard(client_id)
+    
+    def set_viewport(self, client_id: str, viewport: Viewport):
+        """Send this client only the vehicles inside ``viewport`` (replaces its previous one)"""
+        self.viewports.set_viewport(client_id, viewport)
+    
+    def clear_viewport(self, client_id: str):
+        """Back to the whole fleet"""
+        self.viewports.remove(client_id)
+    
+    def enable_envelope(self, client_id: str):
+        """Coalesce this client's events into one 'frame' event per frame"""
+        self.envelope_clients.add(client_id)
+    
+    def disable_envelope(self, client_id: str):
+        self.envelope_clients.discard(client_id)
+    
+    def _new_frame(self, snapshot, status_data: Dict = None) -> FrameBuilder:
+        self.frame_seq += 1
+        return FrameBuilder(snapshot, self.frame_seq, status_data)
+    
+    def _emit_frame(self, frame: FrameBuilder, due):
+        """
+        Emit the ``due`` events of a frame. Delta, binary and viewport
+        clients ("lean") get their vehicles another way, so they skip
+        vehicle_update and get simulation_update without the vehicle list;
+        binary clients also skip the JSON traffic lights. Envelope clients
+        get one 'frame' event per distinct event set, the others the
+        separate events, all sharing the frame's encoded payloads.
+        """
+        lean = self.delta_clients | self.binary_clients | self.viewports.viewports.keys()
+        binary = set(self.binary_clients)
+        envelope = set(self.envelope_clients)
+        
+        # Envelope clients: one coalesced frame per (lean, binary) kind
+        kinds = {}
+        for client_id in envelope:
+            kinds.setdefault((client_id in lean, client_id in binary), []).append(client_id)
+        for (is_lean, is_binary), client_ids in kinds.items():
+            events = [event for event in due
+                      if not (event == 'vehicle_update' and is_lean)
+                      and not (event == 'traffic_light_update' and is_binary)]
+            if events:
+                self.socketio.emit('frame', frame.envelope(events, lean=is_lean), to=client_ids)
+        
+        # Everyone else: the separate events
+        for event in due:
+            if event in ('simulation_update', 'vehicle_update'):
+                self.socketio.emit(event, frame.payload(event), skip_sid=list(lean | envelope) or None)
+                lean_clients = list(lean - envelope)
+                if event == 'simulation_update' and lean_clients:
+                    self.socketio.emit(event, frame.payload(event, lean=True), to=lean_clients)
+            elif event == 'traffic_light_update':
+                self.socketio.emit(event, frame.payload(event), skip_sid=list(binary | envelope) or None)
+            else:
+                self.socketio.emit(event, frame.payload(event), skip_sid=list(envelope) or None)
     
     def send_immediate_update(self):
         """Send immediate update to all clients"""
         if self.simulator.is_running:
-            simulation_data = self.simulator.get_simulation_data()
+            snapshot = self.simulator.snapshot
             
             # Send all updates immediately
-            self.socketio.emit('simulation_update', simulation_data)
-            
-            # Send individual component updates
-            self.socketio.emit('vehicle_update', {
-                'vehicles': simulation_data['vehicles'],
-                'count': len(simulation_data['vehicles']),
-                'timestamp': datetime.utcnow().isoformat()
-            })
-            
-            self.socketio.emit('traffic_light_update', {
-                'traffic_lights': simulation_data['traffic_lights'],
-                'timestamp': datetime.utcnow().isoformat()
-            })
+            self._emit_frame(self._new_frame(snapshot),
+                             ['simulation_update', 'vehicle_update', 'traffic_light_update', 'metrics_update'])
             
-            self.socketio.emit('metrics_update', {
-                'metrics': simulation_data['metrics'],
-                'timestamp': datetime.utcnow().isoformat()
-            })
+            if self.binary_clients:
+                self.socketio.emit('vehicle_frame', pack_frame(snapshot, snapshot.tick), to=self.BINARY_ROOM)
             
             print("📤 Sent immediate update to all clients")
     
@@ -163,10 +290,17 @@ class SimulationStream:
         return {
             'streaming': self.streaming,
             'update_interval': self.update_interval,
+            'clock': self.clock.get_status(),
             'connected_clients': len(self.clients),
+            'delta_clients': len(self.delta_clients),
+            'delta_seq': self.delta.seq,
+            'binary_clients': len(self.binary_clients),
+            'viewport_clients': len(self.viewports),
+            'envelope_clients': len(self.envelope_clients),
+            'frame_seq': self.frame_seq,
             'simulation_running': self.simulator.is_running,
             'simulation_paused': self.simulator.is_paused,
-            'vehicle_count': len(self.simulator.vehicles),
+            'vehicle_count': self.simulator.vehicle_count,
             'last_update': datetime.utcnow().isoformat()
         }
     
@@ -0,0 +1,207 @@
+"""
+Per-client map viewports, server-side culling and zoom-dependent level of detail
+"""
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from simulation.spatial_index import SpatialIndex
+
+# Level of detail by map zoom (Leaflet/OSM zoom levels)
+STREET_ZOOM = 16    # and above: individual vehicles
+EDGE_ZOOM = 14      # and above: per-edge vehicle count and mean speed; below: density grid
+DENSITY_BINS = 32   # density grid resolution per axis (at most DENSITY_BINS**2 cells sent)
+MAX_VIEWPORT_VEHICLES = 2000  # more in view at street zoom: the edge layer is sent instead
+
+
+def level_of(zoom: float) -> str:
+    """Layer a client at ``zoom`` receives: 'vehicles', 'edges' or 'density'"""
+    if zoom >= STREET_ZOOM:
+        return 'vehicles'
+    if zoom >= EDGE_ZOOM:
+        return 'edges'
+    return 'density'
+
+
+def cells_of(index: SpatialIndex, viewport: 'Viewport') -> Tuple[int, int, int, int]:
+    """Cell range of ``index`` covered by a viewport (clipped to the index's own extent)"""
+    return index.cell_range(viewport.south, viewport.west, viewport.north, viewport.east)
+
+
+class Viewport(NamedTuple):
+    south: float
+    west: float
+    north: float
+    east: float
+    zoom: float
+
+    @classmethod
+    def parse(cls, data: Dict) -> 'Viewport':
+        """
+        Viewport of a ``subscribe`` message: ``bbox`` as
+        ``{'south', 'west', 'north', 'east'}`` or a GeoJSON-ordered list
+        ``[west, south, east, north]``, plus the map ``zoom``.
+        Raises ValueError when it is missing or malformed.
+        """
+        bbox = data.get('bbox')
+        try:
+            if isinstance(bbox, dict):
+                south, west, north, east = (float(bbox[key]) for key in ('south', 'west', 'north', 'east'))
+            else:
+                west, south, east, north = (float(value) for value in bbox)
+            zoom = float(data.get('zoom', 0))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Invalid viewport bbox: {bbox!r}') from None
+        if south > north or west > east:
+            raise ValueError(f'Empty viewport bbox: {bbox!r}')
+        return cls(south, west, north, east, zoom)
+
+
+class ViewportCuller:
+    """
+    Cuts every frame down to what each subscribed client's map shows.
+
+    Each frame the fleet is bucketed into a SpatialIndex of ``cell_size``
+    degrees. A viewport becomes the range of cells it covers, and clients
+    with the same level of detail and cell range form one group: the
+    group's payload is built once and emitted once to all its clients.
+    Whole cells are sent, so a client panning a little stays covered.
+
+    The level of detail follows the zoom (``level_of``): individual
+    vehicles at street zoom, serialized once per frame however many groups
+    show them; per-edge count and mean speed further out; a density grid
+    of at most ``DENSITY_BINS`` x ``DENSITY_BINS`` cells at city zoom. The
+    aggregated layers are bounded by the network and the grid, not by the
+    fleet size, and a street view holding more than ``max_vehicles``
+    vehicles gets the edge layer, so no payload grows with the fleet.
+    """
+
+    def __init__(self, cell_size: float = 0.001, max_vehicles: int = MAX_VIEWPORT_VEHICLES):  # ~100 m
+        self.cell_size = cell_size
+        self.max_vehicles = max_vehicles
+        self.viewports: Dict[str, Viewport] = {}
+        self._edge_index = None  # edge midpoints of the network, built once
+        self._edge_ids = None
+
+    def __len__(self) -> int:
+        return len(self.viewports)
+
+    def set_viewport(self, client_id: str, viewport: Viewport):
+        self.viewports[client_id] = viewport
+
+    def remove(self, client_id: str):
+        self.viewports.pop(client_id, None)
+
+    def _edges_of(self, engine) -> SpatialIndex:
+        """Index of the edge midpoints (the network never changes under a simulator)"""
+        if self._edge_ids is not engine.edge_ids:
+            self._edge_index = SpatialIndex(self.cell_size, engine.edge_from_lat + engine.edge_dlat / 2,
+                                            engine.edge_from_lng + engine.edge_dlng / 2)
+            self._edge_ids = engine.edge_ids
+        return self._edge_index
+
+    def groups(self, index: SpatialIndex, edge_index: SpatialIndex) -> Dict[Tuple, List[str]]:
+        """Client ids grouped by level of detail and the cell range their viewport covers"""
+        groups: Dict[Tuple, List[str]] = {}
+        for client_id, viewport in list(self.viewports.items()):
+            level = level_of(viewport.zoom)
+            cells = cells_of(edge_index if level == 'edges' else index, viewport)
+            groups.setdefault((level, cells), []).append(client_id)
+        return groups
+
+    def cull(self, snapshot) -> List[Tuple[List[str], Dict]]:
+        """(client ids, ``viewport_update`` payload) per group of clients"""
+        if not self.viewports:
+            return []
+        columns = snapshot.columns
+        engine = snapshot.engine
+        index = SpatialIndex(self.cell_size, columns['lat'], columns['lng'])
+        edge_index = self._edges_of(engine)
+        groups = self.groups(index, edge_index)
+
+        vehicle_groups = {cells: ids for (level, cells), ids in groups.items() if level == 'vehicles'}
+        frames, crowded = self._vehicle_frames(snapshot, index, vehicle_groups)
+
+        edge_groups = {cells: ids for (level, cells), ids in groups.items() if level == 'edges'}
+        for client_ids in crowded.values():
+            # Regrouped on the edge index's cells: the vehicle index has another extent
+            for client_id in client_ids:
+                viewport = self.viewports.get(client_id)
+                if viewport is not None:
+                    edge_groups.setdefault(cells_of(edge_index, viewport), []).append(client_id)
+        if edge_groups:
+            # Per-edge totals of the whole fleet, once per frame
+            edge_count = len(engine.edge_ids)
+            counts = np.bincount(columns['edge'], minlength=edge_count)
+            speeds = np.bincount(columns['edge'], weights=columns['speed'], minlength=edge_count)
+            for cells, client_ids in edge_groups.items():
+                edges = np.sort(edge_index.query_cells(*cells))
+                edges = edges[counts[edges] > 0]
+                frames.append((client_ids, {
+                    'level': 'edges',
+                    'edges': [engine.edge_ids[e] for e in edges.tolist()],
+                    'counts': counts[edges].tolist(),
+                    'mean_speed': np.round(speeds[edges] / counts[edges], 1).tolist(),
+                    'cells': list(cells),
+                    'simulation_time': snapshot.simulation_time
+                }))
+
+        for (level, cells), client_ids in groups.items():
+            if level == 'density':
+                frames.append((client_ids, self._density(snapshot, index, cells)))
+        return frames
+
+    def _vehicle_frames(self, snapshot, index: SpatialIndex, groups: Dict[Tuple, List[str]]):
+        """
+        Individual vehicles, each serialized once and shared between groups;
+        returns the frames and the groups with too many vehicles in view
+        """
+        rows = {cells: index.query_cells(*cells) for cells in groups}
+        crowded = {cells: groups.pop(cells) for cells in list(groups) if len(rows[cells]) > self.max_vehicles}
+        if not groups:
+            return [], crowded
+        columns = snapshot.columns
+        rows = {cells: rows[cells] for cells in groups}
+        visible = np.unique(np.concatenate(list(rows.values())))
+        engine = snapshot.engine
+        vehicles = engine.columns_to_dicts({name: columns[name][visible] for name in engine.SERIALIZED})
+
+        frames = []
+        for cells, client_ids in groups.items():
+            shown = [vehicles[i] for i in np.searchsorted(visible, rows[cells]).tolist()]
+            frames.append((client_ids, {
+                'level': 'vehicles',
+                'vehicles': shown,
+                'count': len(shown),
+                'cells': list(cells),
+                'cell_size': self.cell_size,
+                'simulation_time': snapshot.simulation_time
+            }))
+        return frames, crowded
+
+    def _density(self, snapshot, index: SpatialIndex, cells: Tuple[int, int, int, int]) -> Dict:
+        """Vehicle count and mean speed on a grid over the cell range (non-empty bins only)"""
+        x0, y0, x1, y1 = cells
+        x1, y1 = max(x0, x1), max(y0, y1)  # nothing in view: one empty bin
+        size = self.cell_size
+        south, west, north, east = y0 * size, x0 * size, (y1 + 1) * size, (x1 + 1) * size
+        rows = min(DENSITY_BINS, y1 - y0 + 1)
+        cols = min(DENSITY_BINS, x1 - x0 + 1)
+
+        items = index.query_cells(*cells)
+        lat, lng = snapshot.columns['lat'][items], snapshot.columns['lng'][items]
+        bounds = [[south, north], [west, east]]
+        counts, _, _ = np.histogram2d(lat, lng, bins=(rows, cols), range=bounds)
+        speeds, _, _ = np.histogram2d(lat, lng, bins=(rows, cols), range=bounds,
+                                      weights=snapshot.columns['speed'][items])
+        row, col = np.nonzero(counts)
+        return {
+            'level': 'density',
+            'bounds': [south, west, north, east],
+            'shape': [rows, cols],
+            'row': row.tolist(),
+            'col': col.tolist(),
+            'counts': counts[row, col].astype(np.int64).tolist(),
+            'mean_speed': np.round(speeds[row, col] / counts[row, col], 1).tolist(),
+            'simulation_time': snapshot.simulation_time
+        }